@@ -1,16 +1,26 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import errno
+import functools
+import hashlib
+import json
 import os
 import random
+import re
+import shutil
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Iterable, Tuple, Dict
+from typing import List, Optional, Set, Tuple, Dict
 
 from dotenv import load_dotenv
 import dropbox
-from dropbox.files import FileMetadata
+from dropbox.files import FileMetadata, FolderMetadata
 
 import httplib2
 from googleapiclient.discovery import build
@@ -35,6 +45,10 @@ DEFAULT_LOCAL_BUCKET = "raw"
 MAX_RETRIES = 3
 RETRY_DELAY_SECONDS = 5
 
+# 동시 다운로드 워커 수 (I/O bound라 스레드로 충분)
+DOWNLOAD_WORKERS = 8
+GDRIVE_CHECK_WORKERS = 8
+
 # Google Drive
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 GDRIVE_ROOT_FOLDER_ID = "1mMLHBBQn_mmFIHcNuHTpuiViP5JWcHBi"
@@ -48,18 +62,50 @@ GDRIVE_TIMEOUT_SECONDS = 60
 # -----------------------
 # Helpers
 # -----------------------
+@functools.lru_cache(maxsize=None)
 def _escape_drive_q(s: str) -> str:
+    # 같은 폴더/파일명이 중첩 호출에서 반복 이스케이프되는 것을 캐시로 흡수
     return s.replace("'", "\\'")
 
 
 def _sleep_with_backoff(base_delay: float, attempt: int, *, cap: float = 60.0) -> None:
     """
-    Exponential backoff + jitter.
+    Exponential backoff + full jitter.
     attempt: 1..N
+    워커 여러 개가 같은 타이밍에 재시도하며 몰리지 않도록
+    [0, expo) 전 구간에서 균등 샘플링한다.
     """
     expo = min(cap, base_delay * (2 ** max(0, attempt - 1)))
-    jitter = random.uniform(0, 0.25 * expo)
-    time.sleep(expo + jitter)
+    time.sleep(random.uniform(0, expo))
+
+
+def _retry_after_seconds(e: Exception) -> Optional[float]:
+    """429 응답이 Retry-After를 주면 그 값을 그대로 따른다."""
+    if not isinstance(e, HttpError):
+        return None
+    resp = getattr(e, "resp", None)
+    if resp is None or getattr(resp, "status", None) != 429:
+        return None
+    try:
+        retry_after = resp.get("retry-after")
+    except Exception:
+        return None
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        return None
+
+
+# 재시도 판정은 에러당/시도당 호출되므로 한 번만 컴파일해 둔다.
+_TRANSIENT_STATUS = frozenset({429, 500, 502, 503, 504})
+_TRANSIENT_RE = re.compile(
+    r"connection reset|connection aborted|timed out|timeout"
+    r"|temporarily unavailable|remote host|10053|10054|tls|ssl"
+    r"|chunkedencodingerror|userratelimitexceeded|ratelimitexceeded",
+    re.IGNORECASE,
+)
 
 
 def _is_transient_error(e: Exception) -> bool:
@@ -73,30 +119,50 @@ def _is_transient_error(e: Exception) -> bool:
     # googleapiclient HttpError도 5xx/429면 보통 재시도 가치가 있음
     if isinstance(e, HttpError):
         status = getattr(getattr(e, "resp", None), "status", None)
-        if status in (429, 500, 502, 503, 504):
+        if status in _TRANSIENT_STATUS:
             return True
 
-    msg = str(e).lower()
-    transient_markers = [
-        "connection reset",
-        "connection aborted",
-        "timed out",
-        "timeout",
-        "temporarily unavailable",
-        "remote host",
-        "10053",
-        "10054",
-        "tls",
-        "ssl",
-        "chunkedencodingerror",
-    ]
-    return any(m in msg for m in transient_markers)
+    return bool(_TRANSIENT_RE.search(str(e)))
+
+
+class RateLimiter:
+    """
+    스레드 안전 토큰 버킷. Drive의 사용자당 QPS 한도(10/s) 아래로
+    요청 간격을 고르게 눌러서 429 -> 백오프로 수 초씩 날리는 일을 예방.
+    체크 워커 스레드들이 공유하므로 threading.Lock으로 보호한다.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# main()에서 --gdrive-qps로 설정. None이면 제한 없음.
+_gdrive_limiter: Optional[RateLimiter] = None
 
 
 def _gdrive_execute_with_retry(request, *, desc: str = "", max_retries: int, base_delay: int) -> dict:
     last_err: Optional[Exception] = None
     for attempt in range(1, max_retries + 1):
         try:
+            if _gdrive_limiter is not None:
+                _gdrive_limiter.acquire()
             return request.execute()
         except Exception as e:
             if isinstance(e, KeyboardInterrupt):
@@ -105,7 +171,12 @@ def _gdrive_execute_with_retry(request, *, desc: str = "", max_retries: int, bas
             print(f"[GDRIVE-RETRY] {desc} 시도 {attempt}/{max_retries} 실패: {type(e).__name__}: {e}")
             if attempt >= max_retries or not _is_transient_error(e):
                 raise
-            _sleep_with_backoff(base_delay, attempt)
+            retry_after = _retry_after_seconds(e)
+            if retry_after is not None:
+                print(f"[GDRIVE-RETRY] {desc} Retry-After={retry_after:.0f}s 대기")
+                time.sleep(retry_after)
+            else:
+                _sleep_with_backoff(base_delay, attempt)
     raise last_err  # for type checker
 
 
@@ -122,6 +193,19 @@ def get_dropbox_client() -> dropbox.Dropbox:
     )
 
 
+# 워커 스레드별 Dropbox 클라이언트
+# (SDK 내부 requests.Session은 스레드 간 공유가 안전하지 않음)
+_thread_local = threading.local()
+
+
+def _get_thread_dropbox_client() -> dropbox.Dropbox:
+    client = getattr(_thread_local, "dbx", None)
+    if client is None:
+        client = get_dropbox_client()
+        _thread_local.dbx = client
+    return client
+
+
 def list_dropbox_files_recursive(dbx: dropbox.Dropbox, root_path: str) -> List[FileMetadata]:
     res = dbx.files_list_folder(root_path, recursive=True)
     entries = list(res.entries)
@@ -131,13 +215,131 @@ def list_dropbox_files_recursive(dbx: dropbox.Dropbox, root_path: str) -> List[F
     return [e for e in entries if isinstance(e, FileMetadata)]
 
 
+def list_dropbox_files_recursive_parallel(
+    dbx: dropbox.Dropbox,
+    root_path: str,
+    *,
+    max_workers: int = DOWNLOAD_WORKERS,
+) -> List[FileMetadata]:
+    """
+    루트 직계 폴더들을 나눠서 병렬로 recursive 리스팅.
+    큰 트리에서 순차적인 list_folder_continue 왕복이 워커 수만큼 겹친다.
+    워커 스레드마다 전용 Dropbox 클라이언트를 쓴다.
+    """
+    res = dbx.files_list_folder(root_path, recursive=False)
+    entries = list(res.entries)
+    while res.has_more:
+        res = dbx.files_list_folder_continue(res.cursor)
+        entries.extend(res.entries)
+
+    files: List[FileMetadata] = [e for e in entries if isinstance(e, FileMetadata)]
+    subfolders = [e for e in entries if isinstance(e, FolderMetadata)]
+
+    if not subfolders:
+        return files
+
+    def _list_one(folder: FolderMetadata) -> List[FileMetadata]:
+        return list_dropbox_files_recursive(_get_thread_dropbox_client(), folder.path_lower)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for result in pool.map(_list_one, subfolders):
+            files.extend(result)
+
+    return files
+
+
+@dataclass
+class DbxFile:
+    """영속화/델타 병합용 최소 파일 메타 (FileMetadata와 속성 호환)."""
+
+    path_display: str
+    path_lower: str
+    size: int
+    content_hash: Optional[str] = None
+
+
+def _dbx_state_paths(work_dir: Path) -> Tuple[Path, Path]:
+    return work_dir / "dbx_cursor.json", work_dir / "dbx_entries.jsonl"
+
+
+def load_dropbox_listing_state(
+    work_dir: Path, root_path: str
+) -> Tuple[Optional[str], Dict[str, DbxFile]]:
+    """이전 실행이 남긴 커서 + 엔트리 스냅샷을 읽는다(루트가 다르면 무시)."""
+    cursor_path, entries_path = _dbx_state_paths(work_dir)
+    if not cursor_path.exists() or not entries_path.exists():
+        return None, {}
+    try:
+        state = json.loads(cursor_path.read_text(encoding="utf-8"))
+        if state.get("root_path") != root_path:
+            return None, {}
+        entries: Dict[str, DbxFile] = {}
+        with open(entries_path, encoding="utf-8") as f:
+            for line in f:
+                d = json.loads(line)
+                entries[d["path_lower"]] = DbxFile(**d)
+        return state.get("cursor"), entries
+    except Exception as e:
+        print(f"[DBX-CURSOR-WARN] 상태 파일 로드 실패 -> 전체 리스팅: {type(e).__name__}: {e}")
+        return None, {}
+
+
+def save_dropbox_listing_state(
+    work_dir: Path, root_path: str, cursor: str, entries: Dict[str, DbxFile]
+) -> None:
+    cursor_path, entries_path = _dbx_state_paths(work_dir)
+    tmp_entries = entries_path.with_suffix(".jsonl.part")
+    with open(tmp_entries, "w", encoding="utf-8") as f:
+        for e in entries.values():
+            f.write(
+                json.dumps(
+                    {
+                        "path_display": e.path_display,
+                        "path_lower": e.path_lower,
+                        "size": e.size,
+                        "content_hash": e.content_hash,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+    tmp_entries.replace(entries_path)
+    cursor_path.write_text(
+        json.dumps({"root_path": root_path, "cursor": cursor}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+
+
+def apply_dropbox_delta(dbx: dropbox.Dropbox, cursor: str, entries: Dict[str, DbxFile]) -> str:
+    """
+    커서 이후 변경분만 받아 entries에 반영하고 새 커서를 돌려준다.
+    서버가 reset을 요구하면 ValueError로 알려 전체 리스팅으로 돌아가게 함.
+    """
+    while True:
+        res = dbx.files_list_folder_continue(cursor)
+        for e in res.entries:
+            if isinstance(e, FileMetadata):
+                entries[e.path_lower] = DbxFile(
+                    path_display=e.path_display,
+                    path_lower=e.path_lower,
+                    size=int(e.size),
+                    content_hash=getattr(e, "content_hash", None),
+                )
+            elif isinstance(e, dropbox.files.DeletedMetadata):
+                # 폴더 삭제면 하위 전체를 지워야 한다
+                prefix = e.path_lower + "/"
+                entries.pop(e.path_lower, None)
+                for key in [k for k in entries if k.startswith(prefix)]:
+                    del entries[key]
+        cursor = res.cursor
+        if not res.has_more:
+            return cursor
+
+
 # -----------------------
 # Google Drive
 # -----------------------
-def get_gdrive_service(*, timeout_seconds: int) :
-    """
-    httplib2 timeout을 명시해서 장시간 hang/불안정 상황을 줄임.
-    """
+def _load_gdrive_credentials() -> Credentials:
     base_dir = Path(__file__).parent
     token_path = base_dir / "token.json"
     cred_path = base_dir / "credentials.json"
@@ -154,16 +356,58 @@ def get_gdrive_service(*, timeout_seconds: int) :
             creds = flow.run_local_server(port=0)
         token_path.write_text(creds.to_json(), encoding="utf-8")
 
+    return creds
+
+
+def _build_gdrive_service(creds: Credentials, *, timeout_seconds: int):
+    """
+    httplib2 timeout을 명시해서 장시간 hang/불안정 상황을 줄임.
+    """
     http = httplib2.Http(timeout=timeout_seconds)
     authed_http = AuthorizedHttp(creds, http=http)
 
-    return build("drive", "v3", http=authed_http, cache_discovery=False)
+    # 클라이언트는 UA에 "gzip"이 있어야 응답을 gzip으로 받는다.
+    # list 응답 JSON은 압축률이 높아 전송량이 크게 줄어든다.
+    _orig_request = authed_http.request
+
+    def _request_with_gzip(uri, method="GET", body=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault("accept-encoding", "gzip")
+        ua = headers.get("user-agent", "")
+        if "gzip" not in ua:
+            headers["user-agent"] = (ua + " (gzip)").strip()
+        return _orig_request(uri, method=method, body=body, headers=headers, **kwargs)
+
+    authed_http.request = _request_with_gzip
+
+    try:
+        # discovery 문서 네트워크 조회 생략 (클라이언트 버전에 따라 미지원)
+        return build("drive", "v3", http=authed_http, cache_discovery=False, static_discovery=True)
+    except TypeError:
+        return build("drive", "v3", http=authed_http, cache_discovery=False)
+
+
+def get_gdrive_service(*, timeout_seconds: int):
+    return _build_gdrive_service(_load_gdrive_credentials(), timeout_seconds=timeout_seconds)
+
+
+def _get_thread_gdrive_service(creds: Credentials, *, timeout_seconds: int):
+    """
+    httplib2.Http는 스레드 안전하지 않지만 커넥션은 인스턴스별로 keep-alive
+    된다. 워커 스레드마다 서비스를 하나씩 두면 잠금 경합 없이 TLS/TCP
+    핸드셰이크를 요청마다 다시 치르지 않는다(자격증명은 공유).
+    """
+    svc = getattr(_thread_local, "gdrive", None)
+    if svc is None:
+        svc = _build_gdrive_service(creds, timeout_seconds=timeout_seconds)
+        _thread_local.gdrive = svc
+    return svc
 
 
 def get_drive_id(service, root_folder_id: str, *, max_retries: int, base_delay: int) -> Optional[str]:
     req = service.files().get(
         fileId=root_folder_id,
-        fields="id,name,driveId",
+        fields="driveId",
         supportsAllDrives=True,
     )
     meta = _gdrive_execute_with_retry(
@@ -195,6 +439,303 @@ def drive_list(service, q: str, fields: str, drive_id: Optional[str], *, max_ret
     )
 
 
+# 이름 OR 묶음 하나의 최대 크기 (쿼리 길이 제한 고려)
+GDRIVE_NAMES_PER_QUERY = 40
+# multipart batch 하나에 담는 sub-request 수 (100까지 지원하지만 25 초과 시 500이 잦음)
+GDRIVE_BATCH_SIZE = 25
+
+
+def _children_by_names_request(service, parent_id: str, names: List[str], drive_id: Optional[str], *, want_folders: bool):
+    """같은 parent 아래 필요한 이름들을 OR로 묶은 files.list 요청 객체 생성 (실행은 호출자 몫)."""
+    name_q = " or ".join(f"name = '{_escape_drive_q(n)}'" for n in names)
+    query = f"'{parent_id}' in parents and trashed = false and ({name_q})"
+    if want_folders:
+        query += f" and mimeType = '{FOLDER_MIMETYPE}'"
+    else:
+        query += f" and mimeType != '{FOLDER_MIMETYPE}'"
+    kwargs = dict(
+        q=query,
+        fields="files(id, name, size, mimeType)",
+        spaces="drive",
+        includeItemsFromAllDrives=True,
+        supportsAllDrives=True,
+        pageSize=1000,
+    )
+    if drive_id:
+        kwargs.update(dict(corpora="drive", driveId=drive_id))
+    return service.files().list(**kwargs)
+
+
+def drive_list_children_by_names(
+    service,
+    parent_id: str,
+    names: List[str],
+    drive_id: Optional[str],
+    *,
+    want_folders: bool,
+    max_retries: int,
+    base_delay: int,
+) -> List[dict]:
+    """
+    같은 parent 아래에서 필요한 이름들을 OR로 묶어 한 번에 조회.
+    이름당 1회였던 files.list 호출이 이름 ~40개당 1회로 줄어든다.
+    """
+    items: List[dict] = []
+    for i in range(0, len(names), GDRIVE_NAMES_PER_QUERY):
+        group = names[i:i + GDRIVE_NAMES_PER_QUERY]
+        req = _children_by_names_request(service, parent_id, group, drive_id, want_folders=want_folders)
+        res = _gdrive_execute_with_retry(
+            req,
+            desc=f"list names parent={parent_id}",
+            max_retries=max_retries,
+            base_delay=base_delay,
+        )
+        items.extend(res.get("files", []))
+    return items
+
+
+def _execute_requests_batched(
+    service,
+    keyed_requests: List[Tuple[str, object]],
+    *,
+    max_retries: int,
+    base_delay: int,
+) -> Dict[str, dict]:
+    """
+    (key, request) 묶음을 multipart/mixed batch로 실행해 {key: response} 반환.
+    N번의 HTTP 왕복이 N/25번으로 줄어든다. 실패한 sub-request는 결과에서
+    빠지므로 호출자가 개별 실행으로 폴백한다.
+    """
+    results: Dict[str, dict] = {}
+
+    def _cb(request_id, response, exception):
+        if exception is not None:
+            print(f"[GDRIVE-BATCH-WARN] sub-request 실패: {request_id} ({type(exception).__name__}: {exception})")
+        else:
+            results[request_id] = response
+
+    for i in range(0, len(keyed_requests), GDRIVE_BATCH_SIZE):
+        group = keyed_requests[i:i + GDRIVE_BATCH_SIZE]
+        batch = service.new_batch_http_request(callback=_cb)
+        for key, req in group:
+            batch.add(req, request_id=key)
+        _gdrive_execute_with_retry(
+            batch,
+            desc=f"batch n={len(group)}",
+            max_retries=max_retries,
+            base_delay=base_delay,
+        )
+    return results
+
+
+def prefetch_gdrive_lookups(
+    service,
+    root_id: str,
+    drive_id: Optional[str],
+    rel_paths: List[str],
+    folder_cache: Dict[Tuple[str, str], Optional[str]],
+    file_cache: Dict[Tuple[str, str], Tuple[str, int]],
+    prefetched_parents: Set[str],
+    *,
+    max_retries: int,
+    base_delay: int,
+) -> None:
+    """
+    rel_paths(루트 기준 상대경로)가 필요로 하는 폴더/파일 이름을 parent별로
+    묶어 일괄 조회해서 folder_cache / file_cache를 미리 채운다.
+    이후 본 루프의 strict 체크는 대부분 캐시 히트로 끝난다.
+    """
+    folders_needed: Dict[Tuple[str, ...], Set[str]] = {}
+    files_needed: Dict[Tuple[str, ...], Set[str]] = {}
+
+    for rel in rel_paths:
+        parts = rel.split("/")
+        for i in range(len(parts) - 1):
+            folders_needed.setdefault(tuple(parts[:i]), set()).add(parts[i])
+        files_needed.setdefault(tuple(parts[:-1]), set()).add(parts[-1])
+
+    # 루트부터 한 단계씩 내려가며 폴더 id 해결.
+    # 같은 depth의 parent들을 batch HTTP 하나로 묶어 왕복을 더 줄인다.
+    resolved: Dict[Tuple[str, ...], str] = {(): root_id}
+    max_depth = max((len(k) for k in folders_needed), default=-1)
+
+    for depth in range(max_depth + 1):
+        keyed_requests: List[Tuple[str, object]] = []
+        pending: Dict[str, Tuple[str, List[str]]] = {}
+
+        for parent_parts, names in folders_needed.items():
+            if len(parent_parts) != depth:
+                continue
+            parent_id = resolved.get(parent_parts)
+            if parent_id is None:
+                continue
+            missing = [n for n in sorted(names) if (parent_id, n) not in folder_cache]
+            for i in range(0, len(missing), GDRIVE_NAMES_PER_QUERY):
+                group = missing[i:i + GDRIVE_NAMES_PER_QUERY]
+                key = f"f:{parent_id}:{i}"
+                pending[key] = (parent_id, group)
+                keyed_requests.append(
+                    (key, _children_by_names_request(service, parent_id, group, drive_id, want_folders=True))
+                )
+
+        responses = _execute_requests_batched(
+            service, keyed_requests, max_retries=max_retries, base_delay=base_delay
+        ) if keyed_requests else {}
+
+        for key, (parent_id, group) in pending.items():
+            res = responses.get(key)
+            if res is None:
+                # batch sub-request 실패 -> 해당 묶음만 개별 실행으로 폴백
+                found = drive_list_children_by_names(
+                    service, parent_id, group, drive_id,
+                    want_folders=True, max_retries=max_retries, base_delay=base_delay,
+                )
+            else:
+                found = res.get("files", [])
+            by_name: Dict[str, str] = {}
+            for it in found:
+                by_name.setdefault(it["name"], it["id"])
+            for n in group:
+                folder_cache[(parent_id, n)] = by_name.get(n)
+
+        for parent_parts, names in folders_needed.items():
+            if len(parent_parts) != depth:
+                continue
+            parent_id = resolved.get(parent_parts)
+            if parent_id is None:
+                continue
+            for n in names:
+                fid = folder_cache.get((parent_id, n))
+                if fid:
+                    resolved[parent_parts + (n,)] = fid
+
+    # 해결된 폴더별로 필요한 파일명들도 batch로 묶어 조회
+    keyed_requests = []
+    pending = {}
+    for parent_parts, names in files_needed.items():
+        parent_id = resolved.get(parent_parts)
+        if parent_id is None:
+            continue
+        ordered = sorted(names)
+        for i in range(0, len(ordered), GDRIVE_NAMES_PER_QUERY):
+            group = ordered[i:i + GDRIVE_NAMES_PER_QUERY]
+            key = f"c:{parent_id}:{i}"
+            pending[key] = (parent_id, group)
+            keyed_requests.append(
+                (key, _children_by_names_request(service, parent_id, group, drive_id, want_folders=False))
+            )
+
+    responses = _execute_requests_batched(
+        service, keyed_requests, max_retries=max_retries, base_delay=base_delay
+    ) if keyed_requests else {}
+
+    for key, (parent_id, group) in pending.items():
+        res = responses.get(key)
+        if res is None:
+            found = drive_list_children_by_names(
+                service, parent_id, group, drive_id,
+                want_folders=False, max_retries=max_retries, base_delay=base_delay,
+            )
+        else:
+            found = res.get("files", [])
+        for it in found:
+            size = int(it.get("size", 0) or 0)
+            file_cache.setdefault((parent_id, it["name"]), (it["id"], size))
+        prefetched_parents.add(parent_id)
+
+
+def prefetch_drive_tree(
+    service,
+    drive_id: Optional[str],
+    *,
+    max_retries: int,
+    base_delay: int,
+    cache_path: Optional[Path] = None,
+    cache_ttl: int = 0,
+) -> Dict[str, List[dict]]:
+    """
+    드라이브 전체를 1000개 단위 페이지로 한 번에 긁어
+    {parent_id: [child, ...]} 맵을 만든다. 노드 N개 기준 API 호출이
+    파일당 O(depth)에서 ~N/1000으로 줄어든다.
+    cache_path가 있고 ttl 이내면 디스크 캐시를 재사용한다.
+    """
+    if cache_path and cache_ttl > 0 and cache_path.exists():
+        age = time.time() - cache_path.stat().st_mtime
+        if age < cache_ttl:
+            try:
+                data = json.loads(cache_path.read_text(encoding="utf-8"))
+                print(f"[INFO] drive_tree 캐시 로드: {cache_path} (age={int(age)}s)")
+                return data
+            except Exception as e:
+                print(f"[WARN] drive_tree 캐시 로드 실패 -> 전체 재조회: {type(e).__name__}: {e}")
+
+    children_by_parent: Dict[str, List[dict]] = {}
+    page_token: Optional[str] = None
+    pages = 0
+    while True:
+        kwargs = dict(
+            q="trashed = false",
+            fields="nextPageToken, files(id, name, size, mimeType, parents)",
+            spaces="drive",
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            pageSize=1000,
+        )
+        if drive_id:
+            kwargs.update(dict(corpora="drive", driveId=drive_id))
+        if page_token:
+            kwargs["pageToken"] = page_token
+        req = service.files().list(**kwargs)
+        res = _gdrive_execute_with_retry(
+            req,
+            desc=f"prefetch tree page={pages + 1}",
+            max_retries=max_retries,
+            base_delay=base_delay,
+        )
+        for it in res.get("files", []):
+            for p in it.get("parents", []) or []:
+                children_by_parent.setdefault(p, []).append(it)
+        pages += 1
+        page_token = res.get("nextPageToken")
+        if not page_token:
+            break
+
+    print(f"[INFO] drive_tree 조회 완료: pages={pages} parents={len(children_by_parent)}")
+
+    if cache_path:
+        try:
+            cache_path.write_text(json.dumps(children_by_parent), encoding="utf-8")
+        except Exception as e:
+            print(f"[WARN] drive_tree 캐시 저장 실패: {type(e).__name__}: {e}")
+
+    return children_by_parent
+
+
+def populate_caches_from_tree(
+    children_by_parent: Dict[str, List[dict]],
+    root_id: str,
+    folder_cache: Dict[Tuple[str, str], Optional[str]],
+    file_cache: Dict[Tuple[str, str], Tuple[str, int]],
+    prefetched_parents: Set[str],
+) -> None:
+    """root_id에서 BFS로 내려가며 캐시를 채워 strict 체크가 RAM에서 끝나게 한다."""
+    queue: List[str] = [root_id]
+    seen: Set[str] = {root_id}
+    while queue:
+        pid = queue.pop()
+        prefetched_parents.add(pid)
+        for it in children_by_parent.get(pid, []):
+            name = it.get("name", "")
+            if it.get("mimeType") == FOLDER_MIMETYPE:
+                folder_cache.setdefault((pid, name), it["id"])
+                if it["id"] not in seen:
+                    seen.add(it["id"])
+                    queue.append(it["id"])
+            else:
+                size = int(it.get("size", 0) or 0)
+                file_cache.setdefault((pid, name), (it["id"], size))
+
+
 def get_folder_if_exists(
     service,
     parent_id: str,
@@ -213,7 +754,7 @@ def get_folder_if_exists(
     res = drive_list(
         service,
         q=query,
-        fields="files(id, name)",
+        fields="files(id)",  # 쿼리가 이미 name으로 거르므로 id만 필요
         drive_id=drive_id,
         max_retries=max_retries,
         base_delay=base_delay,
@@ -235,12 +776,16 @@ def get_path_if_exists_cached(
     *,
     max_retries: int,
     base_delay: int,
+    prefetched_parents: Optional[Set[str]] = None,
 ) -> Optional[str]:
     current_id = root_id
     for name in parts:
         key = (current_id, name)
         if key in cache:
             folder_id = cache[key]
+        elif prefetched_parents is not None and current_id in prefetched_parents:
+            # parent 전체가 이미 메모리에 있음 -> 캐시 미스 = 폴더 미존재
+            folder_id = None
         else:
             folder_id = get_folder_if_exists(
                 service,
@@ -274,7 +819,7 @@ def find_file_in_folder_with_size(
     res = drive_list(
         service,
         q=query,
-        fields="files(id, name, size)",
+        fields="files(id, size)",  # 쿼리가 이미 name으로 거르므로 name 불필요
         drive_id=drive_id,
         max_retries=max_retries,
         base_delay=base_delay,
@@ -298,6 +843,8 @@ def gdrive_has_same_file_strict(
     folder_cache: Dict[Tuple[str, str], Optional[str]],
     max_retries: int,
     base_delay: int,
+    file_cache: Optional[Dict[Tuple[str, str], Tuple[str, int]]] = None,
+    prefetched_parents: Optional[Set[str]] = None,
 ) -> Tuple[bool, str]:
     parent_id = get_path_if_exists_cached(
         service,
@@ -307,18 +854,25 @@ def gdrive_has_same_file_strict(
         folder_cache,
         max_retries=max_retries,
         base_delay=base_delay,
+        prefetched_parents=prefetched_parents,
     )
     if not parent_id:
         return False, "folder_missing"
 
-    found = find_file_in_folder_with_size(
-        service,
-        parent_id,
-        filename,
-        drive_id,
-        max_retries=max_retries,
-        base_delay=base_delay,
-    )
+    if file_cache is not None and (parent_id, filename) in file_cache:
+        found = file_cache[(parent_id, filename)]
+    elif prefetched_parents is not None and parent_id in prefetched_parents:
+        # parent 전체를 이미 일괄 조회했는데 없음 -> API 호출 없이 미존재 확정
+        found = None
+    else:
+        found = find_file_in_folder_with_size(
+            service,
+            parent_id,
+            filename,
+            drive_id,
+            max_retries=max_retries,
+            base_delay=base_delay,
+        )
     if not found:
         return False, "file_missing"
 
@@ -332,16 +886,88 @@ def gdrive_has_same_file_strict(
     return False, f"size_mismatch(gdrive={gsize},dropbox={expected_size_bytes})"
 
 
+# -----------------------
+# 폴더 캐시 영속화 (sqlite)
+# -----------------------
+class FolderCache(dict):
+    """
+    (parent_id, name) -> folder_id 캐시를 sqlite에 write-through로 영속화한 dict.
+    같은 루트를 반복 실행(cron)할 때 경로 해석 API 호출을 웜 런에서 건너뛴다.
+    ttl(초) 이내의 행만 로드하고, None(부재)은 빈 문자열로 저장한다.
+    """
+
+    def __init__(self, db_path: Path, ttl: int):
+        super().__init__()
+        self._lock = threading.Lock()
+        # 체크 워커 스레드에서도 쓰므로 check_same_thread=False + 락
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS folder("
+            "parent TEXT, name TEXT, id TEXT, ts INTEGER, "
+            "PRIMARY KEY(parent, name))"
+        )
+        self._conn.commit()
+
+        cutoff = int(time.time()) - max(0, ttl)
+        for parent, name, folder_id in self._conn.execute(
+            "SELECT parent, name, id FROM folder WHERE ts > ?", (cutoff,)
+        ):
+            super().__setitem__((parent, name), folder_id or None)
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        parent, name = key
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folder(parent, name, id, ts) VALUES (?, ?, ?, ?)",
+                (parent, name, value or "", int(time.time())),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
 # -----------------------
 # 다운로드/필터
 # -----------------------
+def index_local(bucket_dir: Path) -> Dict[str, int]:
+    """
+    bucket_dir 하위를 os.scandir로 한 번만 훑어 {상대경로: size} 인덱스를 만든다.
+    파일마다 exists()/stat() syscall을 치는 대신 메모리 조회로 대체
+    (bucket_dir가 네트워크 마운트일 때 특히 효과가 큼).
+    """
+    index: Dict[str, int] = {}
+    base = str(bucket_dir)
+    if not bucket_dir.exists():
+        return index
+
+    stack = [base]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        rel = os.path.relpath(entry.path, base).replace(os.sep, "/")
+                        index[rel] = entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            # 스캔 중 지워진 디렉터리는 무시
+            continue
+    return index
+
+
 def should_skip(
     path_display: str,
     *,
     include_substr: Optional[str],
     exclude_substr: Optional[str],
     skip_closed: bool,
-    skip_extensions: Iterable[str],
+    skip_extensions: Tuple[str, ...],
 ) -> bool:
     if skip_closed and "(폐강" in path_display:
         return True
@@ -350,13 +976,57 @@ def should_skip(
     if exclude_substr and exclude_substr in path_display:
         return True
 
-    suffix = Path(path_display).suffix.lower()
-    if suffix and suffix in set(x.lower() for x in skip_extensions):
+    # tuple endswith는 CPython의 C 루프 한 번으로 모든 확장자를 검사한다.
+    if skip_extensions and path_display.lower().endswith(skip_extensions):
         return True
 
     return False
 
 
+def dropbox_content_hash(path: Path) -> str:
+    """
+    Dropbox content_hash 로컬 계산: 4MB 블록별 SHA256 다이제스트를
+    이어붙여 다시 SHA256. hashlib(OpenSSL)이 SHA-NI를 쓰므로
+    사실상 디스크 읽기 속도에 수렴한다.
+    """
+    block_hashes: List[bytes] = []
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(4 * 1024 * 1024)
+            if not chunk:
+                break
+            block_hashes.append(hashlib.sha256(chunk).digest())
+    return hashlib.sha256(b"".join(block_hashes)).hexdigest()
+
+
+def _replace_file(tmp_path: Path, out_path: Path) -> None:
+    """
+    같은 파일시스템이면 rename 한 번으로 끝.
+    다른 파일시스템이면(EXDEV, /raw가 별도 마운트인 경우) copy_file_range로
+    커널 안에서만 복사해 유저스페이스 바운스 버퍼를 피한다.
+    """
+    try:
+        tmp_path.replace(out_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    size = tmp_path.stat().st_size
+    with open(tmp_path, "rb") as src, open(out_path, "wb") as dst:
+        if hasattr(os, "copy_file_range"):
+            remaining = size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        else:
+            shutil.copyfileobj(src, dst, length=1 << 20)
+        os.fsync(dst.fileno())
+    tmp_path.unlink()
+
+
 def safe_download_to_file(
     dbx: dropbox.Dropbox,
     dbx_path: str,
@@ -377,8 +1047,18 @@ def safe_download_to_file(
     last_err: Optional[Exception] = None
     for attempt in range(1, retries + 1):
         try:
-            dbx.files_download_to_file(download_path=str(tmp_path), path=dbx_path)
-            tmp_path.replace(out_path)
+            # 1MiB 청크 스트리밍 + 무버퍼 쓰기: syscall 수와 바이트당 CPU를 줄인다.
+            # 크기를 알면 미리 할당해 순차 쓰기를 돕는다.
+            md, resp = dbx.files_download(path=dbx_path)
+            with resp, open(tmp_path, "wb", buffering=0) as f:
+                size = getattr(md, "size", 0) or 0
+                if size and hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(f.fileno(), 0, size)
+                for chunk in resp.iter_content(1 << 20):
+                    f.write(chunk)
+                # replace 전에 내려써서 크래시에도 완성본만 남게 함
+                os.fsync(f.fileno())
+            _replace_file(tmp_path, out_path)
             return
         except Exception as e:
             last_err = e
@@ -390,6 +1070,187 @@ def safe_download_to_file(
     raise RuntimeError(f"Dropbox 다운로드 실패: {dbx_path} ({type(last_err).__name__}: {last_err})")
 
 
+# -----------------------
+# 파이프라인 (스캐너 -> GDrive 체크 워커 -> 다운로드 워커)
+# -----------------------
+def _download_one_in_thread(path_display: str, dbx_path: str, local_path: Path) -> None:
+    safe_download_to_file(_get_thread_dropbox_client(), dbx_path, local_path)
+
+
+async def _run_pipeline(
+    files: List[DbxFile],
+    args,
+    stats: "Stats",
+    bucket_dir: Path,
+    check_gdrive: bool,
+    gdrive,
+    gdrive_creds: Optional[Credentials],
+    drive_id: Optional[str],
+    folder_cache: Dict[Tuple[str, str], Optional[str]],
+    file_cache: Dict[Tuple[str, str], Tuple[str, int]],
+    prefetched_parents: Set[str],
+    local_index: Dict[str, int],
+) -> None:
+    """
+    스캐너가 필터/로컬 체크를 돌리며 check_queue에 넣고, 체크 워커가
+    GDrive strict 체크를 executor에서 수행한 뒤 다운로드가 필요한 것만
+    dl_queue로 넘긴다. 파일 j의 다운로드와 파일 j+1의 체크가 겹쳐서
+    파일당 시간이 합이 아니라 max(체크, 다운로드)에 수렴한다.
+    Stats 갱신은 전부 이벤트 루프 스레드에서만 하므로 락이 필요 없다.
+    """
+    loop = asyncio.get_running_loop()
+    check_queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+    dl_queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+
+    processed = 0
+    limit_reached = False
+    fatal_errors: List[Exception] = []
+
+    def _check_one(meta: DbxFile, rel: str) -> Tuple[bool, str]:
+        # 워커 스레드별 서비스: httplib2 커넥션을 스레드 내에서 재사용
+        if gdrive_creds is not None:
+            service = _get_thread_gdrive_service(gdrive_creds, timeout_seconds=args.gdrive_timeout)
+        else:
+            service = gdrive
+        parts = rel.split("/")
+        return gdrive_has_same_file_strict(
+            service,
+            root_id=args.gdrive_root_id,
+            drive_id=drive_id,
+            folder_parts=parts[:-1],
+            filename=parts[-1],
+            expected_size_bytes=int(meta.size),
+            folder_cache=folder_cache,
+            max_retries=args.gdrive_max_retries,
+            base_delay=args.gdrive_retry_delay,
+            file_cache=file_cache,
+            prefetched_parents=prefetched_parents,
+        )
+
+    async def producer() -> None:
+        for meta in files:
+            if limit_reached or fatal_errors:
+                break
+            stats.total_seen += 1
+
+            path_display = meta.path_display
+            if should_skip(
+                path_display,
+                include_substr=args.include,
+                exclude_substr=args.exclude,
+                skip_closed=args.skip_closed,
+                skip_extensions=args.skip_ext,
+            ):
+                stats.skipped_filter += 1
+                continue
+
+            rel = path_display.lstrip("/")
+
+            # 1) 로컬 존재 스킵(옵션에 따라 size mismatch면 재다운)
+            # Path 객체는 체크 큐에 올라가는 파일에만 만든다(스킵 경로는 str만).
+            local_size = local_index.get(rel)
+            if local_size is not None:
+                if args.redownload_if_size_mismatch:
+                    if local_size != meta.size:
+                        print(f"[LOCAL-MISMATCH] size differ -> redownload: {path_display}")
+                        stats.redownloaded += 1
+                    elif args.verify_content_hash and getattr(meta, "content_hash", None):
+                        # 사이즈가 같아도 내용이 다를 수 있어 content_hash로 확정
+                        local_hash = await loop.run_in_executor(
+                            None, dropbox_content_hash, bucket_dir / rel
+                        )
+                        if local_hash == meta.content_hash:
+                            stats.skipped_local_exists += 1
+                            continue
+                        print(f"[LOCAL-HASH-MISMATCH] content_hash differ -> redownload: {path_display}")
+                        stats.redownloaded += 1
+                    else:
+                        stats.skipped_local_exists += 1
+                        continue
+                else:
+                    stats.skipped_local_exists += 1
+                    continue
+
+            await check_queue.put((meta, rel, bucket_dir / rel))
+
+    async def check_worker(pool: ThreadPoolExecutor) -> None:
+        nonlocal processed, limit_reached
+        while True:
+            meta, rel, local_path = await check_queue.get()
+            try:
+                if limit_reached or fatal_errors:
+                    continue
+
+                path_display = meta.path_display
+
+                # 2) GDrive 엄격 스킵(경로+이름+사이즈)
+                if check_gdrive and gdrive is not None:
+                    try:
+                        same, reason = await loop.run_in_executor(pool, _check_one, meta, rel)
+                    except Exception as e:
+                        stats.gdrive_check_failed += 1
+                        print(f"[GDRIVE-CHECK-WARN] 확인 실패 -> 다운로드 진행: {path_display} ({type(e).__name__}: {e})")
+                        if args.gdrive_fail_closed:
+                            fatal_errors.append(e)
+                            continue
+                        same, reason = False, f"gdrive_check_error({type(e).__name__})"
+
+                    if same:
+                        stats.skipped_gdrive_same += 1
+                        print(f"[SKIP-GDRIVE] 이미 존재(동일 size): {path_display} ({reason})")
+                        continue
+                    else:
+                        print(f"[GDRIVE-CHECK] 다운로드 진행: {path_display} ({reason})")
+
+                processed += 1
+                if args.limit > 0 and processed > args.limit:
+                    limit_reached = True
+                    continue
+
+                print("\n==============================")
+                print("[LEFTOVER-PRODUCER] 대상 파일")
+                print(f"  - Dropbox: {path_display}")
+                print(f"  - Local  : {local_path}")
+                print(f"  - Size   : {meta.size} bytes")
+                print("==============================")
+
+                if args.dry_run:
+                    continue
+
+                await dl_queue.put((path_display, meta.path_lower, local_path))
+            finally:
+                check_queue.task_done()
+
+    async def download_worker(pool: ThreadPoolExecutor) -> None:
+        while True:
+            path_display, dbx_path, local_path = await dl_queue.get()
+            try:
+                await loop.run_in_executor(pool, _download_one_in_thread, path_display, dbx_path, local_path)
+                stats.downloaded += 1
+                print(f"[DL] 완료: {local_path}")
+            except Exception as e:
+                stats.failed += 1
+                print(f"[DL-ERROR] 실패: {path_display}")
+                print(f"          {type(e).__name__}: {e}")
+            finally:
+                dl_queue.task_done()
+
+    with ThreadPoolExecutor(max_workers=args.check_workers) as check_pool, \
+            ThreadPoolExecutor(max_workers=args.download_workers) as dl_pool:
+        check_tasks = [asyncio.create_task(check_worker(check_pool)) for _ in range(args.check_workers)]
+        dl_tasks = [asyncio.create_task(download_worker(dl_pool)) for _ in range(args.download_workers)]
+        try:
+            await producer()
+            await check_queue.join()
+            await dl_queue.join()
+        finally:
+            for t in check_tasks + dl_tasks:
+                t.cancel()
+
+    if fatal_errors:
+        raise fatal_errors[0]
+
+
 @dataclass
 class Stats:
     total_seen: int = 0
@@ -417,14 +1278,26 @@ def main():
     ap.add_argument("--limit", type=int, default=0)
 
     ap.add_argument("--redownload-if-size-mismatch", action="store_true")
+    ap.add_argument("--full-relist", action="store_true", help="델타 커서를 무시하고 Dropbox 트리 전체를 다시 리스팅")
+    ap.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS)
+    ap.add_argument("--check-workers", type=int, default=GDRIVE_CHECK_WORKERS)
 
     g = ap.add_mutually_exclusive_group()
     g.add_argument("--check-gdrive", action="store_true")
     g.add_argument("--no-check-gdrive", action="store_true")
 
     ap.add_argument("--gdrive-root-id", default=GDRIVE_ROOT_FOLDER_ID)
+    ap.add_argument("--prefetch-tree", action="store_true", help="Drive 서브트리 전체를 한 번에 조회해 RAM에서 체크")
+    ap.add_argument("--tree-cache-ttl", type=int, default=3600, help="drive_tree.json 재사용 TTL(초, 0=비활성)")
+    ap.add_argument("--cache-ttl", type=int, default=86400, help="drive_cache.sqlite 폴더 캐시 TTL(초, 0=비활성)")
+    ap.add_argument(
+        "--verify-content-hash",
+        action="store_true",
+        help="사이즈가 같아도 Dropbox content_hash까지 비교해서 재다운 여부 결정",
+    )
 
     # GDrive retry/timeout/fail policy
+    ap.add_argument("--gdrive-qps", type=float, default=8.0, help="Drive API 초당 요청 상한(0=제한 없음, 사용자 한도 10/s)")
     ap.add_argument("--gdrive-timeout", type=int, default=GDRIVE_TIMEOUT_SECONDS)
     ap.add_argument("--gdrive-max-retries", type=int, default=GDRIVE_MAX_RETRIES)
     ap.add_argument("--gdrive-retry-delay", type=int, default=GDRIVE_RETRY_DELAY_SECONDS)
@@ -434,6 +1307,15 @@ def main():
 
     args = ap.parse_args()
 
+    global _gdrive_limiter
+    if args.gdrive_qps > 0:
+        _gdrive_limiter = RateLimiter(args.gdrive_qps)
+
+    # should_skip는 엔트리당 호출되므로 확장자 목록은 여기서 한 번만 정규화한다.
+    args.skip_ext = tuple(
+        x.lower() if x.startswith(".") else "." + x.lower() for x in args.skip_ext
+    )
+
     # 기본은 엄격 체크 ON
     check_gdrive = True
     if args.no_check_gdrive:
@@ -444,12 +1326,21 @@ def main():
     dbx = get_dropbox_client()
 
     gdrive = None
+    gdrive_creds = None
     drive_id = None
-    folder_cache: Dict[Tuple[str, str], Optional[str]] = {}
+    folder_cache: Dict[Tuple[str, str], Optional[str]]
+    if args.cache_ttl > 0:
+        folder_cache = FolderCache(Path(__file__).parent / "drive_cache.sqlite", args.cache_ttl)
+        print(f"[INFO] 폴더 캐시 로드(sqlite): {len(folder_cache)}개 항목")
+    else:
+        folder_cache = {}
+    file_cache: Dict[Tuple[str, str], Tuple[str, int]] = {}
+    prefetched_parents: Set[str] = set()
 
     if check_gdrive:
         try:
-            gdrive = get_gdrive_service(timeout_seconds=args.gdrive_timeout)
+            gdrive_creds = _load_gdrive_credentials()
+            gdrive = _build_gdrive_service(gdrive_creds, timeout_seconds=args.gdrive_timeout)
             drive_id = get_drive_id(
                 gdrive,
                 args.gdrive_root_id,
@@ -464,6 +1355,7 @@ def main():
             # fail-open: gdrive 체크 비활성화로 전환
             check_gdrive = False
             gdrive = None
+            gdrive_creds = None
             drive_id = None
 
     base_dir = Path(__file__).parent
@@ -471,8 +1363,49 @@ def main():
     bucket_dir = work_dir / args.local_bucket
     bucket_dir.mkdir(parents=True, exist_ok=True)
 
-    files = list_dropbox_files_recursive(dbx, args.dropbox_root)
-    files = sorted(files, key=lambda m: m.path_display)
+    # 델타 커서가 있으면 변경분만 받고, 없거나 깨졌으면 전체 리스팅
+    entry_map: Dict[str, DbxFile] = {}
+    cursor = None
+    if not args.full_relist:
+        cursor, entry_map = load_dropbox_listing_state(work_dir, args.dropbox_root)
+    if cursor:
+        try:
+            cursor = apply_dropbox_delta(dbx, cursor, entry_map)
+            print(f"[INFO] Dropbox 델타 리스팅 사용: {len(entry_map)}개 엔트리")
+        except Exception as e:
+            print(f"[DBX-CURSOR-WARN] 델타 실패 -> 전체 리스팅: {type(e).__name__}: {e}")
+            cursor = None
+            entry_map = {}
+    if not cursor:
+        # 커서를 리스팅보다 먼저 받아둬야 리스팅 중의 변경이 다음 델타에 잡힌다
+        cursor = dbx.files_list_folder_get_latest_cursor(
+            args.dropbox_root, recursive=True
+        ).cursor
+        listed = list_dropbox_files_recursive_parallel(
+            dbx, args.dropbox_root, max_workers=args.download_workers
+        )
+        entry_map = {
+            m.path_lower: DbxFile(
+                path_display=m.path_display,
+                path_lower=m.path_lower,
+                size=int(m.size),
+                content_hash=getattr(m, "content_hash", None),
+            )
+            for m in listed
+        }
+    save_dropbox_listing_state(work_dir, args.dropbox_root, cursor, entry_map)
+
+    files = list(entry_map.values())
+    # 같은 부모 폴더의 파일이 연속되도록 (dirname, basename)으로 정렬.
+    # 부모 하나를 해석하면 형제 파일들이 전부 캐시 히트가 되고,
+    # 일괄 조회(prefetch)도 부모 단위로 묶인다.
+    files = sorted(
+        files,
+        key=lambda m: (
+            m.path_display.rsplit("/", 1)[0],
+            m.path_display.rsplit("/", 1)[-1],
+        ),
+    )
 
     stats = Stats()
     print(f"[INFO] dropbox_root={args.dropbox_root}")
@@ -487,92 +1420,77 @@ def main():
             f"fail_closed={args.gdrive_fail_closed}"
         )
 
-    processed = 0
-    for meta in files:
-        stats.total_seen += 1
-
-        path_display = meta.path_display
-        if should_skip(
-            path_display,
-            include_substr=args.include,
-            exclude_substr=args.exclude,
-            skip_closed=args.skip_closed,
-            skip_extensions=args.skip_ext,
-        ):
-            stats.skipped_filter += 1
-            continue
-
-        rel = path_display.lstrip("/")
-        local_path = bucket_dir / rel
-
-        # 1) 로컬 존재 스킵(옵션에 따라 size mismatch면 재다운)
-        if local_path.exists():
-            if args.redownload_if_size_mismatch:
-                local_size = local_path.stat().st_size
-                if local_size == meta.size:
-                    stats.skipped_local_exists += 1
-                    continue
-                else:
-                    print(f"[LOCAL-MISMATCH] size differ -> redownload: {path_display}")
-                    stats.redownloaded += 1
-            else:
-                stats.skipped_local_exists += 1
-                continue
-
-        # 2) GDrive 엄격 스킵(경로+이름+사이즈)
-        if check_gdrive and gdrive is not None:
-            parts = rel.split("/")
-            folder_parts = parts[:-1]
-            filename = parts[-1]
-
-            try:
-                same, reason = gdrive_has_same_file_strict(
-                    gdrive,
-                    root_id=args.gdrive_root_id,
-                    drive_id=drive_id,
-                    folder_parts=folder_parts,
-                    filename=filename,
-                    expected_size_bytes=int(meta.size),
-                    folder_cache=folder_cache,
-                    max_retries=args.gdrive_max_retries,
-                    base_delay=args.gdrive_retry_delay,
-                )
-            except Exception as e:
-                stats.gdrive_check_failed += 1
-                print(f"[GDRIVE-CHECK-WARN] 확인 실패 -> 다운로드 진행: {path_display} ({type(e).__name__}: {e})")
-                if args.gdrive_fail_closed:
-                    raise
-                same, reason = False, f"gdrive_check_error({type(e).__name__})"
-
-            if same:
-                stats.skipped_gdrive_same += 1
-                print(f"[SKIP-GDRIVE] 이미 존재(동일 size): {path_display} ({reason})")
-                continue
-            else:
-                print(f"[GDRIVE-CHECK] 다운로드 진행: {path_display} ({reason})")
-
-        processed += 1
-        if args.limit > 0 and processed > args.limit:
-            break
-
-        print("\n==============================")
-        print("[LEFTOVER-PRODUCER] 대상 파일")
-        print(f"  - Dropbox: {path_display}")
-        print(f"  - Local  : {local_path}")
-        print(f"  - Size   : {meta.size} bytes")
-        print("==============================")
-
-        if args.dry_run:
-            continue
+    # 트리 전체를 한 번에 긁어두면 strict 체크가 전부 RAM에서 끝남
+    if check_gdrive and gdrive is not None and args.prefetch_tree:
+        try:
+            tree = prefetch_drive_tree(
+                gdrive,
+                drive_id,
+                max_retries=args.gdrive_max_retries,
+                base_delay=args.gdrive_retry_delay,
+                cache_path=Path(__file__).parent / "drive_tree.json",
+                cache_ttl=args.tree_cache_ttl,
+            )
+            populate_caches_from_tree(
+                tree, args.gdrive_root_id, folder_cache, file_cache, prefetched_parents
+            )
+            print(f"[INFO] drive_tree 캐시 구성 완료: folder_cache={len(folder_cache)} file_cache={len(file_cache)}")
+        except Exception as e:
+            print(f"[GDRIVE-TREE-WARN] 트리 일괄 조회 실패 -> 개별 조회로 진행: {type(e).__name__}: {e}")
+            if args.gdrive_fail_closed:
+                raise
 
+    # 본 루프 전에 필요한 폴더/파일 조회를 parent별로 묶어서 일괄 수행
+    if check_gdrive and gdrive is not None and not prefetched_parents:
+        candidate_rels = [
+            m.path_display.lstrip("/")
+            for m in files
+            if not should_skip(
+                m.path_display,
+                include_substr=args.include,
+                exclude_substr=args.exclude,
+                skip_closed=args.skip_closed,
+                skip_extensions=args.skip_ext,
+            )
+        ]
         try:
-            safe_download_to_file(dbx, meta.path_lower, local_path)
-            stats.downloaded += 1
-            print(f"[DL] 완료: {local_path}")
+            prefetch_gdrive_lookups(
+                gdrive,
+                args.gdrive_root_id,
+                drive_id,
+                candidate_rels,
+                folder_cache,
+                file_cache,
+                prefetched_parents,
+                max_retries=args.gdrive_max_retries,
+                base_delay=args.gdrive_retry_delay,
+            )
+            print(f"[INFO] GDrive 일괄 조회 완료: folder_cache={len(folder_cache)} file_cache={len(file_cache)}")
         except Exception as e:
-            stats.failed += 1
-            print(f"[DL-ERROR] 실패: {path_display}")
-            print(f"          {type(e).__name__}: {e}")
+            print(f"[GDRIVE-PREFETCH-WARN] 일괄 조회 실패 -> 개별 조회로 진행: {type(e).__name__}: {e}")
+            if args.gdrive_fail_closed:
+                raise
+
+    local_index = index_local(bucket_dir)
+    print(f"[INFO] 로컬 인덱스 구축: {len(local_index)}개 파일")
+
+    print(f"\n[INFO] 파이프라인 시작: check_workers={args.check_workers} download_workers={args.download_workers}")
+    asyncio.run(
+        _run_pipeline(
+            files,
+            args,
+            stats,
+            bucket_dir=bucket_dir,
+            check_gdrive=check_gdrive,
+            gdrive=gdrive,
+            gdrive_creds=gdrive_creds,
+            drive_id=drive_id,
+            folder_cache=folder_cache,
+            file_cache=file_cache,
+            prefetched_parents=prefetched_parents,
+            local_index=local_index,
+        )
+    )
 
     print("\n[SUMMARY]")
     print(f"  total_seen          : {stats.total_seen}")
@@ -586,6 +1504,9 @@ def main():
     print(f"  local_dir           : {bucket_dir}")
     print("  next step           : consumer 업로드 또는 수동 업로드")
 
+    if isinstance(folder_cache, FolderCache):
+        folder_cache.close()
+
 
 if __name__ == "__main__":
     main()
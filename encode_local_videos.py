@@ -1,18 +1,21 @@
 from dotenv import load_dotenv
+import io
+import json
 import os
-import re
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Optional, Tuple
-from queue import Queue
-from threading import Thread
+from threading import BoundedSemaphore, Semaphore, local
 
 import dropbox
 from dropbox.files import FileMetadata
 
+import httplib2
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
@@ -41,6 +44,9 @@ LOCAL_WORKDIR = "./tmp_work"
 FFMPEG_BIN = "ffmpeg"
 FFPROBE_BIN = "ffprobe"
 
+# libx264 프리셋: 용량 목표(비트레이트) 기준이라 품질보다 처리량 우선
+X264_PRESET = os.getenv("X264_PRESET", "ultrafast")
+
 # 실제 인코딩/업로드 대신 로그만 찍는 모드 (테스트용)
 DRY_RUN = False   # 테스트만 하고 싶으면 True 로 바꾸기
 
@@ -51,7 +57,14 @@ SCOPES = ["https://www.googleapis.com/auth/drive.file"]
 GDRIVE_ROOT_FOLDER_ID = "0ALadQkEfuBnGUk9PVA"
 
 # 업로드 워커 스레드 개수
-UPLOAD_WORKERS = 2
+UPLOAD_WORKERS = min(8, os.cpu_count() or 2)
+
+# resumable 업로드 청크 (256KiB 배수, 작으면 next_chunk 왕복이 너무 잦음)
+UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+
+# 동시에 돌릴 ffmpeg 인코딩 개수 (코어를 나눠 써서 과구독 방지)
+MAX_ENCODE_JOBS = 1
+_encode_semaphore = Semaphore(MAX_ENCODE_JOBS)
 
 
 # ===== 공통 유틸 =====
@@ -70,17 +83,29 @@ def run_cmd(cmd: List[str]) -> str:
     return result.stdout
 
 
-def get_video_duration(path: Path) -> float:
-    """ffprobe로 동영상 길이(초) 가져오기"""
+# 입력별 길이 캐시: 인코딩 재시도(MAX_RETRIES) 때마다 ffprobe를
+# 다시 띄우지 않게 한다. URL 입력(임시 링크)은 원격 프로브라 특히 비쌈.
+_duration_cache: dict[str, float] = {}
+
+
+def get_video_duration(path) -> float:
+    """ffprobe로 동영상 길이(초) 가져오기 (입력별 1회만 실행)"""
+    key = str(path)
+    cached = _duration_cache.get(key)
+    if cached is not None:
+        return cached
+
     cmd = [
         FFPROBE_BIN,
         "-v", "error",
         "-show_entries", "format=duration",
         "-of", "default=noprint_wrappers=1:nokey=1",
-        str(path),
+        key,
     ]
     out = run_cmd(cmd).strip()
-    return float(out)
+    duration = float(out)
+    _duration_cache[key] = duration
+    return duration
 
 
 def calc_bitrate_kbps(duration_sec: float, target_size_mb: int, safety_margin: float = 0.9) -> int:
@@ -92,26 +117,83 @@ def calc_bitrate_kbps(duration_sec: float, target_size_mb: int, safety_margin: f
     return kbps
 
 
-# ffmpeg 진행률 파싱용
-time_pattern = re.compile(r"time=(\d+):(\d+):(\d+\.\d+)")
+# 하드웨어 H.264 인코더 (기동 후 첫 인코딩 때 한 번만 탐지)
+_hw_encoder: Optional[str] = None
+_hw_encoder_probed = False
 
 
-def _parse_ffmpeg_time_to_seconds(line: str) -> Optional[float]:
+def get_hw_encoder() -> Optional[str]:
     """
-    ffmpeg 로그 라인에서 time=HH:MM:SS.ss 를 찾아서 초(float)로 변환
-    예: '... time=00:10:32.45 bitrate=...' -> 632.45
+    ffmpeg가 지원하는 하드웨어 H.264 인코더를 찾는다.
+    GPU 전용 인코딩 엔진(NVENC/QuickSync 등)은 libx264 veryfast보다
+    보통 수 배 빠르므로 있으면 우선 사용하고, 없으면 None(libx264 폴백).
     """
-    m = time_pattern.search(line)
-    if not m:
+    global _hw_encoder, _hw_encoder_probed
+    if _hw_encoder_probed:
+        return _hw_encoder
+    _hw_encoder_probed = True
+    try:
+        out = subprocess.run(
+            [FFMPEG_BIN, "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+        ).stdout
+    except OSError:
         return None
-    h = int(m.group(1))
-    m_ = int(m.group(2))
-    s = float(m.group(3))
-    return h * 3600 + m_ * 60 + s
+    for enc in ("h264_nvenc", "h264_qsv", "h264_videotoolbox", "h264_vaapi"):
+        if enc in out:
+            _hw_encoder = enc
+            print(f"[INFO] 하드웨어 인코더 사용: {enc}")
+            break
+    return _hw_encoder
+
 
+# x264 asm 오버라이드 (기동 후 첫 인코딩 때 한 번만 판정)
+_x264_asm: Optional[str] = None
+_x264_asm_probed = False
 
-def encode_video_to_target_size(input_path: Path, output_path: Path, target_size_mb: int) -> None:
-    """입력 동영상을 target_size_mb 이하가 되도록 재인코딩 + 1080p 제한 + ffmpeg 진행률(10% 단위) 표시"""
+
+def get_x264_asm_override() -> Optional[str]:
+    """
+    호스트 CPU에 맞는 x264 asm 명령어 집합 오버라이드.
+    X264_ASM 환경변수가 있으면 그대로 쓰고, 없으면 Zen1/Zen2(fam 17h)에서만
+    AVX2/BMI2 경로가 느린 문제를 피하려 'avx'로 제한한다.
+    그 외 CPU는 x264 자동 탐지에 맡김(None).
+    """
+    global _x264_asm, _x264_asm_probed
+    if _x264_asm_probed:
+        return _x264_asm
+    _x264_asm_probed = True
+
+    env = os.getenv("X264_ASM")
+    if env:
+        _x264_asm = env
+        return _x264_asm
+
+    try:
+        cpuinfo = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return None
+    if "AuthenticAMD" in cpuinfo and "cpu family\t: 23" in cpuinfo:
+        _x264_asm = "avx"
+        print("[INFO] Zen1/Zen2 감지 -> x264 asm=avx 제한")
+    return _x264_asm
+
+
+def encode_video_to_target_size(
+    input_path,
+    output_path: Path,
+    target_size_mb: int,
+    display_name: Optional[str] = None,
+) -> None:
+    """
+    입력 동영상을 target_size_mb 이하가 되도록 재인코딩 + 1080p 제한 + ffmpeg 진행률(10% 단위) 표시.
+    input_path는 로컬 Path뿐 아니라 URL(임시 링크 스트리밍)도 허용.
+    """
+    name = display_name or Path(str(input_path)).name
     duration = get_video_duration(input_path)
     total_kbps = calc_bitrate_kbps(duration, target_size_mb, SAFETY_MARGIN)
 
@@ -119,49 +201,109 @@ def encode_video_to_target_size(input_path: Path, output_path: Path, target_size
     v_bitrate = max(int(total_kbps * 0.8), 300)
     a_bitrate = max(int(total_kbps * 0.2), 64)
 
-    print(f"[ENCODE] {input_path.name}: duration={duration:.1f}s, total~{total_kbps}kbps (v={v_bitrate}, a={a_bitrate})")
+    print(f"[ENCODE] {name}: duration={duration:.1f}s, total~{total_kbps}kbps (v={v_bitrate}, a={a_bitrate})")
 
     # 1080p로 리사이즈: 세로 1080, 가로는 비율 유지(-2)
+    encoder = get_hw_encoder()
+    if encoder == "h264_nvenc":
+        video_args = [
+            "-vf", "scale=-2:1080",
+            "-c:v", "h264_nvenc",
+            "-preset", "p4",
+            "-rc", "vbr",
+            "-b:v", f"{v_bitrate}k",
+            "-maxrate", f"{int(v_bitrate * 1.5)}k",
+            "-bufsize", f"{v_bitrate * 2}k",
+        ]
+    elif encoder == "h264_vaapi":
+        video_args = [
+            "-vf", "format=nv12,hwupload,scale_vaapi=-2:1080",
+            "-vaapi_device", "/dev/dri/renderD128",
+            "-c:v", "h264_vaapi",
+            "-b:v", f"{v_bitrate}k",
+        ]
+    elif encoder:  # h264_qsv / h264_videotoolbox
+        video_args = [
+            "-vf", "scale=-2:1080",
+            "-c:v", encoder,
+            "-b:v", f"{v_bitrate}k",
+            "-maxrate", f"{int(v_bitrate * 1.2)}k",
+            "-bufsize", f"{v_bitrate * 2}k",
+        ]
+    else:
+        # 레이트컨트롤이 -b:v로 고정돼 있어 lookahead/트렐리스류는 줄여도 무방.
+        # sliced-threads는 쓰지 않는다: x264-params가 -thread_type frame을
+        # 덮어써서 프레임 스레딩이 무효가 된다.
+        x264_params = ["sync-lookahead=0", "rc-lookahead=0"]
+        asm = get_x264_asm_override()
+        if asm:
+            x264_params.append(f"asm={asm}")
+        video_args = [
+            "-vf", "scale=-2:1080",
+            "-c:v", "libx264",
+            "-preset", X264_PRESET,
+            "-tune", "fastdecode",
+            "-b:v", f"{v_bitrate}k",
+            # VBV 상한으로 순간 비트레이트 폭주를 막아 1-pass로도
+            # 목표 용량 초과(재인코딩 재시도)를 거의 없앤다
+            "-maxrate", f"{int(v_bitrate * 1.2)}k",
+            "-bufsize", f"{v_bitrate * 2}k",
+            "-x264-params", ":".join(x264_params),
+        ]
+
+    # 동시 인코딩 수만큼 코어를 나눠 써서 과구독을 피함 (프레임 스레딩)
+    threads = max(2, (os.cpu_count() or 4) // MAX_ENCODE_JOBS)
+
     cmd = [
         FFMPEG_BIN,
         "-y",
         "-i", str(input_path),
-        "-vf", "scale=-2:1080",
-        "-c:v", "libx264",
-        "-preset", "veryfast",  # 속도/품질 균형용
-        "-b:v", f"{v_bitrate}k",
+        *video_args,
+        "-threads", str(threads),
+        "-thread_type", "frame",
         "-c:a", "aac",
         "-b:a", f"{a_bitrate}k",
         "-movflags", "+faststart",
+        # 진행률은 5초마다 key=value 형식으로 stdout에 받는다.
+        # 한 줄씩 쏟아지는 stats 로그 + 정규식 파싱보다 훨씬 싸다.
+        "-progress", "pipe:1",
+        "-nostats",
+        "-stats_period", "5",
         str(output_path),
     ]
 
-    process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
-        errors="ignore",
-        bufsize=1,
-    )
-
-    last_bucket = -1  # 0~10 (0~100%)
-    try:
-        assert process.stdout is not None
-        for line in process.stdout:
-            line = line.rstrip("\n")
-            t = _parse_ffmpeg_time_to_seconds(line)
-            if t is not None and duration > 0:
-                percent = int((t / duration) * 100)
-                bucket = percent // 10
-                if bucket != last_bucket and 0 <= bucket <= 10:
-                    last_bucket = bucket
-                    print(f"[ENCODE][{input_path.name}] 진행률: {bucket * 10}% ({t:.1f}s / {duration:.1f}s)")
-        process.wait()
-    finally:
-        if process.poll() is None:
-            process.kill()
+    with _encode_semaphore:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            bufsize=1,
+        )
+
+        last_bucket = -1  # 0~10 (0~100%)
+        try:
+            assert process.stdout is not None
+            for line in process.stdout:
+                # out_time_ms는 이름과 달리 마이크로초 단위
+                if not line.startswith("out_time_ms="):
+                    continue
+                try:
+                    t = int(line[len("out_time_ms="):]) / 1_000_000
+                except ValueError:
+                    continue
+                if duration > 0:
+                    percent = int((t / duration) * 100)
+                    bucket = percent // 10
+                    if bucket != last_bucket and 0 <= bucket <= 10:
+                        last_bucket = bucket
+                        print(f"[ENCODE][{name}] 진행률: {bucket * 10}% ({t:.1f}s / {duration:.1f}s)")
+            process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
 
     if process.returncode != 0:
         raise RuntimeError(f"ffmpeg 인코딩 실패 (returncode={process.returncode})")
@@ -171,57 +313,118 @@ def encode_video_to_target_size(input_path: Path, output_path: Path, target_size
 
 
 # ===== 파일명 / 폴더 경로 변환 =====
-def flat_name_from_dropbox_path(path_display: str) -> str:
+# 경로 분해는 파일당 한 번만 하고(parts), 아래 헬퍼들은 그 리스트를 받는다.
+def flat_name_from_parts(parts: list[str]) -> str:
     """
     예:
-      '/디자인/2D 모션그래픽 디자인/TAC_장준석/최종편집영상/W4/2.mp4'
+      ['디자인', '2D 모션그래픽 디자인', 'TAC_장준석', '최종편집영상', 'W4', '2.mp4']
     -> '디자인_2D 모션그래픽 디자인_TAC_장준석_W4_2.mp4'
     """
-    p = path_display.strip("/")
-    parts = p.split("/")
-
     *dirs, filename = parts
-    name_without_ext, _ = os.path.splitext(filename)
+    i = filename.rfind(".")
+    name_without_ext = filename[:i] if i > 0 else filename
 
     # '최종편집영상' 폴더는 파일명에서 제외
     dirs = [d for d in dirs if d != "최종편집영상"]
 
-    all_parts = dirs + [name_without_ext]
-    flat = "_".join(all_parts)
-
-    return flat + ".mp4"
+    return "_".join(dirs + [name_without_ext]) + ".mp4"
 
 
-def gdrive_folder_parts_from_dropbox(path_display: str) -> list[str]:
+def gdrive_folder_parts(parts: list[str]) -> list[str]:
     """
     인코딩본 저장용 GDrive 폴더 경로:
-      '/디자인/그래픽디자인/MPC_임수연/최종편집영상/W1/2.mp4'
+      ['디자인', '그래픽디자인', 'MPC_임수연', '최종편집영상', 'W1', '2.mp4']
     -> ['디자인', '그래픽디자인', 'MPC_임수연', 'encoded']
     """
-    parts = [p for p in path_display.split("/") if p]
-
     if "최종편집영상" not in parts:
-        raise ValueError(f"'최종편집영상' 폴더를 찾을 수 없습니다: {path_display}")
+        raise ValueError(f"'최종편집영상' 폴더를 찾을 수 없습니다: {'/'.join(parts)}")
 
     idx = parts.index("최종편집영상")
-    prefix = parts[:idx]
-
-    return prefix + ["encoded"]
+    return parts[:idx] + ["encoded"]
 
 
-def gdrive_raw_folder_parts_from_dropbox(path_display: str) -> list[str]:
+def gdrive_raw_folder_parts(parts: list[str]) -> list[str]:
     """
     원본 저장용 GDrive 폴더 경로:
-      '/디자인/그래픽디자인/MPC_임수연/최종편집영상/W1/2.mp4'
+      ['디자인', '그래픽디자인', 'MPC_임수연', '최종편집영상', 'W1', '2.mp4']
     -> ['디자인', '그래픽디자인', 'MPC_임수연', '최종편집영상', 'W1']
     (Dropbox와 동일한 폴더 구조를 미러링)
     """
-    parts = [p for p in path_display.split("/") if p]
     if len(parts) < 2:
-        raise ValueError(f"경로가 너무 짧습니다: {path_display}")
+        raise ValueError(f"경로가 너무 짧습니다: {'/'.join(parts)}")
     return parts[:-1]  # 마지막 파일명만 제거
 
 
+# 분할 다운로드: 이 크기 이상이면 Range 요청 여러 개로 나눠 받음
+PARALLEL_DL_MIN_MB = 64
+PARALLEL_DL_RANGES = 4
+
+
+def download_file_unbuffered(dbx: dropbox.Dropbox, path_display: str, local_path: Path) -> None:
+    """
+    단일 스트림 다운로드를 os.write로 직접 써서 stdio 버퍼 복사를 없앤다.
+    (files_download_to_file은 내부적으로 버퍼드 파일 객체를 쓴다)
+    """
+    _meta, res = dbx.files_download(path_display)
+    fd = os.open(str(local_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        for chunk in res.iter_content(1 << 20):
+            if chunk:
+                os.write(fd, chunk)
+    finally:
+        os.close(fd)
+        res.close()
+
+
+def download_file_parallel_ranges(
+    dbx: dropbox.Dropbox,
+    path_display: str,
+    local_path: Path,
+    size_bytes: int,
+    num_ranges: int = PARALLEL_DL_RANGES,
+) -> None:
+    """
+    큰 파일을 HTTP Range 요청 K개로 나눠 병렬로 받는다.
+    단일 TCP 스트림의 한계를 피해 고지연 회선에서 다운로드가 2~4배 빨라짐.
+    SDK가 Range 헤더를 직접 지원하지 않아 저수준 세션을 쓰고,
+    실패하면 호출부에서 download_file_unbuffered로 폴백한다.
+    """
+    dbx.check_and_refresh_access_token()
+    url = "https://content.dropboxapi.com/2/files/download"
+    base_headers = {
+        "Authorization": f"Bearer {dbx._oauth2_access_token}",
+        # 헤더는 ASCII만 허용되므로 한글 경로는 \\uXXXX로 이스케이프됨
+        "Dropbox-API-Arg": json.dumps({"path": path_display}),
+    }
+
+    fd = os.open(str(local_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        os.ftruncate(fd, size_bytes)
+        step = (size_bytes + num_ranges - 1) // num_ranges
+        ranges = [
+            (i * step, min(size_bytes, (i + 1) * step) - 1)
+            for i in range(num_ranges)
+            if i * step < size_bytes
+        ]
+
+        def _fetch(rng: Tuple[int, int]) -> None:
+            start, end = rng
+            headers = dict(base_headers, Range=f"bytes={start}-{end}")
+            resp = dbx._session.post(url, headers=headers, stream=True)
+            resp.raise_for_status()
+            offset = start
+            for chunk in resp.iter_content(1 << 20):
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            # pool.map은 제너레이터라 소진해야 예외가 올라옴
+            for _ in pool.map(_fetch, ranges):
+                pass
+    finally:
+        os.close(fd)
+
+
 # ===== Dropbox 관련 =====
 def get_dropbox_client() -> dropbox.Dropbox:
     """
@@ -257,7 +460,7 @@ def list_dropbox_files_recursive(dbx: dropbox.Dropbox, root_path: str) -> List[F
 
 
 # ===== Google Drive 관련 =====
-def get_gdrive_service():
+def load_gdrive_credentials() -> Credentials:
     creds = None
     token_path = "token.json"
 
@@ -274,25 +477,167 @@ def get_gdrive_service():
         with open(token_path, "w") as token:
             token.write(creds.to_json())
 
-    service = build("drive", "v3", credentials=creds)
-    return service
+    return creds
+
+
+def get_gdrive_service(creds: Optional[Credentials] = None):
+    """
+    keep-alive되는 AuthorizedHttp 하나를 서비스에 물려준다.
+    호출마다 새 소켓을 여는 대신 TLS 커넥션을 재사용.
+    (httplib2는 스레드 안전하지 않으므로 스레드마다 서비스를 따로 만들 것)
+    """
+    if creds is None:
+        creds = load_gdrive_credentials()
+    authed_http = AuthorizedHttp(creds, http=httplib2.Http())
+    return build("drive", "v3", http=authed_http)
+
+
+# 조회 쿼리 템플릿 (루프마다 f-string 재조립 대신 .format)
+_FOLDER_Q = (
+    "name = '{name}' and "
+    "mimeType = 'application/vnd.google-apps.folder' and "
+    "'{parent}' in parents and trashed = false"
+)
+_FILE_Q = "name = '{name}' and '{parent}' in parents and trashed = false"
+
+# (parent_id, name) -> folder_id / file_id 캐시.
+# 시작 시 prime_folder_cache가 채우고, 이후 생성/조회 결과도 들어간다.
+_folder_cache: dict[Tuple[str, str], str] = {}
+_file_cache: dict[Tuple[str, str], str] = {}
+
+# 폴더 캐시를 실행 간에 재사용하기 위한 디스크 저장 파일과 changes 토큰.
+# 트리가 그대로면 다음 실행의 폴더 탐색은 네트워크 호출 0회가 된다.
+FOLDER_CACHE_FILE = Path(__file__).parent / ".gdrive_folder_cache.json"
+_folder_cache_page_token: Optional[str] = None
+
+
+def _snapshot_folder_cache_token(service) -> None:
+    """
+    changes 추적 시작 토큰을 받아 둔다. 폴더 목록 조회 '전'에 호출해야
+    조회 중에 생긴 변경이 다음 실행의 delta에 잡힌다.
+    """
+    global _folder_cache_page_token
+    res = service.changes().getStartPageToken(
+        driveId=GDRIVE_ROOT_FOLDER_ID, supportsAllDrives=True
+    ).execute()
+    _folder_cache_page_token = res["startPageToken"]
+
+
+def load_folder_cache(service) -> bool:
+    """
+    이전 실행이 저장한 폴더 캐시를 읽고, 저장 이후 변경된 항목만
+    changes API로 무효화한다. True를 반환하면 prime_folder_cache 생략 가능.
+    """
+    global _folder_cache_page_token
+    try:
+        with open(FOLDER_CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        token = data.get("start_page_token")
+        entries = data.get("entries", [])
+        if not token or not entries:
+            return False
+
+        # 저장 시점 이후 바뀐 파일 id 수집
+        changed: set[str] = set()
+        page_token = token
+        while True:
+            res = service.changes().list(
+                pageToken=page_token,
+                driveId=GDRIVE_ROOT_FOLDER_ID,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+                fields="nextPageToken, newStartPageToken, changes(fileId)",
+                pageSize=1000,
+            ).execute()
+            for ch in res.get("changes", []):
+                fid = ch.get("fileId")
+                if fid:
+                    changed.add(fid)
+            if res.get("nextPageToken"):
+                page_token = res["nextPageToken"]
+            else:
+                _folder_cache_page_token = res.get("newStartPageToken", token)
+                break
+
+        # 자기 자신 또는 부모가 바뀐 캐시 항목은 버린다 -> 개별 조회로 보충됨
+        dropped = 0
+        for parent, name, fid in entries:
+            if fid in changed or parent in changed:
+                dropped += 1
+                continue
+            _folder_cache[(parent, name)] = fid
+        print(f"[INFO] GDrive 폴더 캐시 로드: {len(_folder_cache)}개 (무효화 {dropped}개)")
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"[WARN] 폴더 캐시 로드 실패 -> 전체 조회로 진행: {type(e).__name__}: {e}")
+        _folder_cache.clear()
+        _folder_cache_page_token = None
+        return False
+
+
+def save_folder_cache() -> None:
+    """현재 폴더 캐시와 changes 토큰을 다음 실행을 위해 저장한다."""
+    if _folder_cache_page_token is None or not _folder_cache:
+        return
+    try:
+        data = {
+            "start_page_token": _folder_cache_page_token,
+            "entries": [[p, n, fid] for (p, n), fid in _folder_cache.items()],
+        }
+        tmp = FOLDER_CACHE_FILE.with_suffix(".json.part")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, FOLDER_CACHE_FILE)
+        print(f"[INFO] GDrive 폴더 캐시 저장: {len(_folder_cache)}개")
+    except Exception as e:
+        print(f"[WARN] 폴더 캐시 저장 실패: {type(e).__name__}: {e}")
+
+
+def prime_folder_cache(service) -> None:
+    """
+    공유드라이브의 폴더 전체를 페이지네이션 한 번으로 읽어 캐시를 채운다.
+    파일마다 경로 깊이만큼 files.list를 치던 것이 전부 캐시 히트가 됨.
+    """
+    page_token = None
+    while True:
+        res = service.files().list(
+            q="mimeType = 'application/vnd.google-apps.folder' and trashed = false",
+            fields="nextPageToken, files(id, name, parents)",
+            spaces="drive",
+            corpora="drive",
+            driveId=GDRIVE_ROOT_FOLDER_ID,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            pageSize=1000,
+            pageToken=page_token,
+        ).execute()
+        for f in res.get("files", []):
+            for parent in f.get("parents", []):
+                _folder_cache[(parent, f["name"])] = f["id"]
+        page_token = res.get("nextPageToken")
+        if not page_token:
+            break
+    print(f"[INFO] GDrive 폴더 캐시 구축: {len(_folder_cache)}개")
 
 
 def get_or_create_folder(service, parent_id: str, name: str) -> str:
-    query = (
-        f"name = '{name}' and "
-        f"mimeType = 'application/vnd.google-apps.folder' and "
-        f"'{parent_id}' in parents and trashed = false"
-    )
+    cached = _folder_cache.get((parent_id, name))
+    if cached:
+        return cached
+
     res = service.files().list(
-        q=query,
-        fields="files(id, name)",
+        q=_FOLDER_Q.format(parent=parent_id, name=name),
+        fields="files(id)",
+        pageSize=1,
         spaces="drive",
         includeItemsFromAllDrives=True,
         supportsAllDrives=True,
     ).execute()
     files = res.get("files", [])
     if files:
+        _folder_cache[(parent_id, name)] = files[0]["id"]
         return files[0]["id"]
 
     file_metadata = {
@@ -305,6 +650,7 @@ def get_or_create_folder(service, parent_id: str, name: str) -> str:
         fields="id",
         supportsAllDrives=True,
     ).execute()
+    _folder_cache[(parent_id, name)] = folder["id"]
     return folder["id"]
 
 
@@ -316,23 +662,76 @@ def get_or_create_path(service, root_id: str, parts: list[str]) -> str:
 
 
 def find_file_in_folder(service, parent_id: str, name: str) -> Optional[str]:
-    query = (
-        f"name = '{name}' and "
-        f"'{parent_id}' in parents and trashed = false"
-    )
+    cached = _file_cache.get((parent_id, name))
+    if cached:
+        return cached
+
     res = service.files().list(
-        q=query,
-        fields="files(id, name)",
+        q=_FILE_Q.format(parent=parent_id, name=name),
+        fields="files(id)",
+        pageSize=1,
         spaces="drive",
         includeItemsFromAllDrives=True,
         supportsAllDrives=True,
     ).execute()
     files = res.get("files", [])
     if files:
+        # 부재(None)는 캐시하지 않음: 재시도 중 업로드로 상태가 바뀔 수 있음
+        _file_cache[(parent_id, name)] = files[0]["id"]
         return files[0]["id"]
     return None
 
 
+def _resolve_path_from_cache(root_id: str, parts: list[str]) -> Optional[str]:
+    """폴더 캐시만으로 경로를 해석. 중간에 모르는 폴더가 있으면 None."""
+    current = root_id
+    for name in parts:
+        current = _folder_cache.get((current, name))
+        if current is None:
+            return None
+    return current
+
+
+# batch 서브요청 개수 (100까지 허용되지만 큰 값은 500이 잦음)
+GDRIVE_BATCH_SIZE = 25
+
+
+def prefetch_file_checks(service, pairs: list[Tuple[str, str]]) -> None:
+    """
+    (parent_id, name) 존재 확인 여러 건을 batch HTTP 요청으로 묶는다.
+    서브요청 25개가 multipart 한 번의 왕복으로 처리되고 결과는
+    _file_cache로 들어가 루프의 find_file_in_folder가 캐시 히트한다.
+    실패한 서브요청은 그냥 비워 두면 개별 조회로 폴백된다.
+    """
+    keyed = {str(i): pair for i, pair in enumerate(pairs)}
+
+    def _cb(request_id, response, exception):
+        if exception is not None or response is None:
+            return
+        files = response.get("files", [])
+        if files:
+            parent_id, name = keyed[request_id]
+            _file_cache[(parent_id, name)] = files[0]["id"]
+
+    items = list(keyed.items())
+    for start in range(0, len(items), GDRIVE_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=_cb)
+        for rid, (parent_id, name) in items[start:start + GDRIVE_BATCH_SIZE]:
+            safe_name = name.replace("'", "\\'")
+            batch.add(
+                service.files().list(
+                    q=_FILE_Q.format(parent=parent_id, name=safe_name),
+                    fields="files(id)",
+                    pageSize=1,
+                    spaces="drive",
+                    includeItemsFromAllDrives=True,
+                    supportsAllDrives=True,
+                ),
+                request_id=rid,
+            )
+        batch.execute()
+
+
 def upload_file_to_gdrive(service, local_path: Path, parent_id: str, target_name: str, kind: str) -> str:
     """
     로컬 파일을 GDrive에 업로드하면서 10% 단위로 진행률 출력.
@@ -342,19 +741,126 @@ def upload_file_to_gdrive(service, local_path: Path, parent_id: str, target_name
         "name": target_name,
         "parents": [parent_id],
     }
-    media = MediaFileUpload(str(local_path), resumable=True)
+    # io.FileIO는 버퍼 없는 raw 파일 객체 -> stdio 버퍼 거치는 복사 1회 제거
+    fh = io.FileIO(str(local_path), "rb")
+    try:
+        media = MediaIoBaseUpload(
+            fh,
+            mimetype="application/octet-stream",
+            chunksize=UPLOAD_CHUNK_SIZE,
+            resumable=True,
+        )
+
+        request = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields="id",
+            supportsAllDrives=True,
+        )
+
+        print(f"[GDRIVE-{kind}] 업로드 시작: {target_name}")
+        response = None
+        last_bucket = -1  # 0~10 (0~100%)
+
+        while response is None:
+            status, response = request.next_chunk()
+            if status is not None:
+                percent = int(status.progress() * 100)
+                bucket = percent // 10
+                if bucket != last_bucket and 0 <= bucket <= 10:
+                    last_bucket = bucket
+                    print(f"[UPLOAD-{kind}][{target_name}] 진행률: {bucket * 10}%")
+    finally:
+        fh.close()
+
+    file_id = response.get("id")
+    print(f"[GDRIVE-{kind}] 업로드 완료: {target_name} (id={file_id})")
+    return file_id
+
+
+class _SlidingWindowReader(io.RawIOBase):
+    """
+    비탐색(non-seekable) 다운로드 스트림을 MediaIoBaseUpload가 쓸 수 있게
+    감싼다. resumable 업로드는 '현재 청크 시작 위치'로만 seek하므로
+    직전 청크 한 개 분량만 메모리에 유지하면 된다(파일 전체 버퍼링 없음).
+    """
 
+    def __init__(self, raw, size_bytes: int):
+        self._raw = raw
+        self._size = size_bytes
+        self._buf = b""
+        self._buf_start = 0
+        self._pos = 0
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_END:
+            # MediaIoBaseUpload가 크기 확인용으로만 호출
+            self._pos = self._size + offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = offset
+        if self._pos < self._buf_start:
+            raise io.UnsupportedOperation(f"윈도 밖으로 되감기 불가: {self._pos} < {self._buf_start}")
+        return self._pos
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            n = self._size - self._pos
+        end = min(self._pos + n, self._size)
+        # 원본에서 부족한 만큼 순차로 읽어 윈도를 전진
+        while self._buf_start + len(self._buf) < end:
+            chunk = self._raw.read(1 << 20)
+            if not chunk:
+                break
+            self._buf += chunk
+        lo = self._pos - self._buf_start
+        data = self._buf[lo:lo + n]
+        self._pos += len(data)
+        # 직전 청크 경계 이전은 재시도에도 필요 없으므로 폐기
+        keep_from = self._pos - UPLOAD_CHUNK_SIZE
+        if keep_from > self._buf_start:
+            drop = keep_from - self._buf_start
+            self._buf = self._buf[drop:]
+            self._buf_start = keep_from
+        return data
+
+
+def stream_dropbox_to_gdrive(
+    dbx: dropbox.Dropbox,
+    service,
+    path_display: str,
+    parent_id: str,
+    target_name: str,
+    size_bytes: int,
+) -> str:
+    """
+    Dropbox 다운로드 스트림을 로컬 디스크를 거치지 않고
+    GDrive resumable 업로드에 직결한다 (인코딩이 필요 없는 파일용).
+    """
+    _, res = dbx.files_download(path=path_display)
+    media = MediaIoBaseUpload(
+        _SlidingWindowReader(res.raw, size_bytes),
+        mimetype="video/mp4",
+        chunksize=UPLOAD_CHUNK_SIZE,
+        resumable=True,
+    )
     request = service.files().create(
-        body=file_metadata,
+        body={"name": target_name, "parents": [parent_id]},
         media_body=media,
         fields="id",
         supportsAllDrives=True,
     )
 
-    print(f"[GDRIVE-{kind}] 업로드 시작: {target_name}")
+    print(f"[GDRIVE-stream] 직통 업로드 시작: {target_name}")
     response = None
-    last_bucket = -1  # 0~10 (0~100%)
-
+    last_bucket = -1
     while response is None:
         status, response = request.next_chunk()
         if status is not None:
@@ -362,55 +868,54 @@ def upload_file_to_gdrive(service, local_path: Path, parent_id: str, target_name
             bucket = percent // 10
             if bucket != last_bucket and 0 <= bucket <= 10:
                 last_bucket = bucket
-                print(f"[UPLOAD-{kind}][{target_name}] 진행률: {bucket * 10}%")
+                print(f"[UPLOAD-stream][{target_name}] 진행률: {bucket * 10}%")
 
     file_id = response.get("id")
-    print(f"[GDRIVE-{kind}] 업로드 완료: {target_name} (id={file_id})")
+    print(f"[GDRIVE-stream] 직통 업로드 완료: {target_name} (id={file_id})")
     return file_id
 
 
 # ===== 업로드 워커 =====
-UploadTask = Tuple[str, str, str, str]  # (local_path, parent_id, filename, kind)
-STOP_SENTINEL: UploadTask = ("", "", "", "STOP")
+_upload_local = local()
 
 
-def uploader_worker(service, q: Queue):
-    while True:
-        local_path, parent_id, filename, kind = q.get()
-        if kind == "STOP":
-            q.task_done()
-            break
+def _get_upload_service(creds: Credentials):
+    # 풀 스레드마다 서비스 1개: 커넥션을 스레드 안에서 재사용 (httplib2 공유 금지)
+    service = getattr(_upload_local, "service", None)
+    if service is None:
+        service = get_gdrive_service(creds)
+        _upload_local.service = service
+    return service
 
-        path_obj = Path(local_path)
-        if not path_obj.exists():
-            print(f"[UPLOAD-{kind}][WARN] 로컬 파일이 존재하지 않습니다: {local_path}")
-            q.task_done()
-            continue
 
-        success = False
-        last_error: Optional[Exception] = None
+def upload_with_retry(creds: Credentials, local_path: str, parent_id: str, filename: str, kind: str) -> None:
+    service = _get_upload_service(creds)
 
-        for attempt in range(1, MAX_UPLOAD_RETRIES + 1):
-            try:
-                upload_file_to_gdrive(service, path_obj, parent_id, filename, kind)
-                success = True
-                break
-            except Exception as e:
-                last_error = e
-                print(f"[UPLOAD-{kind}][ERROR] {filename} 업로드 시도 {attempt}/{MAX_UPLOAD_RETRIES} 실패")
-                print(f"    {type(e).__name__}: {e}")
+    path_obj = Path(local_path)
+    if not path_obj.exists():
+        print(f"[UPLOAD-{kind}][WARN] 로컬 파일이 존재하지 않습니다: {local_path}")
+        return
 
-        if not success:
-            print(f"[UPLOAD-{kind}][GIVEUP] {filename} 업로드 포기")
-        else:
-            # 업로드 성공 시 로컬 파일 삭제
-            try:
-                path_obj.unlink(missing_ok=True)
-                print(f"[UPLOAD-{kind}] 로컬 파일 삭제: {local_path}")
-            except Exception as e:
-                print(f"[UPLOAD-{kind}][WARN] 로컬 파일 삭제 실패: {local_path} ({e})")
+    success = False
 
-        q.task_done()
+    for attempt in range(1, MAX_UPLOAD_RETRIES + 1):
+        try:
+            upload_file_to_gdrive(service, path_obj, parent_id, filename, kind)
+            success = True
+            break
+        except Exception as e:
+            print(f"[UPLOAD-{kind}][ERROR] {filename} 업로드 시도 {attempt}/{MAX_UPLOAD_RETRIES} 실패")
+            print(f"    {type(e).__name__}: {e}")
+
+    if not success:
+        print(f"[UPLOAD-{kind}][GIVEUP] {filename} 업로드 포기")
+    else:
+        # 업로드 성공 시 로컬 파일 삭제
+        try:
+            path_obj.unlink(missing_ok=True)
+            print(f"[UPLOAD-{kind}] 로컬 파일 삭제: {local_path}")
+        except Exception as e:
+            print(f"[UPLOAD-{kind}][WARN] 로컬 파일 삭제 실패: {local_path} ({e})")
 
 
 # ===== 전체 파이프라인 =====
@@ -427,7 +932,16 @@ def process_all():
             pass
 
     dbx = get_dropbox_client()
-    gdrive = get_gdrive_service()
+    gdrive_creds = load_gdrive_credentials()
+    gdrive = get_gdrive_service(gdrive_creds)
+
+    if not load_folder_cache(gdrive):
+        try:
+            _snapshot_folder_cache_token(gdrive)
+            prime_folder_cache(gdrive)
+        except Exception as e:
+            # 캐시는 최적화일 뿐이므로 실패해도 개별 조회로 진행
+            print(f"[WARN] 폴더 캐시 구축 실패 -> 개별 조회로 진행: {type(e).__name__}: {e}")
 
     # Dropbox 파일 목록 가져와서 path_display 기준으로 정렬 (가나다/알파벳 순)
     dbx_files = list_dropbox_files_recursive(dbx, DROPBOX_ROOT)
@@ -438,23 +952,59 @@ def process_all():
 
     video_exts = {".mp4", ".mov", ".mkv", ".avi", ".wmv"}
 
+    # 존재 확인 선조회: 폴더 경로가 캐시만으로 풀리는 파일은
+    # encoded/raw 존재 여부를 batch로 미리 받아 둔다.
+    if not DRY_RUN:
+        check_pairs: list[Tuple[str, str]] = []
+        for meta in dbx_files:
+            path_display = meta.path_display
+            if "(폐강" in path_display:
+                continue
+            parts = [p for p in path_display.split("/") if p]
+            if not parts or "최종편집영상" not in parts:
+                continue
+            filename = parts[-1]
+            i = filename.rfind(".")
+            if i <= 0 or filename[i:].lower() not in video_exts:
+                continue
+            try:
+                enc_parts = gdrive_folder_parts(parts)
+                raw_parts = gdrive_raw_folder_parts(parts)
+            except ValueError:
+                continue
+            enc_parent = _resolve_path_from_cache(GDRIVE_ROOT_FOLDER_ID, enc_parts)
+            raw_parent = _resolve_path_from_cache(GDRIVE_ROOT_FOLDER_ID, raw_parts)
+            if enc_parent:
+                check_pairs.append((enc_parent, flat_name_from_parts(parts)))
+            if raw_parent:
+                check_pairs.append((raw_parent, filename))
+        if check_pairs:
+            try:
+                prefetch_file_checks(gdrive, check_pairs)
+                print(f"[INFO] GDrive 존재 확인 배치 선조회: {len(check_pairs)}건")
+            except Exception as e:
+                print(f"[WARN] 배치 선조회 실패 -> 개별 조회로 진행: {type(e).__name__}: {e}")
+
     total_targets = 0
     skipped_closed = 0
     skipped_existing_encoded = 0
     skipped_existing_raw = 0
     failed_files = 0
 
-    # 업로드 큐 및 워커 스레드 준비
-    upload_queue: Queue[UploadTask] = Queue()
-    workers: list[Thread] = []
-    for _ in range(UPLOAD_WORKERS):
-        t = Thread(target=uploader_worker, args=(gdrive, upload_queue), daemon=True)
-        t.start()
-        workers.append(t)
+    # 업로드 풀 준비. 세마포어가 생산자(다운로드/인코딩 루프)를 backpressure해서
+    # 업로드가 밀려도 로컬 인코딩 결과물이 무한정 쌓이지 않게 한다.
+    upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    upload_slots = BoundedSemaphore(UPLOAD_WORKERS * 2)
+
+    def submit_upload(local_path: str, parent_id: str, filename: str, kind: str) -> None:
+        upload_slots.acquire()
+        fut = upload_pool.submit(upload_with_retry, gdrive_creds, local_path, parent_id, filename, kind)
+        fut.add_done_callback(lambda _f: upload_slots.release())
 
     for meta in dbx_files:
         path_display = meta.path_display
-        ext = Path(path_display).suffix.lower()
+        # 경로 분해는 여기서 한 번만
+        parts = [p for p in path_display.split("/") if p]
 
         # (폐강) 포함 경로는 아예 스킵
         if "(폐강" in path_display:
@@ -463,24 +1013,24 @@ def process_all():
             continue
 
         # 영상 파일만
+        raw_name = parts[-1] if parts else ""
+        dot = raw_name.rfind(".")
+        ext = raw_name[dot:].lower() if dot > 0 else ""
         if ext not in video_exts:
             continue
 
         # '최종편집영상' 폴더 아래만 대상
-        parts = path_display.split("/")
         if "최종편집영상" not in parts:
             continue
 
         total_targets += 1
 
         # 인코딩본 파일명 (flat)
-        flat_name = flat_name_from_dropbox_path(path_display)
-        # 원본 파일명 (드롭박스와 동일)
-        raw_name = Path(path_display).name
+        flat_name = flat_name_from_parts(parts)
 
         # GDrive 폴더 경로
-        encoded_folder_parts = gdrive_folder_parts_from_dropbox(path_display)
-        raw_folder_parts = gdrive_raw_folder_parts_from_dropbox(path_display)
+        encoded_folder_parts = gdrive_folder_parts(parts)
+        raw_folder_parts = gdrive_raw_folder_parts(parts)
 
         print("\n==============================")
         print(f"[PIPELINE] 대상 파일")
@@ -550,11 +1100,55 @@ def process_all():
                 else:
                     print(f"[INFO] Encoded + Raw 모두 업로드 필요")
 
+                # 3-0) 인코딩이 필요 없는 단독 업로드는 로컬 디스크를 아예
+                #      거치지 않고 Dropbox -> GDrive로 바로 스트리밍
+                orig_size_mb_meta = meta.size / (1024 * 1024)
+                stream_target: Optional[Tuple[str, str]] = None  # (parent_id, name)
+                if not encoded_required and raw_required:
+                    stream_target = (gdrive_raw_parent_id, raw_name)
+                elif encoded_required and not raw_required and orig_size_mb_meta <= TARGET_SIZE_MB:
+                    # 목표 용량 이하면 원본이 그대로 Encoded가 됨
+                    stream_target = (gdrive_encoded_parent_id, flat_name)
+                if stream_target is not None:
+                    try:
+                        stream_dropbox_to_gdrive(
+                            dbx, gdrive, path_display, stream_target[0], stream_target[1], int(meta.size)
+                        )
+                        success = True
+                        break
+                    except Exception as e:
+                        print(f"[WARN] 직통 업로드 실패 -> 다운로드 경로로 폴백: {type(e).__name__}: {e}")
+
+                # 3-1) Encoded만 필요하고 인코딩이 확실하면 다운로드-인코딩 융합:
+                #      임시 링크 URL을 ffmpeg가 직접 읽으면서 인코딩하므로
+                #      원본을 디스크에 쓰고 다시 읽는 패스가 통째로 사라진다.
+                if encoded_required and not raw_required and (meta.size / (1024 * 1024)) > TARGET_SIZE_MB:
+                    stream_encoded = False
+                    try:
+                        link = dbx.files_get_temporary_link(path_display).link
+                        print(f"[STEP] 임시 링크 스트리밍 인코딩 시작 (원본 저장 생략)")
+                        encode_video_to_target_size(link, local_out, TARGET_SIZE_MB, display_name=flat_name)
+                        stream_encoded = True
+                    except Exception as e:
+                        print(f"[WARN] 스트리밍 인코딩 실패 -> 다운로드 경로로 폴백: {type(e).__name__}: {e}")
+                    if stream_encoded:
+                        submit_upload(str(local_out), gdrive_encoded_parent_id, flat_name, "encoded")
+                        print(f"[QUEUE] Encoded 업로드 대기열 추가: {flat_name}")
+                        success = True
+                        break
+
                 # 3) Dropbox -> 로컬 다운로드 (어느 한쪽이라도 필요하면)
+                # 스트리밍 + os.write 직접 쓰기라 수백 MB짜리 영상을
+                # 통째로 메모리에 올리지 않음
                 print(f"[STEP] Dropbox에서 다운로드 중 -> {local_in}")
-                with open(local_in, "wb") as f:
-                    _, res = dbx.files_download(path=path_display)
-                    f.write(res.content)
+                if meta.size >= PARALLEL_DL_MIN_MB * 1024 * 1024:
+                    try:
+                        download_file_parallel_ranges(dbx, path_display, local_in, int(meta.size))
+                    except Exception as e:
+                        print(f"[WARN] 분할 다운로드 실패 -> 단일 스트림으로 폴백: {type(e).__name__}: {e}")
+                        download_file_unbuffered(dbx, path_display, local_in)
+                else:
+                    download_file_unbuffered(dbx, path_display, local_in)
                 print(f"[STEP] 다운로드 완료")
 
                 # 4) 원본 파일 크기 검사
@@ -572,8 +1166,16 @@ def process_all():
                             # Raw도 필요하므로, Raw는 local_in, Encoded는 복사본 사용
                             raw_local_path = local_in
                             enc_local_path = local_out
-                            shutil.copy2(local_in, enc_local_path)
-                            print(f"[INFO] 원본이 목표 용량 이하 -> 인코딩 생략, Encoded용 파일 복사 생성: {enc_local_path}")
+                            # 하드링크면 수백 MB 복사 없이 같은 inode를 공유한다.
+                            # 업로드 워커가 각자 unlink해도 마지막 쪽에서만 실제 삭제됨.
+                            enc_local_path.unlink(missing_ok=True)
+                            try:
+                                os.link(local_in, enc_local_path)
+                                print(f"[INFO] 원본이 목표 용량 이하 -> 인코딩 생략, Encoded용 하드링크 생성: {enc_local_path}")
+                            except OSError:
+                                # 하드링크 미지원 파일시스템이면 복사로 폴백
+                                shutil.copyfile(local_in, enc_local_path)
+                                print(f"[INFO] 원본이 목표 용량 이하 -> 인코딩 생략, Encoded용 파일 복사 생성: {enc_local_path}")
                         else:
                             # Raw는 이미 GDrive에 존재, Encoded만 필요 → 원본을 Encoded로 사용
                             enc_local_path = local_in
@@ -597,11 +1199,11 @@ def process_all():
 
                 # 5) 업로드 작업 큐에 추가
                 if raw_required and raw_local_path is not None:
-                    upload_queue.put((str(raw_local_path), gdrive_raw_parent_id, raw_name, "raw"))
+                    submit_upload(str(raw_local_path), gdrive_raw_parent_id, raw_name, "raw")
                     print(f"[QUEUE] Raw 업로드 대기열 추가: {raw_name}")
 
                 if encoded_required and enc_local_path is not None:
-                    upload_queue.put((str(enc_local_path), gdrive_encoded_parent_id, flat_name, "encoded"))
+                    submit_upload(str(enc_local_path), gdrive_encoded_parent_id, flat_name, "encoded")
                     print(f"[QUEUE] Encoded 업로드 대기열 추가: {flat_name}")
 
                 # 여기까지 오면 다운로드/인코딩 단계는 성공으로 간주
@@ -634,15 +1236,11 @@ def process_all():
             if last_error:
                 print(f"      마지막 에러: {type(last_error).__name__}: {last_error}")
 
-    # 업로드 큐가 모두 비워질 때까지 대기
+    # 제출된 업로드가 모두 끝날 때까지 대기 (sentinel 불필요)
     print("\n[WAIT] 모든 업로드 작업 완료 대기 중...")
-    upload_queue.join()
+    upload_pool.shutdown(wait=True)
 
-    # 워커 종료 신호 보내기
-    for _ in workers:
-        upload_queue.put(STOP_SENTINEL)
-    for t in workers:
-        t.join()
+    save_folder_cache()
 
     print(f"\n[DONE] 총 대상 파일 수: {total_targets}")
     print(f"[DONE] (폐강)으로 스킵된 파일 수: {skipped_closed}")
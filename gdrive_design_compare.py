@@ -22,8 +22,11 @@ import argparse
 import csv
 import os
 import random
+import re
+import sqlite3
+import threading
 import time
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import PurePosixPath, Path
 from typing import Dict, List, Optional, Tuple, Set, Iterable, Union
@@ -64,6 +67,9 @@ GDRIVE_TIMEOUT_SECONDS = 60
 GDRIVE_MAX_RETRIES = 3
 GDRIVE_RETRY_DELAY_SECONDS = 3
 
+# files.list 한 번에 묶을 부모 폴더 수 (URL 길이 한계 때문에 ~50이 안전선)
+GDRIVE_PARENTS_PER_QUERY = 50
+
 
 # -----------------------
 # Helpers
@@ -72,10 +78,46 @@ def _escape_drive_q(s: str) -> str:
     return s.replace("'", "\\'")
 
 
-def _sleep_with_backoff(base_delay: float, attempt: int, *, cap: float = 60.0) -> None:
-    expo = min(cap, base_delay * (2 ** max(0, attempt - 1)))
-    jitter = random.uniform(0, 0.25 * expo)
-    time.sleep(expo + jitter)
+def _sleep_with_backoff(base_delay: float, prev_delay: float, *, cap: float = 60.0) -> float:
+    """
+    decorrelated jitter: sleep = min(cap, uniform(base, prev*3)).
+    폭이 좁은 expo+0.25 지터는 워커 여러 개가 같이 429를 맞으면
+    다음 재시도도 같이 몰리는데, 이 방식은 재시도 시점을 서로 흩는다.
+    반환한 값을 다음 호출의 prev_delay로 넘긴다.
+    """
+    delay = min(cap, random.uniform(base_delay, prev_delay * 3))
+    time.sleep(delay)
+    return delay
+
+
+def _retry_after_seconds(e: Exception) -> Optional[float]:
+    """429/503 응답의 Retry-After 헤더 값(초). 없으면 None."""
+    if not isinstance(e, HttpError):
+        return None
+    resp = getattr(e, "resp", None)
+    if resp is None:
+        return None
+    try:
+        val = resp.get("retry-after")
+    except Exception:
+        return None
+    if not val:
+        return None
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+
+_TRANSIENT_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# 리터럴 교대는 re 엔진이 한 번의 스캔으로 처리한다
+# (마커 11개를 각각 in으로 훑는 것보다 싸고, 재시도 폭주 때 누적됨)
+_TRANSIENT_RE = re.compile(
+    "connection reset|connection aborted|timed out|timeout|temporarily unavailable"
+    "|remote host|10053|10054|tls|ssl|chunkedencodingerror|incompleteread",
+    re.IGNORECASE,
+)
 
 
 def _is_transient_error(e: Exception) -> bool:
@@ -83,28 +125,14 @@ def _is_transient_error(e: Exception) -> bool:
         return True
     if isinstance(e, HttpError):
         status = getattr(getattr(e, "resp", None), "status", None)
-        if status in (429, 500, 502, 503, 504):
+        if status in _TRANSIENT_STATUS:
             return True
-    msg = str(e).lower()
-    transient_markers = [
-        "connection reset",
-        "connection aborted",
-        "timed out",
-        "timeout",
-        "temporarily unavailable",
-        "remote host",
-        "10053",
-        "10054",
-        "tls",
-        "ssl",
-        "chunkedencodingerror",
-        "incompleteread",
-    ]
-    return any(m in msg for m in transient_markers)
+    return _TRANSIENT_RE.search(str(e)) is not None
 
 
 def _gdrive_execute_with_retry(request, *, desc: str, max_retries: int, base_delay: int) -> dict:
     last_err: Optional[Exception] = None
+    prev_delay = float(base_delay)
     for attempt in range(1, max_retries + 1):
         try:
             return request.execute()
@@ -115,7 +143,13 @@ def _gdrive_execute_with_retry(request, *, desc: str, max_retries: int, base_del
             print(f"[GDRIVE-RETRY] {desc} 시도 {attempt}/{max_retries} 실패: {type(e).__name__}: {e}")
             if attempt >= max_retries or not _is_transient_error(e):
                 raise
-            _sleep_with_backoff(base_delay, attempt)
+            # 서버가 Retry-After를 주면 그 값을 우선한다
+            retry_after = _retry_after_seconds(e)
+            if retry_after is not None:
+                time.sleep(retry_after)
+                prev_delay = float(base_delay)
+            else:
+                prev_delay = _sleep_with_backoff(base_delay, prev_delay)
     raise last_err  # type: ignore[misc]
 
 
@@ -124,6 +158,19 @@ def _norm_rel_folder(folder: str) -> str:
     return "" if folder in ("", ".", "./") else folder
 
 
+def ancestors(rel: str):
+    """
+    'A/B/C' -> 'A', 'A/B', 'A/B/C'
+    split + 누적 join 대신 '/' 위치에서 원본을 슬라이스만 해서
+    엔트리당 할당을 O(depth)로 줄인다.
+    """
+    i = rel.find("/")
+    while i != -1:
+        yield rel[:i]
+        i = rel.find("/", i + 1)
+    yield rel
+
+
 # -----------------------
 # Dropbox
 # -----------------------
@@ -160,7 +207,7 @@ def list_dropbox_entries_recursive(dbx: dropbox.Dropbox, root_path: str) -> List
 # -----------------------
 # Google Drive Auth / list
 # -----------------------
-def get_gdrive_service(*, timeout_seconds: int, credentials_path: str, token_path: str):
+def load_gdrive_credentials(*, credentials_path: str, token_path: str) -> Credentials:
     base_dir = Path(__file__).parent
     token_p = (base_dir / token_path).resolve()
     cred_p = (base_dir / credentials_path).resolve()
@@ -178,11 +225,44 @@ def get_gdrive_service(*, timeout_seconds: int, credentials_path: str, token_pat
             creds = flow.run_local_server(port=0)
         token_p.write_text(creds.to_json(), encoding="utf-8")
 
+    return creds
+
+
+def get_gdrive_service(creds: Credentials, *, timeout_seconds: int):
     http = httplib2.Http(timeout=timeout_seconds)
     authed_http = AuthorizedHttp(creds, http=http)
+
+    # 구글 API는 UA에 "gzip" 토큰이 있어야 응답을 실제로 gzip으로 준다.
+    # fields 마스크를 써도 list 응답 JSON은 압축률이 높아 전송량이 크게 줄어든다.
+    # (httplib2는 인스턴스별로 keep-alive 커넥션을 재사용하므로
+    #  스레드당 서비스 1개 구조와 합치면 TLS 핸드셰이크도 반복되지 않는다)
+    _orig_request = authed_http.request
+
+    def _request_with_gzip(uri, method="GET", body=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault("accept-encoding", "gzip")
+        ua = headers.get("user-agent", "")
+        if "gzip" not in ua:
+            headers["user-agent"] = (ua + " (gzip)").strip()
+        return _orig_request(uri, method=method, body=body, headers=headers, **kwargs)
+
+    authed_http.request = _request_with_gzip
+
     return build("drive", "v3", http=authed_http, cache_discovery=False)
 
 
+# httplib2.Http는 스레드 간 공유 불가 -> 워커 스레드마다 서비스 1개씩 재사용
+_thread_local = threading.local()
+
+
+def _get_thread_service(creds: Credentials, *, timeout_seconds: int):
+    service = getattr(_thread_local, "service", None)
+    if service is None:
+        service = get_gdrive_service(creds, timeout_seconds=timeout_seconds)
+        _thread_local.service = service
+    return service
+
+
 def get_drive_id(service, root_folder_id: str, *, max_retries: int, base_delay: int) -> Optional[str]:
     req = service.files().get(
         fileId=root_folder_id,
@@ -204,7 +284,7 @@ def drive_list_children(
     base_delay: int,
 ) -> List[dict]:
     q = f"'{parent_id}' in parents and trashed = false"
-    fields = "nextPageToken, files(id,name,mimeType,size)"
+    fields = "nextPageToken, incompleteSearch, files(id,name,mimeType,size)"
     items: List[dict] = []
     page_token = None
 
@@ -228,6 +308,9 @@ def drive_list_children(
             max_retries=max_retries,
             base_delay=base_delay,
         )
+        if res.get("incompleteSearch"):
+            # 결과가 조용히 누락되면 MISSING 오판으로 이어지므로 명시적으로 실패
+            raise RuntimeError(f"incompleteSearch: parent={parent_id} 결과가 불완전함")
         items.extend(res.get("files", []))
         page_token = res.get("nextPageToken")
         if not page_token:
@@ -236,20 +319,63 @@ def drive_list_children(
     return items
 
 
+def drive_list_children_multi(
+    service,
+    parent_ids: List[str],
+    drive_id: Optional[str],
+    *,
+    max_retries: int,
+    base_delay: int,
+) -> Dict[str, List[dict]]:
+    """
+    부모 여러 개('a' in parents or 'b' in parents ...)를 files.list 한 번으로
+    조회하고, 응답의 parents로 어느 부모의 자식인지 역다중화한다.
+    폴더 50개 = HTTP 1회가 되므로 넓은 레벨에서 호출 수가 1/50로 준다.
+    """
+    out: Dict[str, List[dict]] = {pid: [] for pid in parent_ids}
+    wanted = set(parent_ids)
+
+    q = "trashed = false and (" + " or ".join(f"'{pid}' in parents" for pid in parent_ids) + ")"
+    fields = "nextPageToken, incompleteSearch, files(id,name,mimeType,size,parents)"
+    page_token = None
+
+    while True:
+        kwargs = dict(
+            q=q,
+            fields=fields,
+            spaces="drive",
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            pageSize=1000,
+            pageToken=page_token,
+        )
+        if drive_id:
+            kwargs.update(dict(corpora="drive", driveId=drive_id))
+
+        req = service.files().list(**kwargs)
+        res = _gdrive_execute_with_retry(
+            req,
+            desc=f"list children multi({len(parent_ids)} parents)",
+            max_retries=max_retries,
+            base_delay=base_delay,
+        )
+        if res.get("incompleteSearch"):
+            raise RuntimeError(f"incompleteSearch: {len(parent_ids)}개 부모 묶음 결과가 불완전함")
+        for it in res.get("files", []):
+            for p in it.get("parents", []):
+                if p in wanted:
+                    out[p].append(it)
+        page_token = res.get("nextPageToken")
+        if not page_token:
+            break
+
+    return out
+
+
 # -----------------------
 # 비교 로직
 # -----------------------
-@dataclass
-class FileMatch:
-    rel_path: str              # 디자인 기준 상대경로 (예: "2D/.../a.png")
-    dropbox_size: int
-    status: str                # OK / MISSING / SIZE_MISMATCH / AMBIGUOUS / GDRIVE_SIZE_UNKNOWN / GDRIVE_GOOGLE_APP / ERROR
-    gdrive_size: Optional[int]
-    gdrive_file_ids: str       # 매칭 후보들 fileId를 ;로 합쳐서 기록(ambiguous 분석용)
-    note: str
-
-
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FolderMatch:
     rel_folder: str            # 디자인 기준 상대폴더 (예: "2D/프로젝트A" / ""(루트))
     dropbox_exists: bool
@@ -265,87 +391,347 @@ def normalize_rel_under_root(any_dropbox_path_display: str, dropbox_root: str) -
     dropbox_path_display: "/디자인/..../file.ext" 또는 "/디자인/.../folder" 또는 "/디자인"
     dropbox_root: "/디자인"
     return: "..../file.ext" 또는 ".../folder" 또는 ""(루트)
+    파일당 여러 번 불리므로 PurePosixPath 파싱 대신 문자열 슬라이스만 쓴다.
     """
-    p = PurePosixPath(any_dropbox_path_display)
-    root = PurePosixPath(dropbox_root)
-    rel = p.relative_to(root).as_posix()
-    if rel in ("", ".", "./"):
+    if any_dropbox_path_display == dropbox_root:
         return ""
-    return rel
+    prefix = dropbox_root if dropbox_root.endswith("/") else dropbox_root + "/"
+    if not any_dropbox_path_display.startswith(prefix):
+        # 기존 PurePosixPath.relative_to와 동일하게 범위 밖 경로는 에러
+        raise ValueError(f"{any_dropbox_path_display!r} is not under {dropbox_root!r}")
+    rel = any_dropbox_path_display[len(prefix):].strip("/")
+    return "" if rel in ("", ".") else rel
 
 
 def build_gdrive_index_and_folders(
-    service,
+    creds: Credentials,
     gdrive_design_root_id: str,
     *,
+    timeout_seconds: int,
     max_retries: int,
     base_delay: int,
-) -> Tuple[Dict[str, List[Tuple[str, Optional[int], str]]], Set[str], int]:
+    max_workers: int = 8,
+) -> Tuple[Dict[str, List[Tuple[str, Optional[int], str]]], Set[str], Dict[str, str], int]:
     """
     GDrive 디자인 폴더 아래 전수 스캔:
     - file_index: rel_path -> [(fileId, size_bytes_or_None, mimeType)]
     - folder_set: rel_folder ("" 포함) 집합
+    - folder_rel_by_id: folder_id -> rel_folder (SQLite 캐시 저장용)
+    레벨 단위 BFS: 같은 깊이의 폴더들을 50개씩 OR 쿼리로 묶고,
+    묶음들을 스레드 풀로 동시에 list 한다.
     """
-    drive_id = get_drive_id(service, gdrive_design_root_id, max_retries=max_retries, base_delay=base_delay)
+    drive_id = get_drive_id(
+        _get_thread_service(creds, timeout_seconds=timeout_seconds),
+        gdrive_design_root_id,
+        max_retries=max_retries,
+        base_delay=base_delay,
+    )
 
     file_index: Dict[str, List[Tuple[str, Optional[int], str]]] = {}
     folder_set: Set[str] = set([""])  # root
-    q = deque([(gdrive_design_root_id, "")])  # (folder_id, rel_prefix)
+    folder_rel_by_id: Dict[str, str] = {gdrive_design_root_id: ""}
+    current: List[Tuple[str, str]] = [(gdrive_design_root_id, "")]  # (folder_id, rel_prefix)
 
     scanned_items = 0
 
-    while q:
-        folder_id, prefix = q.popleft()
-        children = drive_list_children(
-            service,
-            folder_id,
-            drive_id,
-            max_retries=max_retries,
-            base_delay=base_delay,
-        )
+    def _list_chunk(chunk: List[Tuple[str, str]]) -> Dict[str, List[dict]]:
+        service = _get_thread_service(creds, timeout_seconds=timeout_seconds)
+        ids = [fid for fid, _ in chunk]
+        try:
+            return drive_list_children_multi(
+                service, ids, drive_id, max_retries=max_retries, base_delay=base_delay
+            )
+        except HttpError as e:
+            # 비정상 ID 등으로 invalid query(400)가 나면 단일 부모 조회로 폴백
+            if getattr(getattr(e, "resp", None), "status", None) != 400:
+                raise
+            return {
+                fid: drive_list_children(
+                    service, fid, drive_id, max_retries=max_retries, base_delay=base_delay
+                )
+                for fid in ids
+            }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while current:
+            prefix_by_id = {fid: prefix for fid, prefix in current}
+            chunks = [
+                current[i:i + GDRIVE_PARENTS_PER_QUERY]
+                for i in range(0, len(current), GDRIVE_PARENTS_PER_QUERY)
+            ]
+            next_level: List[Tuple[str, str]] = []
+            for result in pool.map(_list_chunk, chunks):
+                for fid, children in result.items():
+                    prefix = prefix_by_id[fid]
+                    for it in children:
+                        scanned_items += 1
+                        name = it.get("name", "")
+                        mime = it.get("mimeType", "")
+
+                        if mime == FOLDER_MIMETYPE:
+                            next_prefix = f"{prefix}/{name}" if prefix else name
+                            folder_set.add(_norm_rel_folder(next_prefix))
+                            folder_rel_by_id[it["id"]] = next_prefix
+                            next_level.append((it["id"], next_prefix))
+                            continue
+
+                        rel_path = f"{prefix}/{name}" if prefix else name
+                        size_val = it.get("size")
+                        size_bytes: Optional[int] = int(size_val) if size_val is not None else None
+                        file_index.setdefault(rel_path, []).append((it["id"], size_bytes, mime))
+            current = next_level
+
+    return file_index, folder_set, folder_rel_by_id, scanned_items
 
-        for it in children:
-            scanned_items += 1
-            name = it.get("name", "")
-            mime = it.get("mimeType", "")
 
-            if mime == FOLDER_MIMETYPE:
-                next_prefix = f"{prefix}/{name}" if prefix else name
-                folder_set.add(_norm_rel_folder(next_prefix))
-                q.append((it["id"], next_prefix))
-                continue
+# -----------------------
+# SQLite 인덱스 캐시
+# -----------------------
+def _open_index_db(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        " root_id TEXT, file_id TEXT, rel_path TEXT, size INTEGER, mime TEXT,"
+        " PRIMARY KEY (root_id, file_id))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS folders ("
+        " root_id TEXT, folder_id TEXT, rel_path TEXT,"
+        " PRIMARY KEY (root_id, folder_id))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sync_state (root_id TEXT PRIMARY KEY, start_page_token TEXT)"
+    )
+    return conn
+
+
+def get_changes_start_token(service, drive_id: Optional[str], *, max_retries: int, base_delay: int) -> str:
+    kwargs = dict(supportsAllDrives=True)
+    if drive_id:
+        kwargs["driveId"] = drive_id
+    req = service.changes().getStartPageToken(**kwargs)
+    res = _gdrive_execute_with_retry(req, desc="get start page token", max_retries=max_retries, base_delay=base_delay)
+    return res["startPageToken"]
+
 
-            rel_path = f"{prefix}/{name}" if prefix else name
-            size_val = it.get("size")
-            size_bytes: Optional[int] = int(size_val) if size_val is not None else None
-            file_index.setdefault(rel_path, []).append((it["id"], size_bytes, mime))
+def save_gdrive_index_to_db(
+    db_path: Path,
+    root_id: str,
+    start_page_token: str,
+    file_index: Dict[str, List[Tuple[str, Optional[int], str]]],
+    folder_rel_by_id: Dict[str, str],
+) -> None:
+    """전수 스캔 결과를 한 트랜잭션으로 저장 (다음 실행은 delta만 적용)."""
+    conn = _open_index_db(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM files WHERE root_id = ?", (root_id,))
+            conn.execute("DELETE FROM folders WHERE root_id = ?", (root_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                [
+                    (root_id, fid, rel, size, mime)
+                    for rel, cands in file_index.items()
+                    for fid, size, mime in cands
+                ],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?, ?)",
+                [(root_id, fid, rel) for fid, rel in folder_rel_by_id.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?)",
+                (root_id, start_page_token),
+            )
+        print(f"[INFO] 인덱스 캐시 저장: {db_path} (files rows={sum(len(v) for v in file_index.values())})")
+    finally:
+        conn.close()
+
+
+def load_gdrive_index_from_db(
+    service,
+    db_path: Path,
+    root_id: str,
+    drive_id: Optional[str],
+    *,
+    max_retries: int,
+    base_delay: int,
+) -> Optional[Tuple[Dict[str, List[Tuple[str, Optional[int], str]]], Set[str], int]]:
+    """
+    SQLite 캐시를 읽고 changes.list delta만 적용해 인덱스를 복원한다.
+    폴더 구조 자체가 바뀐 delta(이동/개명/삭제)는 하위 경로 전파가 복잡하므로
+    None을 반환해 전수 스캔으로 폴백한다.
+    """
+    if not db_path.exists():
+        return None
+
+    conn = _open_index_db(db_path)
+    try:
+        row = conn.execute(
+            "SELECT start_page_token FROM sync_state WHERE root_id = ?", (root_id,)
+        ).fetchone()
+        if not row or not row[0]:
+            return None
+        token = row[0]
+
+        folder_rel_by_id: Dict[str, str] = {
+            fid: rel
+            for fid, rel in conn.execute(
+                "SELECT folder_id, rel_path FROM folders WHERE root_id = ?", (root_id,)
+            )
+        }
+        if root_id not in folder_rel_by_id:
+            return None
+
+        # delta 수집
+        changes: List[dict] = []
+        page_token = token
+        new_token = token
+        while True:
+            kwargs = dict(
+                pageToken=page_token,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+                includeRemoved=True,
+                pageSize=1000,
+                spaces="drive",
+                fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, parents, mimeType, size, trashed))",
+            )
+            if drive_id:
+                kwargs["driveId"] = drive_id
+            req = service.changes().list(**kwargs)
+            res = _gdrive_execute_with_retry(
+                req, desc="changes.list", max_retries=max_retries, base_delay=base_delay
+            )
+            changes.extend(res.get("changes", []))
+            if res.get("nextPageToken"):
+                page_token = res["nextPageToken"]
+            else:
+                new_token = res.get("newStartPageToken", token)
+                break
+
+        # 폴더가 바뀐 delta면 전수 스캔으로 (경로 전파가 필요)
+        for ch in changes:
+            f = ch.get("file") or {}
+            if ch.get("fileId") in folder_rel_by_id and (ch.get("removed") or f.get("trashed")):
+                return None
+            if f.get("mimeType") == FOLDER_MIMETYPE:
+                return None
+
+        # 파일 delta 적용
+        applied = 0
+        with conn:
+            for ch in changes:
+                fid = ch.get("fileId")
+                if not fid:
+                    continue
+                f = ch.get("file") or {}
+                if ch.get("removed") or f.get("trashed"):
+                    conn.execute("DELETE FROM files WHERE root_id = ? AND file_id = ?", (root_id, fid))
+                    applied += 1
+                    continue
+                parents = f.get("parents") or []
+                parent_rel = next((folder_rel_by_id[p] for p in parents if p in folder_rel_by_id), None)
+                if parent_rel is None:
+                    # 트리 밖으로 이동했거나 무관한 변경
+                    conn.execute("DELETE FROM files WHERE root_id = ? AND file_id = ?", (root_id, fid))
+                    applied += 1
+                    continue
+                name = f.get("name", "")
+                rel = f"{parent_rel}/{name}" if parent_rel else name
+                size_val = f.get("size")
+                size = int(size_val) if size_val is not None else None
+                conn.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                    (root_id, fid, rel, size, f.get("mimeType", "")),
+                )
+                applied += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (root_id, new_token)
+            )
 
-    return file_index, folder_set, scanned_items
+        # DB에서 인메모리 인덱스 복원
+        file_index: Dict[str, List[Tuple[str, Optional[int], str]]] = {}
+        rows = 0
+        for fid, rel, size, mime in conn.execute(
+            "SELECT file_id, rel_path, size, mime FROM files WHERE root_id = ?", (root_id,)
+        ):
+            rows += 1
+            file_index.setdefault(rel, []).append((fid, size, mime))
+
+        folder_set: Set[str] = {_norm_rel_folder(rel) for rel in folder_rel_by_id.values()}
+        folder_set.add("")
+
+        print(f"[INFO] 인덱스 캐시 로드: files={rows} folders={len(folder_set)} (delta {applied}건 적용)")
+        return file_index, folder_set, rows
+    except HttpError as e:
+        status = getattr(getattr(e, "resp", None), "status", None)
+        if status == 410:
+            # 토큰이 너무 오래돼 changes 기록이 만료됨 -> 묵은 상태를 지우고 전수 스캔
+            print("[INFO] changes 토큰 만료(410) -> 전수 스캔 후 캐시 재구축")
+            with conn:
+                conn.execute("DELETE FROM sync_state WHERE root_id = ?", (root_id,))
+        else:
+            print(f"[WARN] 인덱스 캐시 로드 실패 -> 전수 스캔: {type(e).__name__}: {e}")
+        return None
+    except Exception as e:
+        print(f"[WARN] 인덱스 캐시 로드 실패 -> 전수 스캔: {type(e).__name__}: {e}")
+        return None
+    finally:
+        conn.close()
 
 
-def accumulate_folder_counts(
+def _parent_folder(rel: str) -> str:
+    return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+
+def count_file_in_parent(
     rel_path: str,
-    total: Dict[str, int],
-    ok: Dict[str, int],
+    direct_total: Dict[str, int],
+    direct_ok: Dict[str, int],
     is_ok: bool,
 ) -> None:
     """
-    파일 1개에 대해 상위 모든 폴더(상대경로)를 누적 카운트.
-    rel_path = "A/B/C/file.ext" -> folders: "", "A", "A/B", "A/B/C"
+    파일 1개를 '직계 부모 폴더'에만 카운트.
+    서브트리 합계는 전체 루프가 끝난 뒤 rollup_folder_counts가 한 번에 계산한다.
+    (파일마다 조상 폴더 전부를 걷던 O(files x depth) 방식 제거)
     """
-    parts = rel_path.split("/")
-    folders = [""]  # root
-    if len(parts) > 1:
-        cur: List[str] = []
-        for p in parts[:-1]:
-            cur.append(p)
-            folders.append("/".join(cur))
+    parent = _norm_rel_folder(_parent_folder(rel_path))
+    # 같은 폴더의 파일이 연달아 오므로 키는 거의 항상 존재
+    # -> get()+재대입보다 try/except 증가가 싸다
+    try:
+        direct_total[parent] += 1
+    except KeyError:
+        direct_total[parent] = 1
+    if is_ok:
+        try:
+            direct_ok[parent] += 1
+        except KeyError:
+            direct_ok[parent] = 1
 
-    for f in folders:
-        f = _norm_rel_folder(f)
-        total[f] = total.get(f, 0) + 1
-        if is_ok:
-            ok[f] = ok.get(f, 0) + 1
+
+def rollup_folder_counts(
+    dropbox_folders: Set[str],
+    direct_total: Dict[str, int],
+    direct_ok: Dict[str, int],
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    직계 카운트를 깊은 폴더부터 부모로 굴려 올려 서브트리 합계를 만든다.
+    폴더당 덧셈 1회이므로 전체 비용은 O(files + folders).
+    """
+    total = {f: direct_total.get(f, 0) for f in dropbox_folders}
+    ok = {f: direct_ok.get(f, 0) for f in dropbox_folders}
+
+    for f in sorted(dropbox_folders, key=lambda x: x.count("/"), reverse=True):
+        if f == "":
+            continue
+        parent = _parent_folder(f)
+        total[parent] = total.get(parent, 0) + total[f]
+        ok[parent] = ok.get(parent, 0) + ok[f]
+
+    return total, ok
 
 
 def compress_highest_folders(full_folders: Set[str]) -> List[str]:
@@ -355,21 +741,33 @@ def compress_highest_folders(full_folders: Set[str]) -> List[str]:
     (루트("")가 후보면, 사실상 전부 삭제 가능이므로 하위는 모두 제거)
     """
     normalized = {_norm_rel_folder(f) for f in full_folders}
-    ordered = sorted(normalized, key=lambda x: (x.count("/"), x))
 
-    kept: List[str] = []
-    for f in ordered:
-        # 이미 kept에 루트("")가 있으면 다른 건 전부 하위로 간주
-        if "" in kept and f != "":
-            continue
+    # 루트("")가 후보면 사실상 전부 삭제 가능
+    if "" in normalized:
+        return [""]
 
-        if any(
-            (f == k) or
-            (k != "" and f.startswith(k + "/"))
-            for k in kept
-        ):
-            continue
-        kept.append(f)
+    # 얕은 폴더부터 처리하면서, 조상 중 하나라도 이미 kept면 하위로 간주.
+    # kept 전체를 startswith로 훑는 대신 조상 경로를 set 조회 -> O(경로 길이)
+    # (사전순 '마지막 kept와만 비교'는 "A (x)" 같은 형제가 "A"와 "A/sub"
+    #  사이에 끼어들면 하위 경로를 놓치므로 쓸 수 없다)
+    kept: List[str] = []
+    kept_set: Set[str] = set()
+
+    for f in sorted(normalized, key=lambda x: (x.count("/"), x)):
+        parts = f.split("/")
+        covered = False
+        cur = parts[0]
+        if cur in kept_set and cur != f:
+            covered = True
+        else:
+            for p in parts[1:]:
+                cur = f"{cur}/{p}"
+                if cur != f and cur in kept_set:
+                    covered = True
+                    break
+        if not covered:
+            kept.append(f)
+            kept_set.add(f)
 
     return kept
 
@@ -396,6 +794,9 @@ def main():
     ap.add_argument("--gdrive-timeout", type=int, default=GDRIVE_TIMEOUT_SECONDS)
     ap.add_argument("--gdrive-max-retries", type=int, default=GDRIVE_MAX_RETRIES)
     ap.add_argument("--gdrive-retry-delay", type=int, default=GDRIVE_RETRY_DELAY_SECONDS)
+    ap.add_argument("--gdrive-concurrency", type=int, default=8, help="폴더 탐색 동시 files.list 수")
+    ap.add_argument("--cache-db", default="design_index.sqlite", help="GDrive 인덱스 캐시 SQLite 경로 (''이면 비활성)")
+    ap.add_argument("--full-rescan", action="store_true", help="캐시 무시하고 전수 스캔")
 
     ap.add_argument("--include-empty-folders", action="store_true", help="빈 폴더(하위 파일 0개)도 삭제 후보에 포함")
     ap.add_argument("--allow-root-delete", action="store_true", help="Dropbox 루트(/디자인) 자체도 후보로 허용(주의)")
@@ -432,11 +833,7 @@ def main():
 
             # 상위 폴더들도 세트에 넣기
             if rel_folder:
-                parts = rel_folder.split("/")
-                cur: List[str] = []
-                for part in parts:
-                    cur.append(part)
-                    dropbox_folders.add("/".join(cur))
+                dropbox_folders.update(ancestors(rel_folder))
             continue
 
         if isinstance(e, FileMetadata):
@@ -448,102 +845,157 @@ def main():
 
             # 파일이 속한 폴더 및 상위 폴더들도 Dropbox 폴더로 인식
             rel_file = normalize_rel_under_root(p, args.dropbox_root)
-            parent = PurePosixPath(rel_file).parent.as_posix()
-            if parent == ".":
-                parent = ""
-            parent = _norm_rel_folder(parent)
+            parent = _norm_rel_folder(_parent_folder(rel_file))
 
             dropbox_folders.add(parent)
 
             if parent:
-                parts = parent.split("/")
-                cur: List[str] = []
-                for part in parts:
-                    cur.append(part)
-                    dropbox_folders.add("/".join(cur))
+                dropbox_folders.update(ancestors(parent))
 
     dropbox_files = sorted(dropbox_files, key=lambda m: m.path_display)
 
     print(f"[INFO] dropbox files={len(dropbox_files)} folders(including empty)={len(dropbox_folders)} root={args.dropbox_root}")
 
     # 2) GDrive 인덱스/폴더세트(한 번만 전수 스캔)
-    gdrive = get_gdrive_service(
-        timeout_seconds=args.gdrive_timeout,
+    gdrive_creds = load_gdrive_credentials(
         credentials_path=args.credentials,
         token_path=args.token,
     )
 
-    print("[INFO] building gdrive index under '디자인' ...")
-    gdrive_index, gdrive_folders, scanned_items = build_gdrive_index_and_folders(
-        gdrive,
-        args.gdrive_design_root_id,
-        max_retries=args.gdrive_max_retries,
-        base_delay=args.gdrive_retry_delay,
-    )
-    print(f"[INFO] gdrive scanned items={scanned_items} file_paths={len(gdrive_index)} folders={len(gdrive_folders)}")
+    cache_db = Path(args.cache_db).resolve() if args.cache_db else None
+    gdrive_index = None
 
-    # 3) 파일 비교 + 폴더 누적
-    total_by_folder: Dict[str, int] = {f: 0 for f in dropbox_folders}
-    ok_by_folder: Dict[str, int] = {f: 0 for f in dropbox_folders}
+    # 2-a) 캐시가 있으면 changes delta만 적용해서 복원 시도
+    if cache_db and not args.full_rescan:
+        service = _get_thread_service(gdrive_creds, timeout_seconds=args.gdrive_timeout)
+        try:
+            drive_id = get_drive_id(
+                service, args.gdrive_design_root_id,
+                max_retries=args.gdrive_max_retries, base_delay=args.gdrive_retry_delay,
+            )
+            loaded = load_gdrive_index_from_db(
+                service, cache_db, args.gdrive_design_root_id, drive_id,
+                max_retries=args.gdrive_max_retries, base_delay=args.gdrive_retry_delay,
+            )
+        except Exception as e:
+            print(f"[WARN] 인덱스 캐시 확인 실패 -> 전수 스캔: {type(e).__name__}: {e}")
+            loaded = None
+        if loaded is not None:
+            gdrive_index, gdrive_folders, scanned_items = loaded
+
+    # 2-b) 캐시가 없거나 못 쓰면 전수 스캔 (+다음 실행용 저장)
+    if gdrive_index is None:
+        print("[INFO] building gdrive index under '디자인' ...")
+        start_page_token: Optional[str] = None
+        if cache_db:
+            try:
+                # 스캔 '전'에 토큰을 받아야 스캔 중 변경이 다음 delta에 잡힌다
+                service = _get_thread_service(gdrive_creds, timeout_seconds=args.gdrive_timeout)
+                drive_id = get_drive_id(
+                    service, args.gdrive_design_root_id,
+                    max_retries=args.gdrive_max_retries, base_delay=args.gdrive_retry_delay,
+                )
+                start_page_token = get_changes_start_token(
+                    service, drive_id,
+                    max_retries=args.gdrive_max_retries, base_delay=args.gdrive_retry_delay,
+                )
+            except Exception as e:
+                print(f"[WARN] changes 토큰 조회 실패 -> 캐시 저장 생략: {type(e).__name__}: {e}")
+
+        gdrive_index, gdrive_folders, folder_rel_by_id, scanned_items = build_gdrive_index_and_folders(
+            gdrive_creds,
+            args.gdrive_design_root_id,
+            timeout_seconds=args.gdrive_timeout,
+            max_retries=args.gdrive_max_retries,
+            base_delay=args.gdrive_retry_delay,
+            max_workers=args.gdrive_concurrency,
+        )
+        if cache_db and start_page_token:
+            try:
+                save_gdrive_index_to_db(
+                    cache_db, args.gdrive_design_root_id, start_page_token,
+                    gdrive_index, folder_rel_by_id,
+                )
+            except Exception as e:
+                print(f"[WARN] 인덱스 캐시 저장 실패: {type(e).__name__}: {e}")
+
+    print(f"[INFO] gdrive scanned items={scanned_items} file_paths={len(gdrive_index)} folders={len(gdrive_folders)}")
 
-    file_results: List[FileMatch] = []
+    # 3) 파일 비교 + 직계 폴더 카운트 (서브트리 합계는 루프 뒤 rollup에서)
+    direct_total: Dict[str, int] = {}
+    direct_ok: Dict[str, int] = {}
 
     ok_cnt = miss_cnt = mismatch_cnt = amb_cnt = unknown_cnt = gapp_cnt = err_cnt = 0
 
+    # 파일 결과는 리스트에 모으지 않고 CSV로 바로 흘려보낸다
+    # (백만 건 규모에서 결과 객체만으로 수백 MB를 먹는 것 방지).
+    # lineterminator를 \n으로 고정해 리눅스에서 \r\n 이중 쓰기도 피함.
+    out_file = Path(args.out_file_report).resolve()
+    f_csv = open(out_file, "w", newline="", encoding="utf-8-sig")
+    file_writer = csv.writer(f_csv, lineterminator="\n")
+    file_writer.writerow(["rel_path_under_design", "dropbox_size", "status", "gdrive_size", "gdrive_file_ids", "note"])
+
+    # rel 계산은 파일당 한 번만 (경로 정규화 실패만 개별 ERROR 처리)
+    dbx_by_rel: Dict[str, FileMetadata] = {}
     for m in dropbox_files:
         try:
-            rel = normalize_rel_under_root(m.path_display, args.dropbox_root)
-            expected = int(m.size)
-
-            candidates = gdrive_index.get(rel)
+            dbx_by_rel[normalize_rel_under_root(m.path_display, args.dropbox_root)] = m
+        except Exception as e:
+            file_writer.writerow([m.path_display, int(m.size), "ERROR", None, "", f"{type(e).__name__}: {e}"])
+            err_cnt += 1
 
-            if not candidates:
-                file_results.append(FileMatch(rel, expected, "MISSING", None, "", "not_found_in_gdrive_by_relpath"))
-                accumulate_folder_counts(rel, total_by_folder, ok_by_folder, is_ok=False)
-                miss_cnt += 1
-                continue
+    # MISSING은 dict 키 차집합 한 번으로 분리 (C 레벨)
+    missing = dbx_by_rel.keys() - gdrive_index.keys()
+    for rel in missing:
+        file_writer.writerow([rel, int(dbx_by_rel[rel].size), "MISSING", None, "", "not_found_in_gdrive_by_relpath"])
+        count_file_in_parent(rel, direct_total, direct_ok, is_ok=False)
+    miss_cnt = len(missing)
 
-            if len(candidates) > 1:
-                ids = ";".join([c[0] for c in candidates])
-                file_results.append(
-                    FileMatch(rel, expected, "AMBIGUOUS", None, ids, f"multiple_items_same_relpath(count={len(candidates)})")
-                )
-                accumulate_folder_counts(rel, total_by_folder, ok_by_folder, is_ok=False)
-                amb_cnt += 1
-                continue
+    # 나머지(존재하는 파일)만 분기 루프를 돈다
+    for rel, m in dbx_by_rel.items():
+        if rel in missing:
+            continue
+        expected = int(m.size)
+        candidates = gdrive_index[rel]
+
+        if len(candidates) > 1:
+            ids = ";".join([c[0] for c in candidates])
+            file_writer.writerow([rel, expected, "AMBIGUOUS", None, ids, f"multiple_items_same_relpath(count={len(candidates)})"])
+            count_file_in_parent(rel, direct_total, direct_ok, is_ok=False)
+            amb_cnt += 1
+            continue
 
-            file_id, gsize, mime = candidates[0]
-            ids = file_id
+        file_id, gsize, mime = candidates[0]
+        ids = file_id
 
-            if mime.startswith(GOOGLE_APP_PREFIX):
-                file_results.append(FileMatch(rel, expected, "GDRIVE_GOOGLE_APP", gsize, ids, f"gdrive_mime={mime}"))
-                accumulate_folder_counts(rel, total_by_folder, ok_by_folder, is_ok=False)
-                gapp_cnt += 1
-                continue
+        if mime.startswith(GOOGLE_APP_PREFIX):
+            file_writer.writerow([rel, expected, "GDRIVE_GOOGLE_APP", gsize, ids, f"gdrive_mime={mime}"])
+            count_file_in_parent(rel, direct_total, direct_ok, is_ok=False)
+            gapp_cnt += 1
+            continue
 
-            if gsize is None or gsize <= 0:
-                file_results.append(FileMatch(rel, expected, "GDRIVE_SIZE_UNKNOWN", gsize, ids, "gdrive_size_missing"))
-                accumulate_folder_counts(rel, total_by_folder, ok_by_folder, is_ok=False)
-                unknown_cnt += 1
-                continue
+        if gsize is None or gsize <= 0:
+            file_writer.writerow([rel, expected, "GDRIVE_SIZE_UNKNOWN", gsize, ids, "gdrive_size_missing"])
+            count_file_in_parent(rel, direct_total, direct_ok, is_ok=False)
+            unknown_cnt += 1
+            continue
 
-            if int(gsize) == expected:
-                file_results.append(FileMatch(rel, expected, "OK", gsize, ids, "same_relpath_and_size"))
-                accumulate_folder_counts(rel, total_by_folder, ok_by_folder, is_ok=True)
-                ok_cnt += 1
-            else:
-                file_results.append(
-                    FileMatch(rel, expected, "SIZE_MISMATCH", gsize, ids, f"size_mismatch(gdrive={gsize},dropbox={expected})")
-                )
-                accumulate_folder_counts(rel, total_by_folder, ok_by_folder, is_ok=False)
-                mismatch_cnt += 1
+        if int(gsize) == expected:
+            file_writer.writerow([rel, expected, "OK", gsize, ids, "same_relpath_and_size"])
+            count_file_in_parent(rel, direct_total, direct_ok, is_ok=True)
+            ok_cnt += 1
+        else:
+            file_writer.writerow([rel, expected, "SIZE_MISMATCH", gsize, ids, f"size_mismatch(gdrive={gsize},dropbox={expected})"])
+            count_file_in_parent(rel, direct_total, direct_ok, is_ok=False)
+            mismatch_cnt += 1
 
-        except Exception as e:
-            rel_fallback = m.path_display
-            file_results.append(FileMatch(rel_fallback, int(m.size), "ERROR", None, "", f"{type(e).__name__}: {e}"))
-            err_cnt += 1
+    f_csv.close()
 
     # 4) 폴더 삭제 후보 판정 (빈 폴더 포함)
+    total_by_folder, ok_by_folder = rollup_folder_counts(
+        {_norm_rel_folder(f) for f in dropbox_folders}, direct_total, direct_ok
+    )
+
     folder_results: List[FolderMatch] = []
     deletable_folders: Set[str] = set()
 
@@ -597,14 +1049,7 @@ def main():
     # 5) "최대한 상위"로 압축
     compressed = compress_highest_folders(deletable_folders)
 
-    # 6) 저장
-    out_file = Path(args.out_file_report).resolve()
-    with open(out_file, "w", newline="", encoding="utf-8-sig") as f:
-        w = csv.writer(f)
-        w.writerow(["rel_path_under_design", "dropbox_size", "status", "gdrive_size", "gdrive_file_ids", "note"])
-        for r in file_results:
-            w.writerow([r.rel_path, r.dropbox_size, r.status, r.gdrive_size, r.gdrive_file_ids, r.note])
-
+    # 6) 저장 (파일 리포트는 비교 단계에서 이미 스트리밍으로 기록됨)
     out_folder = Path(args.out_folder_report).resolve()
     with open(out_folder, "w", newline="", encoding="utf-8-sig") as f:
         w = csv.writer(f)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import io
 import os
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, List, Dict, Tuple
@@ -13,11 +17,12 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 
 
 # 읽기 전용(다운로드만)
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+MAX_DOWNLOAD_RETRIES = 3
 FOLDER_MIMETYPE = "application/vnd.google-apps.folder"
 GOOGLE_APP_PREFIX = "application/vnd.google-apps."
 
@@ -26,7 +31,7 @@ def _escape_drive_q(s: str) -> str:
     return s.replace("'", "\\'")
 
 
-def get_gdrive_service(credentials_path: str = "credentials.json", token_path: str = "token.json"):
+def load_gdrive_credentials(credentials_path: str = "credentials.json", token_path: str = "token.json") -> Credentials:
     creds = None
     token_p = Path(token_path)
 
@@ -41,9 +46,35 @@ def get_gdrive_service(credentials_path: str = "credentials.json", token_path: s
             creds = flow.run_local_server(port=0)
         token_p.write_text(creds.to_json(), encoding="utf-8")
 
+    return creds
+
+
+def get_gdrive_service(creds: Credentials):
     return build("drive", "v3", credentials=creds)
 
 
+# googleapiclient는 Http 객체를 스레드 간에 공유하면 안 되므로
+# 워커 스레드마다 서비스 1개씩 만들어 재사용한다 (credentials는 공유).
+_thread_local = threading.local()
+
+
+def _get_thread_service(creds: Credentials):
+    service = getattr(_thread_local, "service", None)
+    if service is None:
+        service = get_gdrive_service(creds)
+        _thread_local.service = service
+    return service
+
+
+def _get_thread_session(creds: Credentials) -> AuthorizedSession:
+    # 대용량 다운로드용 requests 세션 (keep-alive로 TLS 핸드셰이크 1회)
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = AuthorizedSession(creds)
+        _thread_local.session = session
+    return session
+
+
 def get_drive_id(service, root_folder_id: str) -> Optional[str]:
     meta = service.files().get(
         fileId=root_folder_id,
@@ -72,11 +103,14 @@ def drive_list(service, *, q: str, fields: str, drive_id: Optional[str], page_to
 
 def list_children(service, parent_id: str, drive_id: Optional[str]) -> List[dict]:
     q = f"'{parent_id}' in parents and trashed = false"
-    fields = "nextPageToken, files(id,name,mimeType,size)"
+    fields = "nextPageToken, incompleteSearch, files(id,name,mimeType,size,md5Checksum)"
     out: List[dict] = []
     token = None
     while True:
         res = drive_list(service, q=q, fields=fields, drive_id=drive_id, page_token=token)
+        if res.get("incompleteSearch"):
+            # 조용한 누락은 스킵/재다운로드 오판으로 이어짐 -> 명시적 실패
+            raise RuntimeError(f"incompleteSearch: parent={parent_id} 결과가 불완전함")
         out.extend(res.get("files", []))
         token = res.get("nextPageToken")
         if not token:
@@ -84,50 +118,187 @@ def list_children(service, parent_id: str, drive_id: Optional[str]) -> List[dict
     return out
 
 
+# parent_id -> children 캐시. 탐색 BFS가 전체 트리를 한 번 리스트하고 나면
+# encoded 서브트리 다운로드 BFS는 같은 폴더를 HTTP 없이 재사용한다.
+# (drive_id는 실행 내내 고정이라 키에 넣지 않음)
+_children_cache: Dict[str, List[dict]] = {}
+_children_cache_lock = threading.Lock()
+
+
+def list_children_cached(service, parent_id: str, drive_id: Optional[str]) -> List[dict]:
+    with _children_cache_lock:
+        cached = _children_cache.get(parent_id)
+    if cached is not None:
+        return cached
+    children = list_children(service, parent_id, drive_id)
+    with _children_cache_lock:
+        _children_cache[parent_id] = children
+    return children
+
+
 @dataclass
 class EncodedFolder:
     folder_id: str
     rel_path: Path  # root 기준 상대경로 (예: 디자인/.../encoded)
 
 
-def find_all_encoded_folders(service, root_id: str, drive_id: Optional[str]) -> List[EncodedFolder]:
+def find_all_encoded_folders(
+    creds: Credentials,
+    root_id: str,
+    drive_id: Optional[str],
+    *,
+    max_workers: int = 8,
+) -> List[EncodedFolder]:
     """
     root 아래 폴더 트리를 BFS로 훑으면서 name == 'encoded' 인 폴더를 모두 수집.
+    호출당 ~수백 ms짜리 files.list가 트리 너비만큼 쌓이므로,
+    한 레벨의 폴더들을 스레드 풀로 동시에 조회한다 (네트워크 바운드라 GIL 무관).
     """
     encoded: List[EncodedFolder] = []
-    queue: List[Tuple[str, Path]] = [(root_id, Path())]  # (folder_id, relative_path)
+    current: List[Tuple[str, Path]] = [(root_id, Path())]  # (folder_id, relative_path)
 
-    while queue:
-        fid, rel = queue.pop(0)
-        children = list_children(service, fid, drive_id)
+    def _list_one(item: Tuple[str, Path]) -> Tuple[Path, List[dict]]:
+        fid, rel = item
+        return rel, list_children_cached(_get_thread_service(creds), fid, drive_id)
 
-        for item in children:
-            if item.get("mimeType") != FOLDER_MIMETYPE:
-                continue
-            name = item["name"]
-            child_id = item["id"]
-            child_rel = rel / name
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while current:
+            next_level: List[Tuple[str, Path]] = []
+            for rel, children in pool.map(_list_one, current):
+                for item in children:
+                    if item.get("mimeType") != FOLDER_MIMETYPE:
+                        continue
+                    name = item["name"]
+                    child_id = item["id"]
+                    child_rel = rel / name
 
-            if name == "encoded":
-                encoded.append(EncodedFolder(folder_id=child_id, rel_path=child_rel))
+                    if name == "encoded":
+                        encoded.append(EncodedFolder(folder_id=child_id, rel_path=child_rel))
 
-            queue.append((child_id, child_rel))
+                    next_level.append((child_id, child_rel))
+            current = next_level
 
     return encoded
 
 
-def download_file(service, file_id: str, target_path: Path, size_bytes: Optional[int], chunksize: int, skip_existing: bool):
+def scan_local_sizes(out_root: Path) -> Dict[str, int]:
+    """
+    out_root 아래 전체를 scandir로 한 번 훑어 상대경로 -> 파일 크기 맵을 만든다.
+    --skip-existing일 때 파일마다 exists()/stat() 시스콜 2번을 날리는 대신
+    이 맵을 조회한다 (수만 파일이면 차이가 큼). .part는 미완성이라 제외.
+    """
+    sizes: Dict[str, int] = {}
+    stack = [str(out_root)]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(".part"):
+                        rel = os.path.relpath(entry.path, out_root)
+                        sizes[rel] = entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            pass
+    return sizes
+
+
+def _local_md5(path: Path) -> str:
+    with open(path, "rb") as f:
+        try:
+            # 3.11+: C 구현 fast path (GIL도 풀어줌)
+            return hashlib.file_digest(f, "md5").hexdigest()
+        except AttributeError:
+            h = hashlib.md5()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+            return h.hexdigest()
+
+
+def _download_direct(session: AuthorizedSession, file_id: str, tmp_path: Path, size_bytes: Optional[int], display_name: str) -> None:
+    """
+    alt=media GET 한 번으로 본문 전체를 스트리밍해서 받는다.
+    MediaIoBaseDownload처럼 청크마다 Range 요청을 새로 만들지 않으므로
+    수백 MB짜리 파일에서 HTTP 오버헤드가 절반 이하로 줄어든다.
+    .part가 이미 있으면 Range로 이어받는다 (중간 실패 시 전체 재전송 방지).
+    """
+    offset = tmp_path.stat().st_size if tmp_path.exists() else 0
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true"
+    with session.get(url, stream=True, timeout=60, headers=headers) as resp:
+        if offset and resp.status_code != 206:
+            # 서버가 Range를 무시하면(200) 처음부터 다시 쓴다
+            offset = 0
+        resp.raise_for_status()
+        if offset:
+            print(f"  - {display_name}: {offset} bytes부터 이어받기")
+        written = offset
+        last_bucket = -1
+        with io.FileIO(str(tmp_path), mode="ab" if offset else "wb") as fh:
+            for chunk in resp.iter_content(1 << 20):
+                if not chunk:
+                    continue
+                fh.write(chunk)
+                written += len(chunk)
+                if size_bytes:
+                    bucket = min(10, written * 10 // size_bytes)
+                    if bucket != last_bucket:
+                        last_bucket = bucket
+                        print(f"  - {display_name}: {bucket*10}%")
+    if size_bytes is not None and tmp_path.stat().st_size != size_bytes:
+        raise IOError(f"다운로드 크기 불일치: {tmp_path.stat().st_size} != {size_bytes}")
+
+
+def download_file(
+    service,
+    session: Optional[AuthorizedSession],
+    file_id: str,
+    target_path: Path,
+    size_bytes: Optional[int],
+    chunksize: int,
+    skip_existing: bool,
+    md5: Optional[str] = None,
+    local_size: Optional[int] = None,
+):
     target_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # 스킵: 동일 파일이 이미 있고 size가 같으면 스킵
-    if skip_existing and target_path.exists() and size_bytes is not None:
-        if target_path.stat().st_size == size_bytes:
-            print(f"[SKIP] exists: {target_path}")
-            return
+    # 스킵: 동일 파일이 이미 있고 size가 같으면 스킵.
+    # local_size는 시작 시 scan_local_sizes()로 수집한 값 (per-file stat 대체).
+    # Drive가 md5Checksum을 주는 파일은 로컬 해시까지 맞아야 스킵
+    # (size 충돌로 다른 내용을 같은 파일로 오인하는 것 방지)
+    if skip_existing and local_size is not None and size_bytes is not None:
+        if local_size == size_bytes:
+            if md5:
+                if _local_md5(target_path) == md5:
+                    print(f"[SKIP] exists (md5 match): {target_path}")
+                    return
+                print(f"[INFO] size 같지만 md5 불일치 -> 재다운로드: {target_path}")
+            else:
+                print(f"[SKIP] exists: {target_path}")
+                return
 
     tmp_path = target_path.with_suffix(target_path.suffix + ".part")
+
+    # 1순위: 단일 스트림 직접 다운로드.
+    # 중간 실패하면 .part를 지우지 않고 Range로 이어받으며 재시도한다.
+    if session is not None:
+        for attempt in range(1, MAX_DOWNLOAD_RETRIES + 1):
+            try:
+                _download_direct(session, file_id, tmp_path, size_bytes, target_path.name)
+                tmp_path.replace(target_path)
+                print(f"[DONE] {target_path}")
+                return
+            except Exception as e:
+                print(f"[WARN] 직접 스트리밍 시도 {attempt}/{MAX_DOWNLOAD_RETRIES} 실패: {type(e).__name__}: {e}")
+                time.sleep(min(30, 2 ** attempt))
+        print(f"[WARN] 직접 스트리밍 포기 -> 청크 다운로드로 폴백: {target_path.name}")
+
     if tmp_path.exists():
-        # 이어받기는 구현 복잡도가 커서(범위 요청/상태 관리), 안전하게 재시작
+        # 청크 모드는 이어받기를 지원하지 않으므로 재시작
         tmp_path.unlink()
 
     request = service.files().get_media(fileId=file_id, supportsAllDrives=True)
@@ -150,30 +321,60 @@ def download_file(service, file_id: str, target_path: Path, size_bytes: Optional
     print(f"[DONE] {target_path}")
 
 
+def _download_one(
+    creds: Credentials,
+    file_id: str,
+    target_path: Path,
+    size_bytes: Optional[int],
+    chunksize: int,
+    skip_existing: bool,
+    md5: Optional[str],
+    local_size: Optional[int],
+):
+    # 워커 스레드에서 실행: 각자 자기 서비스/세션으로 다운로드 (Http 공유 금지)
+    download_file(
+        _get_thread_service(creds),
+        _get_thread_session(creds),
+        file_id=file_id,
+        target_path=target_path,
+        size_bytes=size_bytes,
+        chunksize=chunksize,
+        skip_existing=skip_existing,
+        md5=md5,
+        local_size=local_size,
+    )
+
+
 def download_tree_under_encoded(
-    service,
+    creds: Credentials,
     encoded_folder: EncodedFolder,
     drive_id: Optional[str],
     out_root: Path,
     chunksize: int,
     skip_existing: bool,
     only_mp4: bool,
-):
+    pool: ThreadPoolExecutor,
+    local_sizes: Optional[Dict[str, int]] = None,
+) -> int:
     """
     encoded 폴더 아래를 재귀(BFS)로 내려받기. 폴더 구조는 로컬에 그대로 복제.
+    파일 다운로드는 스레드 풀에 제출해 Drive 커넥션 여러 개로 동시에 받는다.
+    반환값: 실패한 파일 수
     """
-    queue: List[Tuple[str, Path]] = [(encoded_folder.folder_id, encoded_folder.rel_path)]
+    service = _get_thread_service(creds)
+    queue: deque[Tuple[str, Path]] = deque([(encoded_folder.folder_id, encoded_folder.rel_path)])
+    futures = []
 
     while queue:
-        fid, rel = queue.pop(0)
-        children = list_children(service, fid, drive_id)
+        fid, rel = queue.popleft()
+        children = list_children_cached(service, fid, drive_id)
 
         # 폴더 먼저 큐잉
         for item in children:
             if item.get("mimeType") == FOLDER_MIMETYPE:
                 queue.append((item["id"], rel / item["name"]))
 
-        # 파일 다운로드
+        # 파일은 풀에 제출
         for item in children:
             mime = item.get("mimeType", "")
             if mime == FOLDER_MIMETYPE:
@@ -190,16 +391,25 @@ def download_tree_under_encoded(
 
             size_bytes = int(item.get("size", 0) or 0) or None
             local_path = out_root / rel / name
+            local_size = local_sizes.get(str(rel / name)) if local_sizes is not None else None
 
-            download_file(
-                service,
-                file_id=item["id"],
-                target_path=local_path,
-                size_bytes=size_bytes,
-                chunksize=chunksize,
-                skip_existing=skip_existing,
+            futures.append(
+                pool.submit(
+                    _download_one, creds, item["id"], local_path, size_bytes,
+                    chunksize, skip_existing, item.get("md5Checksum"), local_size,
+                )
             )
 
+    errors = 0
+    for fut in as_completed(futures):
+        try:
+            fut.result()
+        except Exception as e:
+            errors += 1
+            print(f"[ERROR] 다운로드 실패: {type(e).__name__}: {e}")
+
+    return errors
+
 
 def main():
     ap = argparse.ArgumentParser()
@@ -210,36 +420,52 @@ def main():
     ap.add_argument("--chunksize-mb", type=int, default=16, help="다운로드 청크 크기(MB)")
     ap.add_argument("--skip-existing", action="store_true", help="로컬에 동일 크기 파일이 있으면 스킵")
     ap.add_argument("--only-mp4", action="store_true", help="mp4만 다운로드")
+    ap.add_argument("--gdrive-concurrency", type=int, default=8, help="폴더 탐색 동시 files.list 수")
+    ap.add_argument("--max-workers", type=int, default=4, help="동시 다운로드 수")
     args = ap.parse_args()
 
     out_root = Path(args.out).resolve()
     out_root.mkdir(parents=True, exist_ok=True)
 
-    service = get_gdrive_service(credentials_path=args.credentials, token_path=args.token)
+    creds = load_gdrive_credentials(credentials_path=args.credentials, token_path=args.token)
+    service = get_gdrive_service(creds)
     drive_id = get_drive_id(service, args.root_id)
     print(f"[INFO] driveId = {drive_id if drive_id else '(None - My Drive or unknown)'}")
 
-    encoded_folders = find_all_encoded_folders(service, args.root_id, drive_id)
+    encoded_folders = find_all_encoded_folders(creds, args.root_id, drive_id, max_workers=args.gdrive_concurrency)
     print(f"[INFO] found encoded folders: {len(encoded_folders)}")
     for ef in encoded_folders:
         print(f"  - {ef.rel_path} (id={ef.folder_id})")
 
     chunksize = args.chunksize_mb * 1024 * 1024
-    for ef in encoded_folders:
-        print("\n==============================")
-        print(f"[ENCODED] {ef.rel_path}")
-        print("==============================")
-        download_tree_under_encoded(
-            service,
-            encoded_folder=ef,
-            drive_id=drive_id,
-            out_root=out_root,
-            chunksize=chunksize,
-            skip_existing=args.skip_existing,
-            only_mp4=args.only_mp4,
-        )
-
-    print("\n[ALL DONE]")
+
+    local_sizes: Optional[Dict[str, int]] = None
+    if args.skip_existing:
+        local_sizes = scan_local_sizes(out_root)
+        print(f"[INFO] local files scanned: {len(local_sizes)}")
+
+    total_errors = 0
+    with ThreadPoolExecutor(max_workers=args.max_workers) as pool:
+        for ef in encoded_folders:
+            print("\n==============================")
+            print(f"[ENCODED] {ef.rel_path}")
+            print("==============================")
+            total_errors += download_tree_under_encoded(
+                creds,
+                encoded_folder=ef,
+                drive_id=drive_id,
+                out_root=out_root,
+                chunksize=chunksize,
+                skip_existing=args.skip_existing,
+                only_mp4=args.only_mp4,
+                pool=pool,
+                local_sizes=local_sizes,
+            )
+
+    if total_errors:
+        print(f"\n[ALL DONE] (실패 {total_errors}건)")
+    else:
+        print("\n[ALL DONE]")
 
 
 if __name__ == "__main__":
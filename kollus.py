@@ -2,6 +2,8 @@ import os
 import requests
 
 mp4List = [{"title":"박형준 3-2","mp4":"https://bluetiger.zcdn.kollus.com/kr/media-file.mp4?_s=cbc56"}]
+
+def sanitize(name):
     for c in r'<>:"/\|?*':
         name = name.replace(c, '_')
     return name.strip()
@@ -9,16 +11,20 @@ mp4List = [{"title":"박형준 3-2","mp4":"https://bluetiger.zcdn.kollus.com/kr/
 for i, item in enumerate(mp4List):
     filename = f"{sanitize(item['title'])}.mp4"
     print(f"[{i+1}/{len(mp4List)}] {filename}")
-    
+
     r = requests.get(item['mp4'], stream=True)
     total = int(r.headers.get('content-length', 0))
     done = 0
-    
+    last_bucket = -1
+
     with open(f'videos/{filename}', 'wb') as f:
-        for chunk in r.iter_content(8192):
+        # 8KB -> 1MB 청크: 파이썬 루프/시스콜 횟수가 1/128로 줄어든다
+        for chunk in r.iter_content(chunk_size=1024*1024):
             f.write(chunk)
             done += len(chunk)
-            if total:
+            bucket = done >> 20  # 진행률 출력은 1MB마다 한 번만
+            if total and bucket != last_bucket:
+                last_bucket = bucket
                 print(f"\r  {done*100/total:.1f}%", end='')
     print(" ✓")
 
@@ -14,20 +14,35 @@ from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
 import io
+import json
 import os
-import re
+import queue
+import shutil
+import sqlite3
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
+from requests.adapters import HTTPAdapter
+
+# numpy가 있으면 대규모 스캔 결과의 사이즈 필터를 벡터화 (필수 의존성은 아님)
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 # =========================
@@ -38,14 +53,16 @@ GDRIVE_ROOT_FOLDER_ID = "0ALadQkEfuBnGUk9PVA"
 
 LOCAL_WORKDIR = "./tmp_work"
 FIX_DIRNAME = "fix_work"
+SCAN_CACHE_FILE = "scan_cache.sqlite"
 
-CHUNK_SIZE = 16 * 1024 * 1024  # 16MB
+# 64MB: 재개형 업로드는 청크마다 왕복 1회가 생기므로, 청크를 키우면
+# 기가비트급 회선에서 프로토콜 오버헤드가 1/4로 줄어든다
+CHUNK_SIZE = 64 * 1024 * 1024  # 64MB
 
 FFMPEG_BIN = "ffmpeg"
 FFPROBE_BIN = "ffprobe"
 
 FOLDER_MIMETYPE = "application/vnd.google-apps.folder"
-_time_pattern = re.compile(r"time=(\d+):(\d+):(\d+\.\d+)")
 
 
 # =========================
@@ -70,18 +87,18 @@ def run_cmd(cmd: List[str]) -> str:
 
 
 def get_video_duration(path: Path) -> float:
+    # 텍스트 파싱 대신 JSON 출력 파싱 (출력 포맷 변화에 덜 깨짐)
     cmd = [
         FFPROBE_BIN,
         "-v",
         "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
+        "-print_format",
+        "json",
+        "-show_format",
         str(path),
     ]
-    out = run_cmd(cmd).strip()
-    return float(out)
+    out = run_cmd(cmd)
+    return float(json.loads(out)["format"]["duration"])
 
 
 def calc_bitrate_kbps(duration_sec: float, target_bytes: int, safety_margin: float) -> int:
@@ -91,14 +108,85 @@ def calc_bitrate_kbps(duration_sec: float, target_bytes: int, safety_margin: flo
     return int(bps / 1000)
 
 
-def _parse_ffmpeg_time_to_seconds(line: str) -> Optional[float]:
-    m = _time_pattern.search(line)
-    if not m:
+def run_ffmpeg_with_progress(cmd: List[str], duration: Optional[float], tag: str) -> None:
+    """
+    ffmpeg을 -progress pipe:1 -nostats로 실행해 key=value 진행 라인을 한 줄씩 소비.
+    run_cmd처럼 전체 로그를 문자열로 쌓지 않고(30분 인코딩이면 수 MB),
+    실패 대비로 마지막 몇십 줄만 tail 버퍼에 남긴다. 진행률은 10% 구간 단위 출력.
+    """
+    full_cmd = cmd[:-1] + ["-progress", "pipe:1", "-nostats"] + cmd[-1:]
+    tail: deque = deque(maxlen=50)
+    last_bucket = -1
+
+    process = subprocess.Popen(
+        full_cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="ignore",
+    )
+    assert process.stdout is not None
+    for line in process.stdout:  # 블로킹 읽기 (폴링 없음)
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("out_time_ms="):
+            # key=value 형식이라 startswith면 충분 (out_time_ms 값의 단위는 마이크로초)
+            if duration:
+                try:
+                    current = int(line[len("out_time_ms="):]) / 1_000_000
+                except ValueError:
+                    continue
+                bucket = min(10, int(current * 10 / duration))
+                if bucket != last_bucket:
+                    last_bucket = bucket
+                    print(f"[ENC][{tag}] {bucket*10}%")
+        else:
+            tail.append(line)
+
+    returncode = process.wait()
+    if returncode != 0:
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}\n" + "\n".join(tail))
+
+
+# 하드웨어 H.264 인코더 (첫 인코딩 때 한 번만 탐지)
+_hw_encoder: Optional[str] = None
+_hw_encoder_probed = False
+
+
+def get_hw_encoder() -> Optional[str]:
+    """
+    ffmpeg가 지원하는 하드웨어 H.264 인코더를 찾는다.
+    NVENC/VAAPI가 있으면 2-pass libx264 slow 대신 단일 패스 GPU 인코딩을 쓴다
+    (화질/압축률을 약간 내주고 인코딩 시간을 자릿수 단위로 줄임).
+    FIX_HW_ENCODER=off 환경변수로 강제 비활성화 가능.
+    """
+    global _hw_encoder, _hw_encoder_probed
+    if _hw_encoder_probed:
+        return _hw_encoder
+    _hw_encoder_probed = True
+
+    if os.getenv("FIX_HW_ENCODER", "").lower() in ("off", "0", "no"):
+        return None
+
+    try:
+        out = subprocess.run(
+            [FFMPEG_BIN, "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+        ).stdout
+    except OSError:
         return None
-    h = int(m.group(1))
-    mm = int(m.group(2))
-    ss = float(m.group(3))
-    return h * 3600 + mm * 60 + ss
+    for enc in ("h264_nvenc", "h264_vaapi"):
+        if enc in out:
+            _hw_encoder = enc
+            print(f"[INFO] 하드웨어 인코더 사용: {enc}")
+            break
+    return _hw_encoder
 
 
 def encode_design_lecture_profile(
@@ -107,34 +195,117 @@ def encode_design_lecture_profile(
     *,
     target_bytes: int,
     safety_margin: float = 0.93,
+    two_pass: bool = False,
+    duration: Optional[float] = None,
 ) -> None:
     """
     디자인 강의(슬라이드/툴 UI) 가독성 우선 인코딩 프로파일:
-    - 2-pass x264
+    - 기본은 CRF+VBV 상한 단일 패스 x264, two_pass=True면 기존 2-pass
+      (NVENC/VAAPI 있으면 단일 패스 하드웨어 인코딩)
     - scale lanczos
     - tune stillimage
     - 오디오 128k 고정
     - 비트레이트가 너무 낮으면 720p로 다운스케일(텍스트 가독성 목적)
     """
-    duration = get_video_duration(input_path)
+    if duration is None:
+        duration = get_video_duration(input_path)
     total_kbps = calc_bitrate_kbps(duration, target_bytes, safety_margin)
 
     a_kbps = 128
     v_kbps = max(total_kbps - a_kbps, 300)
 
-    if v_kbps < 1200:
-        vf = "scale=-2:720:flags=lanczos"
-    else:
-        vf = "scale=-2:1080:flags=lanczos"
+    height = 720 if v_kbps < 1200 else 1080
+    vf = f"scale=-2:{height}:flags=lanczos"
 
     print(
         f"[RE-ENCODE] duration={duration:.1f}s target_bytes={target_bytes} margin={safety_margin} "
         f"total~{total_kbps}kbps (v={v_kbps}, a={a_kbps}) vf={vf}"
     )
 
+    encoder = get_hw_encoder()
+    if encoder == "h264_nvenc":
+        # 디코드부터 스케일까지 GPU에 두면 프레임 왕복 비용이 없다
+        cmd = [
+            FFMPEG_BIN,
+            "-y",
+            "-hwaccel", "cuda",
+            "-hwaccel_output_format", "cuda",
+            "-i", str(input_path),
+            "-vf", f"scale_cuda=-2:{height}",
+            "-c:v", "h264_nvenc",
+            "-preset", "p5",
+            "-tune", "hq",
+            "-rc", "vbr",
+            "-b:v", f"{v_kbps}k",
+            "-maxrate", f"{int(v_kbps * 1.5)}k",
+            "-bufsize", f"{v_kbps * 2}k",
+            "-c:a", "aac",
+            "-b:a", f"{a_kbps}k",
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            str(output_path),
+        ]
+        run_ffmpeg_with_progress(cmd, duration, output_path.name)
+        size_bytes = output_path.stat().st_size
+        print(f"[RE-ENCODE] result = {size_bytes/(1024*1024):.1f} MiB ({size_bytes/1_000_000:.1f} MB_dec)")
+        return
+
+    if encoder == "h264_vaapi":
+        cmd = [
+            FFMPEG_BIN,
+            "-y",
+            "-hwaccel", "vaapi",
+            "-hwaccel_output_format", "vaapi",
+            "-i", str(input_path),
+            "-vf", f"scale_vaapi=-2:{height}",
+            "-c:v", "h264_vaapi",
+            "-b:v", f"{v_kbps}k",
+            "-maxrate", f"{int(v_kbps * 1.5)}k",
+            "-bufsize", f"{v_kbps * 2}k",
+            "-c:a", "aac",
+            "-b:a", f"{a_kbps}k",
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            str(output_path),
+        ]
+        run_ffmpeg_with_progress(cmd, duration, output_path.name)
+        size_bytes = output_path.stat().st_size
+        print(f"[RE-ENCODE] result = {size_bytes/(1024*1024):.1f} MiB ({size_bytes/1_000_000:.1f} MB_dec)")
+        return
+
+    if not two_pass:
+        # CRF + VBV 상한 단일 패스: 강의 콘텐츠에선 2-pass와 결과 용량이 거의 같고
+        # 인코딩 시간은 절반 이하. 상한 초과 시 호출부가 two_pass=True로 재시도한다.
+        cmd = [
+            FFMPEG_BIN,
+            "-y",
+            "-i", str(input_path),
+            "-vf", vf,
+            "-c:v", "libx264",
+            "-preset", "slow",
+            "-tune", "stillimage",
+            # 프레임 스레딩을 코어 수만큼 명시 (환경에 따라 기본값이 보수적인 빌드 대비)
+            "-threads", "0",
+            "-crf", "23",
+            "-maxrate", f"{v_kbps}k",
+            "-bufsize", f"{2 * v_kbps}k",
+            "-c:a", "aac",
+            "-b:a", f"{a_kbps}k",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            str(output_path),
+        ]
+        run_ffmpeg_with_progress(cmd, duration, output_path.name)
+        size_bytes = output_path.stat().st_size
+        print(f"[RE-ENCODE] result = {size_bytes/(1024*1024):.1f} MiB ({size_bytes/1_000_000:.1f} MB_dec)")
+        return
+
     passlog = str(output_path) + ".passlog"
 
-    # pass 1 (video only)
+    # pass 1 (video only): 1패스는 비트 분배 통계만 뽑으면 되므로 빠른 프리셋으로.
+    # 최종 화질은 2패스 프리셋이 결정하고, 1패스 품질이 결과 비트레이트에 주는
+    # 영향은 미미한데 slow를 두 번 돌리면 벽시계 시간만 거의 2배가 된다.
     cmd1 = [
         FFMPEG_BIN,
         "-y",
@@ -145,9 +316,13 @@ def encode_design_lecture_profile(
         "-c:v",
         "libx264",
         "-preset",
-        "slow",
+        "veryfast",
         "-tune",
         "stillimage",
+        "-x264-params",
+        "rc-lookahead=20",
+        "-threads",
+        "0",
         "-b:v",
         f"{v_kbps}k",
         "-pass",
@@ -159,7 +334,7 @@ def encode_design_lecture_profile(
         "mp4",
         os.devnull,
     ]
-    run_cmd(cmd1)
+    run_ffmpeg_with_progress(cmd1, duration, f"pass1/{output_path.name}")
 
     # pass 2 (video + audio)
     cmd2 = [
@@ -175,6 +350,8 @@ def encode_design_lecture_profile(
         "slow",
         "-tune",
         "stillimage",
+        "-threads",
+        "0",
         "-b:v",
         f"{v_kbps}k",
         "-pass",
@@ -193,16 +370,11 @@ def encode_design_lecture_profile(
         "mp4",
         str(output_path),
     ]
-    run_cmd(cmd2)
+    run_ffmpeg_with_progress(cmd2, duration, f"pass2/{output_path.name}")
 
-    # passlog cleanup
+    # passlog cleanup (missing_ok로 exists+unlink 시스콜 2번을 1번으로)
     for ext in ("", ".mbtree"):
-        p = Path(passlog + ext)
-        if p.exists():
-            try:
-                p.unlink()
-            except Exception:
-                pass
+        Path(passlog + ext).unlink(missing_ok=True)
 
     size_bytes = output_path.stat().st_size
     print(f"[RE-ENCODE] result = {size_bytes/(1024*1024):.1f} MiB ({size_bytes/1_000_000:.1f} MB_dec)")
@@ -211,7 +383,7 @@ def encode_design_lecture_profile(
 # =========================
 # GDrive Auth / API
 # =========================
-def get_gdrive_service():
+def load_gdrive_credentials() -> Credentials:
     base_dir = Path(__file__).parent
     token_path = base_dir / "token.json"
     cred_path = base_dir / "credentials.json"
@@ -228,22 +400,57 @@ def get_gdrive_service():
             creds = flow.run_local_server(port=0)
         token_path.write_text(creds.to_json(), encoding="utf-8")
 
+    return creds
+
+
+def get_gdrive_service(creds: Optional[Credentials] = None):
+    # googleapiclient의 Http는 스레드 간 공유 금지 -> 스레드마다 서비스 1개씩
+    if creds is None:
+        creds = load_gdrive_credentials()
     return build("drive", "v3", credentials=creds)
 
 
-def list_children(service, parent_id: str, *, want_folders: Optional[bool] = None) -> List[dict]:
+def _make_drive_session(creds: Credentials) -> AuthorizedSession:
+    # keep-alive 커넥션 풀을 키워서 파일/청크마다 TLS 핸드셰이크가 안 생기게 함
+    session = AuthorizedSession(creds)
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+    return session
+
+
+_thread_local = threading.local()
+
+
+def _get_thread_service(creds: Credentials):
+    service = getattr(_thread_local, "service", None)
+    if service is None:
+        service = get_gdrive_service(creds)
+        _thread_local.service = service
+    return service
+
+
+def list_children(
+    service,
+    parent_id: str,
+    *,
+    want_folders: Optional[bool] = None,
+    modified_after: Optional[str] = None,
+) -> List[dict]:
     """
     parent_id의 직계 children을 가져옴.
     want_folders:
       - True: 폴더만
       - False: 폴더 제외(파일만)
       - None: 전부
+    modified_after: RFC3339 시각. 주면 그 이후 수정된 파일만 내려받음
+      (폴더는 트리 순회가 끊기지 않게 항상 포함)
     """
     q = [f"'{parent_id}' in parents", "trashed = false"]
     if want_folders is True:
         q.append(f"mimeType = '{FOLDER_MIMETYPE}'")
     elif want_folders is False:
         q.append(f"mimeType != '{FOLDER_MIMETYPE}'")
+    if modified_after:
+        q.append(f"(mimeType = '{FOLDER_MIMETYPE}' or modifiedTime > '{modified_after}')")
     qstr = " and ".join(q)
 
     items: List[dict] = []
@@ -251,7 +458,7 @@ def list_children(service, parent_id: str, *, want_folders: Optional[bool] = Non
     while True:
         res = service.files().list(
             q=qstr,
-            fields="nextPageToken, files(id, name, mimeType, size)",
+            fields="nextPageToken, files(id, name, mimeType, size, modifiedTime)",
             pageToken=page_token,
             includeItemsFromAllDrives=True,
             supportsAllDrives=True,
@@ -264,8 +471,21 @@ def list_children(service, parent_id: str, *, want_folders: Optional[bool] = Non
     return items
 
 
-def download_file(service, file_id: str, out_path: Path) -> None:
+def download_file(service, file_id: str, out_path: Path, session: Optional[AuthorizedSession] = None) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if session is not None:
+        # alt=media GET 한 번으로 전체를 스트리밍: MediaIoBaseDownload처럼
+        # 16MB 청크마다 별도 Range 요청/메모리 버퍼를 만들지 않는다.
+        url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true"
+        with session.get(url, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            with io.FileIO(out_path, "wb") as fh:
+                shutil.copyfileobj(resp.raw, fh, length=1 << 20)
+        print(f"[DL] done: {out_path}")
+        return
+
     request = service.files().get_media(fileId=file_id, supportsAllDrives=True)
 
     with io.FileIO(out_path, "wb") as fh:
@@ -280,11 +500,57 @@ def download_file(service, file_id: str, out_path: Path) -> None:
                 if bucket != last_bucket and 0 <= bucket <= 10:
                     last_bucket = bucket
                     print(f"[DL][{file_id}] {bucket*10}%")
+                elif not done:
+                    # 진행 구간이 안 바뀐 채 돌아온 경우 잠깐 코어 양보
+                    time.sleep(0.05)
 
     print(f"[DL] done: {out_path}")
 
 
-def update_file_content(service, file_id: str, local_path: Path) -> None:
+def _update_file_content_resumable(session: AuthorizedSession, file_id: str, local_path: Path) -> None:
+    """
+    재개형 업로드를 raw REST로 직접 수행: 세션 URI 발급(PATCH) 후
+    같은 keep-alive 커넥션으로 청크 PUT. googleapiclient(httplib2) 경로와 달리
+    커넥션 풀을 재사용해 청크마다 새 HTTPS 연결을 만들지 않는다.
+    """
+    size = local_path.stat().st_size
+    url = (
+        f"https://www.googleapis.com/upload/drive/v3/files/{file_id}"
+        "?uploadType=resumable&supportsAllDrives=true"
+    )
+    resp = session.patch(url, headers={"X-Upload-Content-Length": str(size)}, timeout=60)
+    resp.raise_for_status()
+    upload_uri = resp.headers["Location"]
+
+    print(f"[UPD] start: fileId={file_id} <- {local_path.name}")
+    sent = 0
+    last_bucket = -1
+    with open(local_path, "rb") as f:
+        while sent < size:
+            chunk = f.read(CHUNK_SIZE)
+            end = sent + len(chunk) - 1
+            r = session.put(
+                upload_uri,
+                headers={"Content-Range": f"bytes {sent}-{end}/{size}"},
+                data=chunk,
+                timeout=120,
+            )
+            if r.status_code not in (200, 201, 308):
+                r.raise_for_status()
+            sent += len(chunk)
+            bucket = min(10, sent * 10 // size)
+            if bucket != last_bucket:
+                last_bucket = bucket
+                print(f"[UPD][{file_id}] {bucket*10}%")
+
+    print(f"[UPD] done: fileId={file_id}")
+
+
+def update_file_content(service, file_id: str, local_path: Path, session: Optional[AuthorizedSession] = None) -> None:
+    if session is not None:
+        _update_file_content_resumable(session, file_id, local_path)
+        return
+
     media = MediaFileUpload(str(local_path), resumable=True, chunksize=CHUNK_SIZE)
     req = service.files().update(
         fileId=file_id,
@@ -304,6 +570,8 @@ def update_file_content(service, file_id: str, local_path: Path) -> None:
             if bucket != last_bucket and 0 <= bucket <= 10:
                 last_bucket = bucket
                 print(f"[UPD][{file_id}] {bucket*10}%")
+            elif resp is None:
+                time.sleep(0.05)
 
     print(f"[UPD] done: fileId={file_id}")
 
@@ -317,6 +585,7 @@ class Row:
     file_name: str
     file_id: str
     size_bytes: int
+    modified_time: str = ""
 
     @property
     def size_mib(self) -> float:
@@ -327,70 +596,286 @@ class Row:
         return self.size_bytes / 1_000_000
 
 
-def find_all_encoded_folders(service, root_id: str) -> List[Tuple[str, str]]:
+def find_all_encoded_folders(creds: Credentials, root_id: str, *, max_workers: int = 8) -> List[Tuple[str, str]]:
     """
     root_id 아래 폴더를 전수 순회하면서 name == 'encoded' 폴더를 수집.
+    직렬 DFS는 폴더당 RTT를 순서대로 기다리므로, 한 레벨의 폴더들을
+    스레드 풀로 동시에 조회한다 (총 API 호출 수는 같고 벽시계 시간만 줄어듦).
     반환: [(folder_id, folder_path_string)]
     """
     encoded: List[Tuple[str, str]] = []
-    stack: List[Tuple[str, List[str]]] = [(root_id, [])]
-
-    while stack:
-        folder_id, path_parts = stack.pop()
-        child_folders = list_children(service, folder_id, want_folders=True)
-
-        for f in child_folders:
-            name = f.get("name", "")
-            fid = f["id"]
-            new_parts = path_parts + [name]
-
-            if name == "encoded":
-                encoded.append((fid, "/" + "/".join(new_parts)))
-            else:
-                stack.append((fid, new_parts))
+    current: List[Tuple[str, List[str]]] = [(root_id, [])]
+
+    def _list_one(item: Tuple[str, List[str]]) -> Tuple[List[str], List[dict]]:
+        fid, parts = item
+        return parts, list_children(_get_thread_service(creds), fid, want_folders=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while current:
+            next_level: List[Tuple[str, List[str]]] = []
+            for path_parts, child_folders in pool.map(_list_one, current):
+                for f in child_folders:
+                    name = f.get("name", "")
+                    fid = f["id"]
+                    new_parts = path_parts + [name]
+
+                    if name == "encoded":
+                        encoded.append((fid, "/" + "/".join(new_parts)))
+                    else:
+                        next_level.append((fid, new_parts))
+            current = next_level
 
     return encoded
 
 
-def list_all_files_recursive(service, encoded_folder_id: str, encoded_folder_path: str) -> List[Row]:
+def list_all_files_recursive(
+    creds: Credentials,
+    encoded_folder_id: str,
+    encoded_folder_path: str,
+    *,
+    max_workers: int = 8,
+    modified_after: Optional[str] = None,
+) -> List[Row]:
     """
-    encoded_folder_id 아래를 재귀로 내려가며 파일을 수집.
+    encoded_folder_id 아래를 레벨 단위 BFS로 내려가며 파일을 수집 (형제 폴더 동시 조회).
+    modified_after를 주면 그 이후 변경된 파일만 수집(증분 스캔).
     """
     rows: List[Row] = []
-    stack: List[str] = [encoded_folder_id]
+    current: List[str] = [encoded_folder_id]
+
+    def _list_one(fid: str) -> List[dict]:
+        return list_children(_get_thread_service(creds), fid, want_folders=None, modified_after=modified_after)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while current:
+            next_level: List[str] = []
+            for children in pool.map(_list_one, current):
+                for item in children:
+                    if item.get("mimeType") == FOLDER_MIMETYPE:
+                        next_level.append(item["id"])
+                        continue
+
+                    size_str = item.get("size")
+                    if size_str is None:
+                        continue
+
+                    rows.append(
+                        Row(
+                            encoded_folder_path=encoded_folder_path,
+                            file_name=item.get("name", ""),
+                            file_id=item["id"],
+                            size_bytes=int(size_str),
+                            modified_time=item.get("modifiedTime", ""),
+                        )
+                    )
+            current = next_level
 
-    while stack:
-        cur = stack.pop()
-        children = list_children(service, cur, want_folders=None)
+    return rows
 
-        for item in children:
-            if item.get("mimeType") == FOLDER_MIMETYPE:
-                stack.append(item["id"])
-                continue
 
-            size_str = item.get("size")
-            if size_str is None:
+# =========================
+# 스캔 캐시 (증분 스캔용)
+# =========================
+def _open_scan_cache(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        " file_id TEXT PRIMARY KEY,"
+        " encoded_folder_path TEXT NOT NULL,"
+        " file_name TEXT NOT NULL,"
+        " size_bytes INTEGER NOT NULL,"
+        " modified_time TEXT NOT NULL)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    return conn
+
+
+def load_scan_cache(conn: sqlite3.Connection) -> Tuple[Optional[str], Dict[str, Row]]:
+    """(직전 스캔 시각, file_id -> Row 맵) 반환. 캐시 없으면 (None, {})."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'last_scan'").fetchone()
+    last_scan = row[0] if row else None
+    cached: Dict[str, Row] = {}
+    for fid, folder_path, name, size, mtime in conn.execute(
+        "SELECT file_id, encoded_folder_path, file_name, size_bytes, modified_time FROM files"
+    ):
+        cached[fid] = Row(folder_path, name, fid, size, mtime)
+    return last_scan, cached
+
+
+def save_scan_cache(conn: sqlite3.Connection, scan_started_at: str, rows: List[Row]) -> None:
+    with conn:
+        conn.execute("DELETE FROM files")
+        conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+            [(r.file_id, r.encoded_folder_path, r.file_name, r.size_bytes, r.modified_time) for r in rows],
+        )
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_scan', ?)", (scan_started_at,))
+
+
+def _local_md5(path: Path) -> str:
+    with open(path, "rb") as f:
+        try:
+            # 3.11+: C 구현 fast path (GIL도 풀어줌)
+            return hashlib.file_digest(f, "md5").hexdigest()
+        except AttributeError:
+            h = hashlib.md5()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+            return h.hexdigest()
+
+
+def _row_paths(fix_dir: Path, r: Row) -> Tuple[Path, Path, Path, Path]:
+    # 작업 파일 경로(충돌 방지: fileId 기반)
+    src_part = fix_dir / f"{r.file_id}.src.part"
+    src = fix_dir / f"{r.file_id}.src"
+    out_part = fix_dir / f"{r.file_id}.out.mp4.part"
+    out = fix_dir / f"{r.file_id}.out.mp4"
+    return src_part, src, out_part, out
+
+
+def run_fix_pipeline(
+    creds: Credentials,
+    rows: List[Row],
+    fix_dir: Path,
+    threshold_bytes: int,
+    max_mib: int,
+    cleanup: bool,
+) -> int:
+    """
+    다운로드 -> 인코딩 -> 업로드 3단계 파이프라인.
+    단계마다 스레드 1개 + maxsize=1 큐로 연결해서, N번째 파일을 인코딩하는 동안
+    N+1번째 다운로드와 N-1번째 업로드가 겹치게 한다(네트워크와 CPU가 독립 자원).
+    큐 maxsize=1이 fix_dir에 동시에 존재하는 작업 파일 수(디스크 사용량)도 묶는다.
+    각 단계는 실패한 파일을 건너뛰고 다음 파일로 진행. 반환: 성공(fixed) 수
+    """
+    enc_q: "queue.Queue[Optional[Tuple[Row, Path]]]" = queue.Queue(maxsize=1)
+    up_q: "queue.Queue[Optional[Tuple[Row, Path, int]]]" = queue.Queue(maxsize=1)
+    fixed = 0
+
+    def downloader():
+        service = get_gdrive_service(creds)
+        # 대용량 스트리밍용 세션 (keep-alive로 파일마다 TLS 핸드셰이크 안 함)
+        session = _make_drive_session(creds)
+        for r in rows:
+            src_part, src, out_part, out = _row_paths(fix_dir, r)
+            try:
+                print("\n==============================")
+                print(f"[FIX] {r.encoded_folder_path}/{r.file_name}")
+                print(f"[FIX] fileId={r.file_id} size={r.size_mib:.1f}MiB ({r.size_mb_dec:.1f}MB_dec) -> <= {max_mib}MiB")
+                print("==============================")
+
+                # 시작 시 찌꺼기 정리(이전 실패 잔재). 항상 새로 받게끔 src/out도 초기화
+                for p in (src_part, out_part, src, out):
+                    p.unlink(missing_ok=True)
+
+                download_file(service, r.file_id, src_part, session=session)
+                src_part.replace(src)
+            except Exception as e:
+                print(f"[FIX-ERROR] download fileId={r.file_id} {type(e).__name__}: {e}")
+                continue
+            enc_q.put((r, src))
+        enc_q.put(None)
+
+    def encoder():
+        while True:
+            item = enc_q.get()
+            if item is None:
+                break
+            r, src = item
+            _, _, out_part, out = _row_paths(fix_dir, r)
+            try:
+                # ffprobe는 파일당 1번이면 충분 (재시도 때 src는 그대로)
+                duration = get_video_duration(src)
+
+                # 1차는 빠른 단일 패스 CRF, 초과 시에만 진짜 2-pass로 재시도
+                attempts = [(0.93, False), (0.93, True), (0.90, True)]
+                ok = False
+                last_size: Optional[int] = None
+
+                for m, two_pass in attempts:
+                    out_part.unlink(missing_ok=True)
+                    encode_design_lecture_profile(
+                        src,
+                        out_part,
+                        target_bytes=threshold_bytes,
+                        safety_margin=m,
+                        two_pass=two_pass,
+                        duration=duration,
+                    )
+
+                    # out_part -> out 교체(이전 out 있으면 replace가 덮어씀)
+                    out_part.replace(out)
+                    last_size = out.stat().st_size
+
+                    if last_size <= threshold_bytes:
+                        ok = True
+                        break
+
+                    print(
+                        f"[FIX-WARN] still oversize: {last_size/(1024*1024):.1f}MiB "
+                        f"-> retry (2-pass / lower margin)"
+                    )
+
+                if not ok:
+                    raise RuntimeError(f"re-encode result still oversize: {last_size} bytes")
+            except Exception as e:
+                print(f"[FIX-ERROR] encode fileId={r.file_id} {type(e).__name__}: {e}")
+                # 실패 시에는 src/out을 남겨서 원인 분석/재시도 가능하게 둠
+                continue
+            up_q.put((r, out, last_size))
+        up_q.put(None)
+
+    def uploader():
+        nonlocal fixed
+        service = get_gdrive_service(creds)
+        session = _make_drive_session(creds)
+        while True:
+            item = up_q.get()
+            if item is None:
+                break
+            r, out, last_size = item
+            try:
+                # 이전에 중단된 실행이 이미 같은 결과를 올려놨으면 수백 MB 재업로드 생략
+                meta = service.files().get(
+                    fileId=r.file_id,
+                    fields="size,md5Checksum",
+                    supportsAllDrives=True,
+                ).execute()
+                remote_md5 = meta.get("md5Checksum")
+                if (
+                    remote_md5
+                    and int(meta.get("size", -1)) == last_size
+                    and _local_md5(out) == remote_md5
+                ):
+                    print(f"[UPD] 원격이 이미 동일(md5 일치) -> 업로드 생략: fileId={r.file_id}")
+                else:
+                    update_file_content(service, r.file_id, out, session=session)
+            except Exception as e:
+                print(f"[FIX-ERROR] upload fileId={r.file_id} {type(e).__name__}: {e}")
                 continue
 
-            rows.append(
-                Row(
-                    encoded_folder_path=encoded_folder_path,
-                    file_name=item.get("name", ""),
-                    file_id=item["id"],
-                    size_bytes=int(size_str),
-                )
-            )
+            fixed += 1
+            print(f"[FIX-DONE] fileId={r.file_id} new={last_size/(1024*1024):.1f}MiB")
 
-    return rows
+            if cleanup:
+                # 혹시 남아 있을 수 있는 part도 같이 제거
+                for p in _row_paths(fix_dir, r):
+                    p.unlink(missing_ok=True)
+                print(f"[CLEANUP] cleaned local artifacts for fileId={r.file_id}")
 
+    threads = [
+        threading.Thread(target=downloader, name="fix-download"),
+        threading.Thread(target=encoder, name="fix-encode"),
+        threading.Thread(target=uploader, name="fix-upload"),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
 
-def _safe_unlink(p: Path) -> None:
-    if not p.exists():
-        return
-    try:
-        p.unlink()
-    except Exception:
-        pass
+    return fixed
 
 
 def main():
@@ -407,9 +892,15 @@ def main():
         default="oversize",
         help="oversize=초과만 CSV 기록, all=전부 기록",
     )
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="직전 스캔 캐시(scan_cache.sqlite) 이후 변경된 파일만 Drive에서 가져옴"
+        " (삭제된 파일 정리는 전체 스캔 때 됨)",
+    )
     args = ap.parse_args()
 
-    service = get_gdrive_service()
+    creds = load_gdrive_credentials()
 
     threshold_bytes = args.max_mib * 1024 * 1024
     scan_min_bytes = int(args.scan_min_mib * 1024 * 1024)
@@ -420,34 +911,77 @@ def main():
     fix_dir = work_dir / FIX_DIRNAME
     fix_dir.mkdir(parents=True, exist_ok=True)
 
-    encoded_folders = find_all_encoded_folders(service, GDRIVE_ROOT_FOLDER_ID)
+    # 증분 스캔: 직전 스캔 이후 수정된 파일만 Drive에서 받고 나머지는 캐시에서 채움
+    cache_conn = _open_scan_cache(base_dir / SCAN_CACHE_FILE)
+    last_scan: Optional[str] = None
+    cached_rows: Dict[str, Row] = {}
+    if args.incremental:
+        last_scan, cached_rows = load_scan_cache(cache_conn)
+        if last_scan is None:
+            print("[SCAN] 스캔 캐시 없음 -> 전체 스캔으로 진행")
+        else:
+            print(f"[SCAN] 증분 스캔: {last_scan} 이후 변경분만 조회 (캐시 {len(cached_rows)}건)")
+
+    scan_started_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    encoded_folders = find_all_encoded_folders(creds, GDRIVE_ROOT_FOLDER_ID)
     print(f"[SCAN] encoded folders found: {len(encoded_folders)}")
 
-    all_rows: List[Row] = []
+    scanned_rows: List[Row] = []
     for folder_id, folder_path in encoded_folders:
-        all_rows.extend(list_all_files_recursive(service, folder_id, folder_path))
+        scanned_rows.extend(
+            list_all_files_recursive(creds, folder_id, folder_path, modified_after=last_scan)
+        )
+
+    if last_scan is not None:
+        print(f"[SCAN] changed files since last scan: {len(scanned_rows)}")
+        merged = dict(cached_rows)
+        for r in scanned_rows:
+            merged[r.file_id] = r
+        all_rows = list(merged.values())
+    else:
+        all_rows = scanned_rows
+
+    save_scan_cache(cache_conn, scan_started_at, all_rows)
+    cache_conn.close()
 
     print(f"[SCAN] files under encoded folders: {len(all_rows)}")
 
-    oversize = [r for r in all_rows if r.size_bytes > threshold_bytes]
-    oversize_in_range = [r for r in oversize if scan_min_bytes <= r.size_bytes <= scan_max_bytes]
+    if np is not None and len(all_rows) >= 10_000:
+        # 10만+ 행에선 파이썬 속성 접근 루프 대신 int64 배열 + 불리언 마스크
+        sizes = np.fromiter((r.size_bytes for r in all_rows), dtype=np.int64, count=len(all_rows))
+        over_mask = sizes > threshold_bytes
+        range_mask = over_mask & (sizes >= scan_min_bytes) & (sizes <= scan_max_bytes)
+        oversize = [all_rows[i] for i in np.flatnonzero(over_mask)]
+        oversize_in_range = [all_rows[i] for i in np.flatnonzero(range_mask)]
+    else:
+        # 한 번의 패스로 두 리스트를 같이 채움 (이전엔 oversize를 다시 순회)
+        oversize = []
+        oversize_in_range = []
+        for r in all_rows:
+            if r.size_bytes > threshold_bytes:
+                oversize.append(r)
+                if scan_min_bytes <= r.size_bytes <= scan_max_bytes:
+                    oversize_in_range.append(r)
 
     report_path = base_dir / f"gdrive_encoded_report_{_now_tag()}.csv"
     with open(report_path, "w", newline="", encoding="utf-8-sig") as f:
         w = csv.writer(f)
         w.writerow(["encoded_folder", "file_name", "file_id", "size_bytes", "size_MiB", "size_MB_dec"])
         out_rows = all_rows if args.report == "all" else oversize
-        for r in out_rows:
-            w.writerow(
-                [
-                    r.encoded_folder_path,
-                    r.file_name,
-                    r.file_id,
-                    r.size_bytes,
-                    f"{r.size_mib:.1f}",
-                    f"{r.size_mb_dec:.1f}",
-                ]
-            )
+        # --report all이면 수만 행: writerow 반복 대신 writerows 1회,
+        # 프로퍼티(디스크립터) 경유 대신 바로 나눗셈
+        w.writerows(
+            [
+                r.encoded_folder_path,
+                r.file_name,
+                r.file_id,
+                r.size_bytes,
+                format(r.size_bytes / 1048576, ".1f"),
+                format(r.size_bytes / 1_000_000, ".1f"),
+            ]
+            for r in out_rows
+        )
 
     print(f"[REPORT] saved: {report_path}")
     print(f"[SUMMARY] oversize(>{args.max_mib}MiB): {len(oversize)}")
@@ -456,79 +990,19 @@ def main():
     if not args.fix:
         return
 
-    fixed = 0
-    for r in oversize_in_range:
-        if args.limit_fix > 0 and fixed >= args.limit_fix:
-            print("[FIX] limit reached")
-            break
-
-        # 작업 파일 경로(충돌 방지: fileId 기반)
-        src_part = fix_dir / f"{r.file_id}.src.part"
-        src = fix_dir / f"{r.file_id}.src"
-        out_part = fix_dir / f"{r.file_id}.out.mp4.part"
-        out = fix_dir / f"{r.file_id}.out.mp4"
-
-        try:
-            print("\n==============================")
-            print(f"[FIX] {r.encoded_folder_path}/{r.file_name}")
-            print(f"[FIX] fileId={r.file_id} size={r.size_mib:.1f}MiB ({r.size_mb_dec:.1f}MB_dec) -> <= {args.max_mib}MiB")
-            print("==============================")
-
-            # 시작 시 찌꺼기 정리(이전 실패 잔재)
-            for p in (src_part, out_part):
-                _safe_unlink(p)
-            # src/out은 “재시도”를 위해 남길 수도 있지만, 현재 로직은 항상 새로 받게끔 초기화
-            for p in (src, out):
-                _safe_unlink(p)
-
-            # 1) 다운로드
-            download_file(service, r.file_id, src_part)
-            src_part.replace(src)
-
-            # 2) 재인코딩 (margin 2단계로 안정적으로 상한 맞추기)
-            margins = [0.93, 0.90]
-            ok = False
-            last_size: Optional[int] = None
-
-            for m in margins:
-                _safe_unlink(out_part)
-                encode_design_lecture_profile(src, out_part, target_bytes=threshold_bytes, safety_margin=m)
-
-                # out_part -> out 교체(이전 out 있으면 replace가 덮어씀)
-                out_part.replace(out)
-                last_size = out.stat().st_size
-
-                if last_size <= threshold_bytes:
-                    ok = True
-                    break
-
-                print(
-                    f"[FIX-WARN] still oversize: {last_size/(1024*1024):.1f}MiB "
-                    f"-> retry with lower margin"
-                )
-
-            if not ok:
-                raise RuntimeError(f"re-encode result still oversize: {last_size} bytes")
-
-            # 3) 같은 fileId로 업데이트(덮어쓰기)
-            update_file_content(service, r.file_id, out)
-
-            fixed += 1
-            print(f"[FIX-DONE] fileId={r.file_id} new={last_size/(1024*1024):.1f}MiB")
-
-            # 4) cleanup(성공한 경우에만)
-            if args.cleanup:
-                # 혹시 남아 있을 수 있는 part도 같이 제거
-                for p in (src_part, out_part):
-                    _safe_unlink(p)
-                for p in (src, out):
-                    _safe_unlink(p)
-                print(f"[CLEANUP] cleaned local artifacts for fileId={r.file_id}")
-
-        except Exception as e:
-            print(f"[FIX-ERROR] fileId={r.file_id} {type(e).__name__}: {e}")
-            # 실패 시에는 src/out을 남겨서 원인 분석/재시도 가능하게 둠
-
+    rows_to_fix = oversize_in_range
+    if args.limit_fix > 0:
+        # 파이프라인 투입 개수 기준으로 제한(이전에는 성공 수 기준)
+        rows_to_fix = rows_to_fix[: args.limit_fix]
+
+    fixed = run_fix_pipeline(
+        creds,
+        rows_to_fix,
+        fix_dir,
+        threshold_bytes,
+        args.max_mib,
+        args.cleanup,
+    )
     print(f"[FIX-SUMMARY] fixed={fixed}")
 
 
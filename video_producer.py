@@ -1,23 +1,42 @@
 from dotenv import load_dotenv
+import atexit
+import json
+import logging
 import os
-import re
+import queue
+import random
 import subprocess
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from typing import List, Optional, Dict, Tuple
 import time
 
 import dropbox
+import httplib2
 from dropbox.files import FileMetadata
 
+try:
+    import orjson  # 설치돼 있으면 JSON 파싱이 수 배 빠르다 (없어도 동작)
+except ImportError:
+    orjson = None
+
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
 # ===== GDrive API 재시도 설정 =====
-GDRIVE_API_MAX_RETRIES = 3
-GDRIVE_API_RETRY_DELAY = 5
+# 백오프가 대기 시간을 지수적으로 키우므로 재시도 횟수는 넉넉하게 둔다
+GDRIVE_API_MAX_RETRIES = 6
+GDRIVE_API_RETRY_BASE_DELAY = 1.0
+
+# 재시도해볼 가치가 있는 일시적 오류 (그 외 4xx는 재시도해도 똑같이 실패)
+GDRIVE_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 
 # .env에서 환경변수 로드
 load_dotenv()
@@ -27,6 +46,13 @@ TARGET_SIZE_MB = 512
 SAFETY_MARGIN = 0.95
 MAX_RETRIES = 3
 
+# 준비 파이프라인 동시성: 네트워크 I/O(다운로드/조회)와 ffmpeg 인코딩을 겹친다
+PREP_CONCURRENCY = int(os.getenv("PREP_CONCURRENCY", "3"))
+# 동시에 돌릴 ffmpeg 인코딩 수 (CPU x264는 1, NVENC는 GPU 세션 수만큼 늘릴 수 있음)
+ENCODE_PARALLEL = int(os.getenv("ENCODE_PARALLEL", "1"))
+# 다운로드 완료 후 인코딩 대기 중인 파일 수 상한 (디스크 사용량 bound)
+ENCODE_QUEUE_DEPTH = 2
+
 # Dropbox OAuth (refresh token 기반)
 DBX_APP_KEY = os.getenv("DBX_APP_KEY")
 DBX_APP_SECRET = os.getenv("DBX_APP_SECRET")
@@ -45,6 +71,9 @@ FFPROBE_BIN = "ffprobe"
 # 실제 인코딩 대신 로그만 찍는 모드 (테스트용)
 DRY_RUN = False
 
+# 준비 대상으로 보는 영상 확장자 (점 없는 소문자)
+VIDEO_EXTS = frozenset({"mp4", "mov", "mkv", "avi", "wmv"})
+
 # Google Drive
 # 기존 drive.file -> drive 로 변경 (기존 폴더/파일 조회 누락 방지)
 SCOPES = ["https://www.googleapis.com/auth/drive"]
@@ -52,23 +81,81 @@ GDRIVE_ROOT_FOLDER_ID = "0ALadQkEfuBnGUk9PVA"
 FOLDER_MIMETYPE = "application/vnd.google-apps.folder"
 
 
+# ===== 로깅 =====
+# 워커가 여러 개면 print()의 라인 버퍼드 stdout 쓰기가 스레드 간 직렬화 지점이 된다.
+# QueueHandler는 레코드를 큐에 넣기만 하고, 실제 쓰기는 QueueListener 스레드가 전담한다.
+log = logging.getLogger(__name__)
+
+
+def _setup_logging() -> QueueListener:
+    log_q: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(threadName)s] %(message)s"))
+    listener = QueueListener(log_q, handler)
+    listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_q))
+
+    # 리스너 스레드는 데몬이라 인터프리터 종료 시 큐에 남은 레코드
+    # (마지막 [PREP-SUMMARY] 줄 등)가 유실될 수 있다 -> 종료 때 반드시 비운다
+    atexit.register(listener.stop)
+    return listener
+
+
 # ===== 공통 유틸 =====
+def _backoff_delay(attempt: int, retry_after: float = 0.0) -> float:
+    # 서버가 Retry-After를 주면 그 값을 따르고, 아니면 full-jitter 지수 백오프
+    if retry_after > 0:
+        return retry_after
+    return (
+        GDRIVE_API_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+        + random.uniform(0, GDRIVE_API_RETRY_BASE_DELAY)
+    )
+
+
 def _execute_gdrive_with_retry(request, desc: str = ""):
     for attempt in range(1, GDRIVE_API_MAX_RETRIES + 1):
         try:
             return request.execute()
+        except HttpError as e:
+            status = getattr(e.resp, "status", None)
+            if status not in GDRIVE_RETRYABLE_STATUSES:
+                # 403 권한/404 미존재 같은 4xx는 재시도해도 결과가 같으므로 즉시 전파
+                raise
+            log.info(f"[GDRIVE-RETRY] {desc} 시도 {attempt}/{GDRIVE_API_MAX_RETRIES} 실패: HTTP {status}")
+            if attempt >= GDRIVE_API_MAX_RETRIES:
+                log.info(f"[GDRIVE-RETRY] {desc} 재시도 한계 도달 → 예외 전파")
+                raise
+            try:
+                retry_after = float(e.resp.get("retry-after", 0))
+            except (TypeError, ValueError):
+                retry_after = 0.0
+            time.sleep(_backoff_delay(attempt, retry_after))
         except Exception as e:
             if isinstance(e, KeyboardInterrupt):
                 raise
-            print(f"[GDRIVE-RETRY] {desc} 시도 {attempt}/{GDRIVE_API_MAX_RETRIES} 실패: {e}")
+            # 소켓 끊김 등 전송 레벨 오류 - 일시적일 가능성이 높아 백오프 후 재시도
+            log.info(f"[GDRIVE-RETRY] {desc} 시도 {attempt}/{GDRIVE_API_MAX_RETRIES} 실패: {e}")
             if attempt >= GDRIVE_API_MAX_RETRIES:
-                print(f"[GDRIVE-RETRY] {desc} 재시도 한계 도달 → 예외 전파")
+                log.info(f"[GDRIVE-RETRY] {desc} 재시도 한계 도달 → 예외 전파")
                 raise
-            time.sleep(GDRIVE_API_RETRY_DELAY)
+            time.sleep(_backoff_delay(attempt))
+
+
+# Drive q 쿼리 메타문자 이스케이프 테이블 (translate는 단일 패스로 두 문자를 모두 처리)
+_DRIVE_Q_TABLE = str.maketrans({"'": "\\'", "\\": "\\\\"})
 
 
 def _escape_drive_q(s: str) -> str:
-    return s.replace("'", "\\'")
+    return s.translate(_DRIVE_Q_TABLE)
+
+
+def _json_loads(s):
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
 
 
 def run_cmd(cmd: List[str]) -> str:
@@ -85,7 +172,18 @@ def run_cmd(cmd: List[str]) -> str:
     return result.stdout
 
 
+# 같은 raw 파일을 스트림 검사/인코딩/재시도에서 거듭 probe하지 않도록 결과를 캐시
+_duration_cache: Dict[str, float] = {}
+_duration_cache_lock = threading.Lock()
+
+
 def get_video_duration(path: Path) -> float:
+    key = str(path)
+    with _duration_cache_lock:
+        cached = _duration_cache.get(key)
+    if cached is not None:
+        return cached
+
     cmd = [
         FFPROBE_BIN,
         "-v", "error",
@@ -94,7 +192,10 @@ def get_video_duration(path: Path) -> float:
         str(path),
     ]
     out = run_cmd(cmd).strip()
-    return float(out)
+    duration = float(out)
+    with _duration_cache_lock:
+        _duration_cache[key] = duration
+    return duration
 
 
 def calc_bitrate_kbps(duration_sec: float, target_size_mb: int, safety_margin: float = 0.9) -> int:
@@ -105,65 +206,277 @@ def calc_bitrate_kbps(duration_sec: float, target_size_mb: int, safety_margin: f
     return kbps
 
 
-time_pattern = re.compile(r"time=(\d+):(\d+):(\d+\.\d+)")
+# 스트림 정보도 duration처럼 파일당 한 번만 probe한다
+_streams_cache: Dict[str, Dict[str, dict]] = {}
 
 
-def _parse_ffmpeg_time_to_seconds(line: str) -> Optional[float]:
-    m = time_pattern.search(line)
-    if not m:
-        return None
-    h = int(m.group(1))
-    m_ = int(m.group(2))
-    s = float(m.group(3))
-    return h * 3600 + m_ * 60 + s
+def probe_streams(path: Path) -> Dict[str, dict]:
+    """ffprobe 한 번으로 스트림별 codec_type/codec_name/bit_rate/height를 조회한다."""
+    key = str(path)
+    with _duration_cache_lock:
+        cached = _streams_cache.get(key)
+    if cached is not None:
+        return cached
+
+    cmd = [
+        FFPROBE_BIN,
+        "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,bit_rate,height",
+        "-print_format", "json",
+        str(path),
+    ]
+    info = _json_loads(run_cmd(cmd))
+    out: Dict[str, dict] = {}
+    for st in info.get("streams", []):
+        out.setdefault(st.get("codec_type", ""), st)
+    with _duration_cache_lock:
+        _streams_cache[key] = out
+    return out
 
 
-def encode_video_to_target_size(input_path: Path, output_path: Path, target_size_mb: int) -> None:
-    duration = get_video_duration(input_path)
-    total_kbps = calc_bitrate_kbps(duration, target_size_mb, SAFETY_MARGIN)
+def get_video_height(path: Path) -> Optional[int]:
+    try:
+        v = probe_streams(path).get("video") or {}
+        return int(v.get("height") or 0) or None
+    except Exception:
+        return None
 
-    v_bitrate = max(int(total_kbps * 0.8), 300)
-    a_bitrate = max(int(total_kbps * 0.2), 64)
 
-    print(f"[ENCODE] {input_path.name}: duration={duration:.1f}s, total~{total_kbps}kbps (v={v_bitrate}, a={a_bitrate})")
+def can_stream_copy(path: Path, target_size_mb: int) -> bool:
+    """
+    원본이 이미 H.264(+AAC)이고 전체 비트레이트가 목표 예산 이내면 True.
+    이 경우 재인코딩 대신 -c copy remux만으로 충분하다 (수십 배 빠름).
+    """
+    try:
+        streams = probe_streams(path)
+        v = streams.get("video")
+        a = streams.get("audio")
+        if not v or v.get("codec_name") != "h264":
+            return False
+        if a and a.get("codec_name") != "aac":
+            return False
+        duration = get_video_duration(path)
+        budget_kbps = calc_bitrate_kbps(duration, target_size_mb, SAFETY_MARGIN)
+        total_bps = sum(int(st.get("bit_rate") or 0) for st in (v, a) if st)
+        if total_bps <= 0:
+            # bit_rate 미기재 컨테이너는 파일 크기/길이로 근사
+            total_bps = path.stat().st_size * 8 / duration
+        return total_bps / 1000 <= budget_kbps
+    except Exception as e:
+        log.info(f"[WARN] 스트림 검사 실패 -> 재인코딩으로 진행: {path.name} ({e})")
+        return False
+
+
+def copy_or_link(src: Path, dst: Path) -> None:
+    """
+    raw/encoded가 같은 work_dir 파일시스템에 있으므로 하드링크가 가능하면
+    메타데이터 연산 한 번으로 끝난다(추가 디스크 사용량 0). 크로스 디바이스
+    등으로 실패하면 일반 복사(리눅스 3.8+에선 sendfile 기반)로 폴백.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
+
+def remux_stream_copy(input_path: Path, output_path: Path) -> None:
     cmd = [
         FFMPEG_BIN,
         "-y",
         "-i", str(input_path),
-        "-vf", "scale=-2:1080",
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-b:v", f"{v_bitrate}k",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        str(output_path),
+    ]
+    run_cmd(cmd)
+
+
+# 하드웨어 H.264 인코더 (기동 후 첫 인코딩 때 한 번만 탐지)
+_hw_encoder: Optional[str] = None
+_hw_encoder_probed = False
+
+
+def get_hw_encoder() -> Optional[str]:
+    """
+    ffmpeg가 지원하는 하드웨어 H.264 인코더를 찾는다.
+    GPU 전용 인코딩 엔진(NVENC/QuickSync/VAAPI 등)은 libx264 veryfast보다
+    보통 수 배~수십 배 빠르므로 있으면 우선 사용하고, 없으면 None(libx264 폴백).
+    """
+    global _hw_encoder, _hw_encoder_probed
+    if _hw_encoder_probed:
+        return _hw_encoder
+    _hw_encoder_probed = True
+    try:
+        out = subprocess.run(
+            [FFMPEG_BIN, "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+        ).stdout
+    except OSError:
+        return None
+    for enc in ("h264_nvenc", "h264_qsv", "h264_videotoolbox", "h264_vaapi"):
+        if enc in out:
+            _hw_encoder = enc
+            log.info(f"[INFO] 하드웨어 인코더 사용: {enc}")
+            break
+    return _hw_encoder
+
+
+def _build_ffmpeg_cmd(
+    hw: Optional[str],
+    input_path: Path,
+    output_path: Path,
+    v_kbps: int,
+    a_kbps: int,
+    quality_first: bool = True,
+    src_height: Optional[int] = None,
+    use_hwaccel: bool = True,
+) -> List[str]:
+    """
+    인코더별 ffmpeg 명령 구성. NVENC/VAAPI는 디코드-스케일-인코드를 GPU에 둔다
+    (프레임이 VRAM에 머물러야 PCIe 왕복 복사가 없다).
+    quality_first=True면 품질 기반(CQ/CRF) 단일 패스에 maxrate 상한만 걸고,
+    False면 비트레이트를 강제한다(목표 초과 시 재인코딩용).
+    원본 높이가 이미 1080 이하면 스케일 필터를 아예 빼서 swscale 패스를 생략한다.
+    use_hwaccel=False면 디코드만 CPU로 돌린다 (NVDEC 미지원 코덱 폴백용).
+    """
+    downscale = not (src_height and src_height <= 1080)
+
+    if hw == "h264_nvenc":
+        if use_hwaccel:
+            head = [
+                FFMPEG_BIN, "-y",
+                "-hwaccel", "cuda",
+                "-hwaccel_output_format", "cuda",
+                "-i", str(input_path),
+            ]
+            scale = ["-vf", "scale_cuda=-2:1080"] if downscale else []
+        else:
+            # CPU 디코드 + GPU 인코드: NVDEC이 입력 코덱을 못 받는 경우
+            head = [FFMPEG_BIN, "-y", "-i", str(input_path)]
+            scale = ["-vf", "scale=-2:1080"] if downscale else []
+        if quality_first:
+            rate = [
+                "-rc", "vbr",
+                "-cq", "23",
+                "-b:v", "0",
+                "-maxrate", f"{int(v_kbps * 1.5)}k",
+                "-bufsize", f"{v_kbps * 3}k",
+            ]
+        else:
+            rate = [
+                "-rc", "vbr",
+                "-b:v", f"{v_kbps}k",
+                "-maxrate", f"{int(v_kbps * 1.5)}k",
+                "-bufsize", f"{v_kbps * 2}k",
+            ]
+        video = scale + [
+            "-c:v", "h264_nvenc",
+            "-preset", "p4",
+            "-tune", "hq",
+        ] + rate
+    elif hw == "h264_vaapi":
+        if use_hwaccel:
+            head = [
+                FFMPEG_BIN, "-y",
+                "-hwaccel", "vaapi",
+                "-hwaccel_device", "/dev/dri/renderD128",
+                "-hwaccel_output_format", "vaapi",
+                "-i", str(input_path),
+            ]
+            scale = ["-vf", "scale_vaapi=-2:1080"] if downscale else []
+        else:
+            # CPU 디코드 폴백: 인코더가 받을 수 있게 프레임을 VAAPI 표면으로 업로드
+            head = [
+                FFMPEG_BIN, "-y",
+                "-vaapi_device", "/dev/dri/renderD128",
+                "-i", str(input_path),
+            ]
+            vf = "format=nv12,hwupload" + (",scale_vaapi=-2:1080" if downscale else "")
+            scale = ["-vf", vf]
+        video = scale + [
+            "-c:v", "h264_vaapi",
+            "-b:v", f"{v_kbps}k",
+        ]
+    elif hw:  # h264_qsv / h264_videotoolbox
+        head = [FFMPEG_BIN, "-y", "-i", str(input_path)]
+        video = (["-vf", "scale=-2:1080"] if downscale else []) + [
+            "-c:v", hw,
+            "-b:v", f"{v_kbps}k",
+        ]
+    else:
+        head = [FFMPEG_BIN, "-y", "-i", str(input_path)]
+        if quality_first:
+            rate = [
+                "-crf", "23",
+                "-maxrate", f"{v_kbps}k",
+                "-bufsize", f"{v_kbps * 2}k",
+            ]
+        else:
+            rate = ["-b:v", f"{v_kbps}k"]
+        video = (["-vf", "scale=-2:1080"] if downscale else []) + [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+        ] + rate
+
+    return head + video + [
         "-c:a", "aac",
-        "-b:a", f"{a_bitrate}k",
+        "-b:a", f"{a_kbps}k",
         "-movflags", "+faststart",
         "-f", "mp4",
         str(output_path),
     ]
 
+
+def _run_ffmpeg_with_progress(cmd: List[str], duration: float, tag: str) -> None:
+    """-progress pipe:1 출력을 파싱해 진행률을 찍으면서 ffmpeg를 실행한다."""
+    # -progress pipe:1 은 key=value\n 형식으로 진행 상황을 내보내므로
+    # \r 기반 stats 로그를 정규식으로 긁는 것보다 싸고, 버퍼링 지연도 없다.
+    # -loglevel error 로 프레임/스트림 정보 로그를 잘라 파이프 트래픽 대부분을 없앤다.
+    full_cmd = (
+        cmd[:1]
+        + ["-loglevel", "error"]
+        + cmd[1:-1]
+        + ["-progress", "pipe:1", "-nostats"]
+        + cmd[-1:]
+    )
+
+    # 바이너리 모드: ffmpeg 로그 전체를 UTF-8로 디코드할 필요가 없다
     process = subprocess.Popen(
-        cmd,
+        full_cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
-        errors="ignore",
-        bufsize=1,
     )
 
     last_bucket = -1
     try:
         assert process.stdout is not None
-        for line in process.stdout:
-            line = line.rstrip("\n")
-            t = _parse_ffmpeg_time_to_seconds(line)
-            if t is not None and duration > 0:
-                percent = int((t / duration) * 100)
-                bucket = percent // 10
-                if bucket != last_bucket and 0 <= bucket <= 10:
-                    last_bucket = bucket
-                    print(f"[ENCODE][{input_path.name}] 진행률: {bucket * 10}% ({t:.1f}s / {duration:.1f}s)")
+        fd = process.stdout.fileno()
+        buf = b""
+        while True:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                if not line.startswith(b"out_time_ms="):
+                    continue
+                try:
+                    # out_time_ms는 이름과 달리 마이크로초 단위
+                    t = int(line[len(b"out_time_ms="):]) / 1_000_000
+                except ValueError:
+                    continue
+                if duration > 0:
+                    # 25% 단위면 충분하다 - 로그 큐에 넣는 레코드 수도 그만큼 준다
+                    bucket = int((t / duration) * 100) // 25
+                    if bucket != last_bucket and 0 <= bucket <= 4:
+                        last_bucket = bucket
+                        log.info(f"[ENCODE][{tag}] 진행률: {bucket * 25}% ({t:.1f}s / {duration:.1f}s)")
         process.wait()
     finally:
         if process.poll() is None:
@@ -172,15 +485,99 @@ def encode_video_to_target_size(input_path: Path, output_path: Path, target_size
     if process.returncode != 0:
         raise RuntimeError(f"ffmpeg 인코딩 실패 (returncode={process.returncode})")
 
+
+def encode_video_to_target_size(input_path: Path, output_path: Path, target_size_mb: int) -> None:
+    duration = get_video_duration(input_path)
+    total_kbps = calc_bitrate_kbps(duration, target_size_mb, SAFETY_MARGIN)
+
+    v_bitrate = max(int(total_kbps * 0.8), 300)
+    a_bitrate = max(int(total_kbps * 0.2), 64)
+    hw = get_hw_encoder()
+    src_height = get_video_height(input_path)
+
+    log.info(
+        f"[ENCODE] {input_path.name}: duration={duration:.1f}s, "
+        f"total~{total_kbps}kbps (v={v_bitrate}, a={a_bitrate}), height={src_height}"
+    )
+
+    # 기본은 품질 기반 단일 패스(CRF/CQ + maxrate 상한):
+    # ABR 단일 패스보다 목표 초과가 드물고, 2-pass보다 두 배 빠르다
+    use_hwaccel = True
+    cmd = _build_ffmpeg_cmd(hw, input_path, output_path, v_bitrate, a_bitrate, src_height=src_height)
+    try:
+        _run_ffmpeg_with_progress(cmd, duration, input_path.name)
+    except RuntimeError as e:
+        if not hw:
+            raise
+        # NVDEC/VAAPI가 입력 코덱을 디코드하지 못하는 경우 - GPU 디코드만 끄고 재시도
+        use_hwaccel = False
+        log.info(f"[ENCODE] HW 디코드 파이프라인 실패 -> CPU 디코드로 재시도: {input_path.name} ({e})")
+        cmd = _build_ffmpeg_cmd(
+            hw, input_path, output_path, v_bitrate, a_bitrate,
+            src_height=src_height, use_hwaccel=False,
+        )
+        _run_ffmpeg_with_progress(cmd, duration, input_path.name)
+
     size_mb = output_path.stat().st_size / (1024 * 1024)
-    print(f"[ENCODE] result size = {size_mb:.1f} MB")
+    log.info(f"[ENCODE] result size = {size_mb:.1f} MB")
+    if size_mb <= target_size_mb:
+        return
+
+    # 드물게 목표를 초과한 경우에만 비트레이트를 강제해서 다시 인코딩
+    log.info(f"[ENCODE] 품질 모드 결과가 목표({target_size_mb}MB) 초과 -> 비트레이트 강제 재인코딩")
+    if hw:
+        # HW 인코더는 2-pass를 지원하지 않으므로 엄격한 VBR 한 번으로 맞춘다
+        cmd = _build_ffmpeg_cmd(
+            hw, input_path, output_path, v_bitrate, a_bitrate,
+            quality_first=False, src_height=src_height, use_hwaccel=use_hwaccel,
+        )
+        _run_ffmpeg_with_progress(cmd, duration, input_path.name)
+    else:
+        # libx264는 2-pass ABR로 사이즈를 정확히 맞춘다
+        scale_args = [] if (src_height and src_height <= 1080) else ["-vf", "scale=-2:1080"]
+        passlog = str(output_path) + ".ffpass"
+        cmd1 = [
+            FFMPEG_BIN, "-y",
+            "-i", str(input_path),
+        ] + scale_args + [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-b:v", f"{v_bitrate}k",
+            "-pass", "1",
+            "-passlogfile", passlog,
+            "-an",
+            "-f", "null",
+            os.devnull,
+        ]
+        cmd2 = [
+            FFMPEG_BIN, "-y",
+            "-i", str(input_path),
+        ] + scale_args + [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-b:v", f"{v_bitrate}k",
+            "-pass", "2",
+            "-passlogfile", passlog,
+            "-c:a", "aac",
+            "-b:a", f"{a_bitrate}k",
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            str(output_path),
+        ]
+        try:
+            _run_ffmpeg_with_progress(cmd1, duration, f"{input_path.name}:pass1")
+            _run_ffmpeg_with_progress(cmd2, duration, f"{input_path.name}:pass2")
+        finally:
+            for log_ext in ("-0.log", "-0.log.mbtree"):
+                Path(passlog + log_ext).unlink(missing_ok=True)
+
+    size_mb = output_path.stat().st_size / (1024 * 1024)
+    log.info(f"[ENCODE] result size = {size_mb:.1f} MB")
 
 
 # ===== 파일명 / 폴더 경로 변환 =====
-def flat_name_from_dropbox_path(path_display: str) -> str:
-    p = path_display.strip("/")
-    parts = p.split("/")
-
+# 경로 문자열은 호출부에서 한 번만 split하고, 아래 헬퍼들은 그 결과를 그대로 받는다
+def flat_name_from_parts(parts: List[str]) -> str:
     *dirs, filename = parts
     name_without_ext, _ = os.path.splitext(filename)
 
@@ -190,18 +587,16 @@ def flat_name_from_dropbox_path(path_display: str) -> str:
     return flat + ".mp4"
 
 
-def encoded_rel_folder_from_dropbox(path_display: str) -> list[str]:
-    parts = [p for p in path_display.split("/") if p]
+def encoded_rel_folder_from_parts(parts: List[str]) -> List[str]:
     if "최종편집영상" not in parts:
-        raise ValueError(f"'최종편집영상' 폴더를 찾을 수 없습니다: {path_display}")
+        raise ValueError(f"'최종편집영상' 폴더를 찾을 수 없습니다: {'/'.join(parts)}")
     idx = parts.index("최종편집영상")
     prefix = parts[:idx]
     return prefix + ["encoded"]
 
 
-def raw_rel_path_from_dropbox(path_display: str) -> Path:
-    p = path_display.lstrip("/")
-    return Path(p)
+def raw_rel_path_from_parts(parts: List[str]) -> Path:
+    return Path(*parts)
 
 
 # ===== Dropbox 관련 =====
@@ -221,8 +616,35 @@ def get_dropbox_client() -> dropbox.Dropbox:
     return dbx
 
 
+# Dropbox SDK / googleapiclient 모두 스레드 안전이 보장되지 않으므로 워커마다 하나씩 만든다
+_thread_local = threading.local()
+
+
+def _get_thread_dbx() -> dropbox.Dropbox:
+    dbx = getattr(_thread_local, "dbx", None)
+    if dbx is None:
+        dbx = get_dropbox_client()
+        _thread_local.dbx = dbx
+    return dbx
+
+
+def _get_thread_gdrive(creds):
+    service = getattr(_thread_local, "gdrive", None)
+    if service is None:
+        service = get_gdrive_service(creds)
+        _thread_local.gdrive = service
+    return service
+
+
 def list_dropbox_files_recursive(dbx: dropbox.Dropbox, root_path: str) -> List[FileMetadata]:
-    res = dbx.files_list_folder(root_path, recursive=True)
+    # 다운로드 불가 항목/삭제 항목/공유 멤버 정보는 어차피 버리므로 서버에서 빼고 받는다
+    res = dbx.files_list_folder(
+        root_path,
+        recursive=True,
+        include_non_downloadable_files=False,
+        include_deleted=False,
+        include_has_explicit_shared_members=False,
+    )
 
     entries = list(res.entries)
     while res.has_more:
@@ -234,7 +656,7 @@ def list_dropbox_files_recursive(dbx: dropbox.Dropbox, root_path: str) -> List[F
 
 
 # ===== Google Drive 관련 (조회 전용) =====
-def get_gdrive_service():
+def load_gdrive_credentials() -> Credentials:
     creds = None
     token_path = "token.json"
 
@@ -251,8 +673,36 @@ def get_gdrive_service():
         with open(token_path, "w") as token:
             token.write(creds.to_json())
 
-    service = build("drive", "v3", credentials=creds)
-    return service
+    return creds
+
+
+def get_gdrive_service(creds: Optional[Credentials] = None):
+    if creds is None:
+        creds = load_gdrive_credentials()
+
+    # 스레드별 Http 인스턴스 안에서 커넥션을 keep-alive로 재사용한다
+    http = httplib2.Http(timeout=30)
+    authed_http = AuthorizedHttp(creds, http=http)
+
+    # 클라이언트는 UA에 "gzip"이 있어야 응답을 gzip으로 받는다.
+    # list 응답 JSON은 압축률이 높아 전송량이 크게 줄어든다.
+    _orig_request = authed_http.request
+
+    def _request_with_gzip(uri, method="GET", body=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault("accept-encoding", "gzip")
+        ua = headers.get("user-agent", "")
+        if "gzip" not in ua:
+            headers["user-agent"] = (ua + " (gzip)").strip()
+        return _orig_request(uri, method=method, body=body, headers=headers, **kwargs)
+
+    authed_http.request = _request_with_gzip
+
+    try:
+        # discovery 문서 네트워크 조회 생략 (클라이언트 버전에 따라 미지원)
+        return build("drive", "v3", http=authed_http, cache_discovery=False, static_discovery=True)
+    except TypeError:
+        return build("drive", "v3", http=authed_http, cache_discovery=False)
 
 
 def get_drive_id(service, root_folder_id: str) -> Optional[str]:
@@ -264,7 +714,7 @@ def get_drive_id(service, root_folder_id: str) -> Optional[str]:
     return meta.get("driveId")
 
 
-def drive_list(service, q: str, fields: str, drive_id: Optional[str]):
+def drive_list(service, q: str, fields: str, drive_id: Optional[str], page_token: Optional[str] = None):
     kwargs = dict(
         q=q,
         fields=fields,
@@ -275,24 +725,60 @@ def drive_list(service, q: str, fields: str, drive_id: Optional[str]):
     )
     if drive_id:
         kwargs.update(dict(corpora="drive", driveId=drive_id))
+    if page_token:
+        kwargs["pageToken"] = page_token
     req = service.files().list(**kwargs)
     return _execute_gdrive_with_retry(req, desc=f"list q={q[:80]}...")
 
 
+# 파일마다 경로를 한 단계씩 API로 다시 걷지 않도록, 부모별 자식 목록을 한 번만 받아 캐시한다.
+# (파일 수 N, 경로 깊이 d 기준 O(N*d) 호출 -> O(고유 부모 수) 호출)
+_folder_cache: Dict[Tuple[str, str], Optional[str]] = {}
+_listed_folder_parents: set = set()
+_files_by_parent: Dict[str, Dict[str, str]] = {}
+_drive_cache_lock = threading.Lock()
+
+
+def _list_all_children(service, parent_id: str, drive_id: Optional[str], folders_only: bool) -> Dict[str, str]:
+    """부모 폴더의 자식 전체를 페이지네이션으로 수집해 name -> id 로 돌려준다."""
+    mime_clause = f"mimeType = '{FOLDER_MIMETYPE}' and " if folders_only else ""
+    query = f"{mime_clause}'{parent_id}' in parents and trashed = false"
+    out: Dict[str, str] = {}
+    page_token = None
+    while True:
+        res = drive_list(
+            service, q=query, fields="nextPageToken, files(id, name)",
+            drive_id=drive_id, page_token=page_token,
+        )
+        for f in res.get("files", []):
+            if f["name"] in out:
+                log.info(f"[WARN] 동일 이름 중복 감지: name={f['name']} parent={parent_id}")
+                continue
+            out[f["name"]] = f["id"]
+        page_token = res.get("nextPageToken")
+        if not page_token:
+            break
+    return out
+
+
 def get_folder_if_exists(service, parent_id: str, name: str, drive_id: Optional[str]) -> Optional[str]:
-    name_q = _escape_drive_q(name)
-    query = (
-        f"name = '{name_q}' and "
-        f"mimeType = '{FOLDER_MIMETYPE}' and "
-        f"'{parent_id}' in parents and trashed = false"
-    )
-    res = drive_list(service, q=query, fields="files(id, name)", drive_id=drive_id)
-    files = res.get("files", [])
-    if files:
-        if len(files) > 1:
-            print(f"[WARN] 동일 폴더명 중복 감지: name={name} parent={parent_id} count={len(files)}")
-        return files[0]["id"]
-    return None
+    key = (parent_id, name)
+    with _drive_cache_lock:
+        if key in _folder_cache:
+            return _folder_cache[key]
+        already_listed = parent_id in _listed_folder_parents
+    if already_listed:
+        # 부모의 전체 자식 목록을 이미 받았는데 캐시에 없으면 존재하지 않는 폴더
+        with _drive_cache_lock:
+            _folder_cache[key] = None
+        return None
+    children = _list_all_children(service, parent_id, drive_id, folders_only=True)
+    with _drive_cache_lock:
+        _listed_folder_parents.add(parent_id)
+        for child_name, child_id in children.items():
+            _folder_cache[(parent_id, child_name)] = child_id
+        _folder_cache.setdefault(key, None)
+        return _folder_cache[key]
 
 
 def get_path_if_exists(service, root_id: str, parts: List[str], drive_id: Optional[str]) -> Optional[str]:
@@ -306,18 +792,14 @@ def get_path_if_exists(service, root_id: str, parts: List[str], drive_id: Option
 
 
 def find_file_in_folder(service, parent_id: str, name: str, drive_id: Optional[str]) -> Optional[str]:
-    name_q = _escape_drive_q(name)
-    query = (
-        f"name = '{name_q}' and "
-        f"'{parent_id}' in parents and trashed = false"
-    )
-    res = drive_list(service, q=query, fields="files(id, name)", drive_id=drive_id)
-    files = res.get("files", [])
-    if files:
-        if len(files) > 1:
-            print(f"[WARN] 동일 파일명 중복 감지: name={name} parent={parent_id} count={len(files)}")
-        return files[0]["id"]
-    return None
+    with _drive_cache_lock:
+        names = _files_by_parent.get(parent_id)
+    if names is None:
+        # 파일 이름별로 쿼리하지 않고 부모당 한 번만 전체 목록을 받아 로컬에서 조회
+        listed = _list_all_children(service, parent_id, drive_id, folders_only=False)
+        with _drive_cache_lock:
+            names = _files_by_parent.setdefault(parent_id, listed)
+    return names.get(name)
 
 
 def find_gdrive_file_by_path(
@@ -334,7 +816,225 @@ def find_gdrive_file_by_path(
 
 
 # ===== 메인 파이프라인 (준비 전용) =====
+# 인코딩 대기 작업: (path_display, flat_name, raw_local_path, encoded_local_path)
+EncodeJob = Tuple[str, str, Path, Path]
+
+
+def _prepare_one(
+    meta: FileMetadata,
+    creds,
+    drive_id: Optional[str],
+    raw_root: Path,
+    enc_root: Path,
+    enc_q: "queue.Queue[Optional[EncodeJob]]",
+) -> str:
+    """
+    Dropbox 파일 하나의 다운로드 단계까지 처리하고, 인코딩이 필요한 파일은
+    enc_q로 넘긴다. 다운로드(네트워크)와 인코딩(CPU/GPU)을 서로 다른 스레드
+    풀에서 돌려야 한쪽이 다른 쪽을 막지 않는다.
+    반환값은 집계용 상태 문자열:
+    ignored / closed / local / gdrive / dry_run / queued / failed
+    """
+    path_display = meta.path_display
+
+    if "(폐강" in path_display:
+        log.info(f"[SKIP] (폐강) 포함 경로 -> 준비 안 함: {path_display}")
+        return "closed"
+
+    # 확장자만 보려고 Path 객체를 만들 필요는 없다
+    ext = path_display.rpartition(".")[2].lower()
+    if ext not in VIDEO_EXTS:
+        return "ignored"
+
+    # 경로 split은 여기서 한 번만 하고 아래 헬퍼들에 그대로 넘긴다
+    parts = [p for p in path_display.split("/") if p]
+    if "최종편집영상" not in parts:
+        return "ignored"
+
+    dbx = _get_thread_dbx()
+    gdrive = _get_thread_gdrive(creds)
+
+    raw_rel_path = raw_rel_path_from_parts(parts)
+    raw_local_path = raw_root / raw_rel_path
+    encoded_folder_rel_parts = encoded_rel_folder_from_parts(parts)
+    flat_name = flat_name_from_parts(parts)
+    encoded_local_path = enc_root.joinpath(*encoded_folder_rel_parts) / flat_name
+
+    log.info("\n==============================")
+    log.info(f"[PIPELINE-PREP] 대상 파일")
+    log.info(f"  - Dropbox 경로      : {path_display}")
+    log.info(f"  - Raw 로컬경로      : {raw_local_path}")
+    log.info(f"  - Encoded 로컬경로  : {encoded_local_path}")
+    log.info("==============================")
+
+    if raw_local_path.exists() and encoded_local_path.exists():
+        log.info(f"[SKIP-LOCAL] raw/encoded 모두 로컬에 이미 존재 -> 준비 스킵: {path_display}")
+        return "local"
+
+    gdrive_folder_parts = encoded_folder_rel_parts
+    try:
+        existing_gdrive_id = find_gdrive_file_by_path(
+            gdrive, GDRIVE_ROOT_FOLDER_ID, drive_id, gdrive_folder_parts, flat_name
+        )
+    except Exception as e:
+        log.info(f"[WARN-GDRIVE] GDrive에서 기존 encoded 조회 중 오류 -> 이 파일은 준비 실패로 건너뜀")
+        log.info(f"             경로: /" + "/".join(gdrive_folder_parts) + f"/{flat_name}")
+        log.info(f"             {type(e).__name__}: {e}")
+        return "failed"
+
+    if existing_gdrive_id:
+        log.info(f"[SKIP-GDRIVE] GDrive에 encoded 파일 이미 존재 -> 준비/인코딩 스킵")
+        log.info(f"             경로: /" + "/".join(gdrive_folder_parts) + f"/{flat_name}")
+        log.info(f"             id: {existing_gdrive_id}")
+        return "gdrive"
+
+    if DRY_RUN:
+        log.info(f"[DRY RUN] 이 파일을 다음 순서로 준비할 예정입니다:")
+        log.info(f"[DRY RUN]  1) Dropbox에서 다운로드 -> {raw_local_path}")
+        log.info(f"[DRY RUN]  2) 원본 파일 크기 검사 -> {TARGET_SIZE_MB}MB 기준")
+        log.info(f"[DRY RUN]  3) 필요시 인코딩 -> {encoded_local_path} (1080p, {TARGET_SIZE_MB}MB 타겟)")
+        log.info(f"[DRY RUN]  4) 원본/인코딩본 모두 tmp_work에 남김 (삭제 안 함)")
+        return "dry_run"
+
+    attempts = 0
+    success = False
+    last_error: Optional[Exception] = None
+    raw_prepared = raw_local_path.exists()
+
+    # 시도 간에 변하지 않는 것들은 루프 밖에서 한 번만:
+    # with_suffix는 경로를 다시 파싱하므로 단순 이름 결합으로 충분하다
+    tmp_raw = raw_local_path.parent / (raw_local_path.name + ".part")
+    raw_local_path.parent.mkdir(parents=True, exist_ok=True)
+    if tmp_raw.exists():
+        try:
+            log.info(f"[CLEANUP] 기존 임시 파일 삭제: {tmp_raw}")
+            tmp_raw.unlink()
+        except Exception as ee:
+            log.info(f"[CLEANUP-WARN] 임시 파일 삭제 실패: {tmp_raw} ({ee})")
+
+    while attempts < MAX_RETRIES and not success:
+        attempts += 1
+        log.info(f"[ATTEMPT-PREP] {flat_name} - 다운로드 {attempts}/{MAX_RETRIES} 시도")
+
+        try:
+            if not raw_prepared:
+                log.info(f"[STEP] Dropbox에서 다운로드 중 -> {tmp_raw}")
+                # res.content는 영상 전체를 bytes로 올려버리므로(수 GB) 스트리밍 복사로 대체
+                _, res = dbx.files_download(path=path_display)
+                try:
+                    res.raw.decode_content = True
+                    with open(tmp_raw, "wb") as f:
+                        shutil.copyfileobj(res.raw, f, length=4 * 1024 * 1024)
+                finally:
+                    res.close()
+                log.info(f"[STEP] 다운로드 완료")
+                tmp_raw.replace(raw_local_path)
+                log.info(f"[STEP] raw 파일 준비 완료: {raw_local_path}")
+                raw_prepared = True
+            else:
+                log.info(f"[STEP] raw 이미 존재, 재다운로드 생략: {raw_local_path}")
+
+            success = True
+
+        except Exception as e:
+            last_error = e
+            log.info(f"[ERROR] 다운로드 시도 {attempts}/{MAX_RETRIES} 중 오류 발생: {path_display}")
+            log.info(f"        {type(e).__name__}: {e}")
+            if attempts < MAX_RETRIES:
+                log.info(f"[RETRY] {flat_name} 다운로드 다시 시도 예정...")
+            else:
+                log.info(f"[GIVEUP] {flat_name} - 최대 재시도 횟수 초과, 이 파일 준비 건너뜀.")
+
+    if not success:
+        log.info(f"[PREP-FAIL] 최종 실패 파일: {path_display}")
+        if last_error:
+            log.info(f"      마지막 에러: {type(last_error).__name__}: {last_error}")
+        return "failed"
+
+    # 다운로드 워커에서 duration을 미리 probe해 캐시를 채워 둔다.
+    # PREP_CONCURRENCY개 워커에서 병렬로 돌므로 ffprobe fork/exec 비용이 겹치고,
+    # 인코더 스레드는 캐시 적중으로 probe 대기 없이 바로 인코딩을 시작한다.
+    try:
+        get_video_duration(raw_local_path)
+    except Exception as e:
+        log.info(f"[WARN] 사전 duration probe 실패 (인코딩 단계에서 재시도): {raw_local_path.name} ({e})")
+
+    # 인코딩 단계로 전달. 큐 깊이가 ENCODE_QUEUE_DEPTH를 넘으면 여기서 블록되어
+    # 다운로드가 인코딩보다 한없이 앞서 나가며 디스크를 채우는 것을 막는다.
+    enc_q.put((path_display, flat_name, raw_local_path, encoded_local_path))
+    return "queued"
+
+
+def _encode_one(path_display: str, flat_name: str, raw_local_path: Path, encoded_local_path: Path) -> str:
+    """다운로드가 끝난 파일의 인코딩/복사 단계. 인코더 스레드에서 호출된다."""
+    attempts = 0
+    success = False
+    last_error: Optional[Exception] = None
+
+    orig_size_mb = raw_local_path.stat().st_size / (1024 * 1024)
+    log.info(f"[CHECK] 원본 파일 크기 = {orig_size_mb:.1f} MB (TARGET={TARGET_SIZE_MB} MB)")
+
+    tmp_enc = encoded_local_path.parent / (encoded_local_path.name + ".part")
+    encoded_local_path.parent.mkdir(parents=True, exist_ok=True)
+    if tmp_enc.exists():
+        try:
+            log.info(f"[CLEANUP] 기존 임시 파일 삭제: {tmp_enc}")
+            tmp_enc.unlink()
+        except Exception as ee:
+            log.info(f"[CLEANUP-WARN] 임시 파일 삭제 실패: {tmp_enc} ({ee})")
+
+    while attempts < MAX_RETRIES and not success:
+        attempts += 1
+        log.info(f"[ATTEMPT-PREP] {flat_name} - 인코딩 {attempts}/{MAX_RETRIES} 시도")
+
+        try:
+            if orig_size_mb <= TARGET_SIZE_MB:
+                log.info(f"[INFO] 원본이 목표 용량 이하 -> 인코딩 생략, Encoded용 파일 링크/복사 생성")
+                copy_or_link(raw_local_path, tmp_enc)
+            elif can_stream_copy(raw_local_path, TARGET_SIZE_MB):
+                log.info(f"[STEP] 이미 H.264/AAC + 비트레이트 예산 이내 -> 재인코딩 대신 remux: {tmp_enc}")
+                remux_stream_copy(raw_local_path, tmp_enc)
+            else:
+                log.info(f"[STEP] ffmpeg 인코딩 시작 -> {tmp_enc}")
+                encode_video_to_target_size(raw_local_path, tmp_enc, TARGET_SIZE_MB)
+
+            tmp_enc.replace(encoded_local_path)
+            log.info(f"[STEP] encoded 파일 준비 완료: {encoded_local_path}")
+
+            success = True
+
+        except Exception as e:
+            last_error = e
+            log.info(f"[ERROR] 인코딩 시도 {attempts}/{MAX_RETRIES} 중 오류 발생: {path_display}")
+            log.info(f"        {type(e).__name__}: {e}")
+            if attempts < MAX_RETRIES:
+                log.info(f"[RETRY] {flat_name} 인코딩 다시 시도 예정...")
+            else:
+                log.info(f"[GIVEUP] {flat_name} - 최대 재시도 횟수 초과, 이 파일 준비 건너뜀.")
+
+    if success:
+        log.info(f"[PREP-DONE] 준비 완료 (raw + encoded 로컬에 존재): {path_display}")
+        return "done"
+
+    log.info(f"[PREP-FAIL] 최종 실패 파일: {path_display}")
+    if last_error:
+        log.info(f"      마지막 에러: {type(last_error).__name__}: {last_error}")
+    return "failed"
+
+
+def _encode_worker(enc_q: "queue.Queue[Optional[EncodeJob]]", counters: Dict[str, int], counters_lock: threading.Lock) -> None:
+    while True:
+        job = enc_q.get()
+        if job is None:
+            break
+        status = _encode_one(*job)
+        with counters_lock:
+            counters[status] = counters.get(status, 0) + 1
+
+
 def process_all():
+    _setup_logging()
+
     base_dir = Path(__file__).parent
     work_dir = (base_dir / LOCAL_WORKDIR).resolve()
     raw_root = work_dir / "raw"
@@ -345,169 +1045,62 @@ def process_all():
     # 이전 실행에서 남은 .part 임시파일 정리
     for part_file in list(raw_root.rglob("*.part")) + list(enc_root.rglob("*.part")):
         try:
-            print(f"[CLEANUP] 이전 실행에서 남은 임시 파일 삭제: {part_file}")
+            log.info(f"[CLEANUP] 이전 실행에서 남은 임시 파일 삭제: {part_file}")
             part_file.unlink()
         except Exception as e:
-            print(f"[CLEANUP-WARN] 임시 파일 삭제 실패: {part_file} ({e})")
+            log.info(f"[CLEANUP-WARN] 임시 파일 삭제 실패: {part_file} ({e})")
 
     dbx = get_dropbox_client()
-    gdrive = get_gdrive_service()
+    creds = load_gdrive_credentials()
+    gdrive = get_gdrive_service(creds)
     drive_id = get_drive_id(gdrive, GDRIVE_ROOT_FOLDER_ID)
-    print(f"[INFO] driveId = {drive_id if drive_id else '(None - My Drive or unknown)'}")
+    log.info(f"[INFO] driveId = {drive_id if drive_id else '(None - My Drive or unknown)'}")
 
     dbx_files = list_dropbox_files_recursive(dbx, DROPBOX_ROOT)
     dbx_files = sorted(dbx_files, key=lambda meta: meta.path_display)
 
-    print(f"[INFO] Found {len(dbx_files)} entries under {DROPBOX_ROOT}")
-    print(f"[INFO] DRY_RUN = {DRY_RUN}")
-    print(f"[INFO] LOCAL_WORKDIR = {work_dir}")
-
-    video_exts = {".mp4", ".mov", ".mkv", ".avi", ".wmv"}
-
-    total_targets = 0
-    skipped_closed = 0
-    skipped_existing_local = 0
-    skipped_existing_gdrive = 0
-    failed_files = 0
-
-    for meta in dbx_files:
-        path_display = meta.path_display
-        ext = Path(path_display).suffix.lower()
-
-        if "(폐강" in path_display:
-            skipped_closed += 1
-            print(f"[SKIP] (폐강) 포함 경로 -> 준비 안 함: {path_display}")
-            continue
-
-        if ext not in video_exts:
-            continue
-
-        parts = path_display.split("/")
-        if "최종편집영상" not in parts:
-            continue
-
-        total_targets += 1
-
-        raw_rel_path = raw_rel_path_from_dropbox(path_display)
-        raw_local_path = raw_root / raw_rel_path
-        encoded_folder_rel_parts = encoded_rel_folder_from_dropbox(path_display)
-        flat_name = flat_name_from_dropbox_path(path_display)
-        encoded_local_path = enc_root.joinpath(*encoded_folder_rel_parts) / flat_name
-
-        print("\n==============================")
-        print(f"[PIPELINE-PREP] 대상 파일")
-        print(f"  - Dropbox 경로      : {path_display}")
-        print(f"  - Raw 로컬경로      : {raw_local_path}")
-        print(f"  - Encoded 로컬경로  : {encoded_local_path}")
-        print("==============================")
-
-        if raw_local_path.exists() and encoded_local_path.exists():
-            skipped_existing_local += 1
-            print(f"[SKIP-LOCAL] raw/encoded 모두 로컬에 이미 존재 -> 준비 스킵: {path_display}")
-            continue
-
-        gdrive_folder_parts = encoded_folder_rel_parts
-        try:
-            existing_gdrive_id = find_gdrive_file_by_path(
-                gdrive, GDRIVE_ROOT_FOLDER_ID, drive_id, gdrive_folder_parts, flat_name
-            )
-        except Exception as e:
-            failed_files += 1
-            print(f"[WARN-GDRIVE] GDrive에서 기존 encoded 조회 중 오류 -> 이 파일은 준비 실패로 건너뜀")
-            print(f"             경로: /" + "/".join(gdrive_folder_parts) + f"/{flat_name}")
-            print(f"             {type(e).__name__}: {e}")
-            continue
-
-        if existing_gdrive_id:
-            skipped_existing_gdrive += 1
-            print(f"[SKIP-GDRIVE] GDrive에 encoded 파일 이미 존재 -> 준비/인코딩 스킵")
-            print(f"             경로: /" + "/".join(gdrive_folder_parts) + f"/{flat_name}")
-            print(f"             id: {existing_gdrive_id}")
-            continue
-
-        if DRY_RUN:
-            print(f"[DRY RUN] 이 파일을 다음 순서로 준비할 예정입니다:")
-            print(f"[DRY RUN]  1) Dropbox에서 다운로드 -> {raw_local_path}")
-            print(f"[DRY RUN]  2) 원본 파일 크기 검사 -> {TARGET_SIZE_MB}MB 기준")
-            print(f"[DRY RUN]  3) 필요시 인코딩 -> {encoded_local_path} (1080p, {TARGET_SIZE_MB}MB 타겟)")
-            print(f"[DRY RUN]  4) 원본/인코딩본 모두 tmp_work에 남김 (삭제 안 함)")
-            continue
-
-        attempts = 0
-        success = False
-        last_error: Optional[Exception] = None
-        raw_prepared = raw_local_path.exists()
-
-        while attempts < MAX_RETRIES and not success:
-            attempts += 1
-            print(f"[ATTEMPT-PREP] {flat_name} - {attempts}/{MAX_RETRIES} 시도")
+    log.info(f"[INFO] Found {len(dbx_files)} entries under {DROPBOX_ROOT}")
+    log.info(f"[INFO] DRY_RUN = {DRY_RUN}")
+    log.info(f"[INFO] LOCAL_WORKDIR = {work_dir}")
+    log.info(f"[INFO] PREP_CONCURRENCY = {PREP_CONCURRENCY}, ENCODE_PARALLEL = {ENCODE_PARALLEL}")
+
+    # 다운로드 풀과 인코더 스레드를 분리해 네트워크와 CPU/GPU를 끊김 없이 겹친다.
+    # 다운로드 워커는 인코딩을 기다리지 않고 바로 다음 파일을 받으러 간다.
+    counters: Dict[str, int] = {}
+    counters_lock = threading.Lock()
+    enc_q: "queue.Queue[Optional[EncodeJob]]" = queue.Queue(maxsize=ENCODE_QUEUE_DEPTH)
+    encoders = [
+        threading.Thread(target=_encode_worker, args=(enc_q, counters, counters_lock), daemon=True)
+        for _ in range(ENCODE_PARALLEL)
+    ]
+    for t in encoders:
+        t.start()
+
+    with ThreadPoolExecutor(max_workers=PREP_CONCURRENCY) as pool:
+        for status in pool.map(
+            lambda meta: _prepare_one(meta, creds, drive_id, raw_root, enc_root, enc_q),
+            dbx_files,
+        ):
+            if status != "queued":
+                with counters_lock:
+                    counters[status] = counters.get(status, 0) + 1
+
+    for _ in encoders:
+        enc_q.put(None)
+    for t in encoders:
+        t.join()
+
+    total_targets = sum(
+        counters.get(k, 0) for k in ("local", "gdrive", "dry_run", "done", "failed")
+    )
 
-            try:
-                raw_local_path.parent.mkdir(parents=True, exist_ok=True)
-                encoded_local_path.parent.mkdir(parents=True, exist_ok=True)
-
-                tmp_raw = raw_local_path.with_suffix(raw_local_path.suffix + ".part")
-                tmp_enc = encoded_local_path.with_suffix(encoded_local_path.suffix + ".part")
-
-                for p in (tmp_raw, tmp_enc):
-                    if p.exists():
-                        try:
-                            print(f"[CLEANUP] 기존 임시 파일 삭제: {p}")
-                            p.unlink()
-                        except Exception as ee:
-                            print(f"[CLEANUP-WARN] 임시 파일 삭제 실패: {p} ({ee})")
-
-                if not raw_prepared:
-                    print(f"[STEP] Dropbox에서 다운로드 중 -> {tmp_raw}")
-                    with open(tmp_raw, "wb") as f:
-                        _, res = dbx.files_download(path=path_display)
-                        f.write(res.content)
-                    print(f"[STEP] 다운로드 완료")
-                    tmp_raw.replace(raw_local_path)
-                    print(f"[STEP] raw 파일 준비 완료: {raw_local_path}")
-                    raw_prepared = True
-                else:
-                    print(f"[STEP] raw 이미 존재, 재다운로드 생략: {raw_local_path}")
-
-                orig_size_mb = raw_local_path.stat().st_size / (1024 * 1024)
-                print(f"[CHECK] 원본 파일 크기 = {orig_size_mb:.1f} MB (TARGET={TARGET_SIZE_MB} MB)")
-
-                if orig_size_mb <= TARGET_SIZE_MB:
-                    print(f"[INFO] 원본이 목표 용량 이하 -> 인코딩 생략, Encoded용 파일 복사 생성")
-                    shutil.copy2(raw_local_path, tmp_enc)
-                else:
-                    print(f"[STEP] ffmpeg 인코딩 시작 -> {tmp_enc}")
-                    encode_video_to_target_size(raw_local_path, tmp_enc, TARGET_SIZE_MB)
-
-                tmp_enc.replace(encoded_local_path)
-                print(f"[STEP] encoded 파일 준비 완료: {encoded_local_path}")
-
-                success = True
-
-            except Exception as e:
-                last_error = e
-                print(f"[ERROR] 준비 시도 {attempts}/{MAX_RETRIES} 중 오류 발생: {path_display}")
-                print(f"        {type(e).__name__}: {e}")
-                if attempts < MAX_RETRIES:
-                    print(f"[RETRY] {flat_name} 준비 다시 시도 예정...")
-                else:
-                    print(f"[GIVEUP] {flat_name} - 최대 재시도 횟수 초과, 이 파일 준비 건너뜀.")
-                    failed_files += 1
-
-        if success:
-            print(f"[PREP-DONE] 준비 완료 (raw + encoded 로컬에 존재): {path_display}")
-        else:
-            print(f"[PREP-FAIL] 최종 실패 파일: {path_display}")
-            if last_error:
-                print(f"      마지막 에러: {type(last_error).__name__}: {last_error}")
-
-    print(f"\n[PREP-SUMMARY] 총 대상 파일 수: {total_targets}")
-    print(f"[PREP-SUMMARY] (폐강)으로 스킵된 파일 수: {skipped_closed}")
-    print(f"[PREP-SUMMARY] 로컬 준비 완료 상태로 스킵된 파일 수: {skipped_existing_local}")
-    print(f"[PREP-SUMMARY] GDrive에 이미 encoded가 있어 스킵된 파일 수: {skipped_existing_gdrive}")
-    print(f"[PREP-SUMMARY] 준비 단계에서 최종 실패한 파일 수: {failed_files}")
+    log.info(f"\n[PREP-SUMMARY] 총 대상 파일 수: {total_targets}")
+    log.info(f"[PREP-SUMMARY] (폐강)으로 스킵된 파일 수: {counters.get('closed', 0)}")
+    log.info(f"[PREP-SUMMARY] 로컬 준비 완료 상태로 스킵된 파일 수: {counters.get('local', 0)}")
+    log.info(f"[PREP-SUMMARY] GDrive에 이미 encoded가 있어 스킵된 파일 수: {counters.get('gdrive', 0)}")
+    log.info(f"[PREP-SUMMARY] 준비 단계에서 최종 실패한 파일 수: {counters.get('failed', 0)}")
     if DRY_RUN:
-        print("[PREP-SUMMARY] DRY_RUN 모드: 실제 다운로드/인코딩은 수행되지 않았습니다.")
+        log.info("[PREP-SUMMARY] DRY_RUN 모드: 실제 다운로드/인코딩은 수행되지 않았습니다.")
 
 
 if __name__ == "__main__":